@@ -1,21 +1,200 @@
-import time
-import sys
+import datetime
 import getopt
-import subprocess
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
 
 # This is the autoupdater daemon
 # Do not use directly
+#
+# It stays resident and runs the updates itself, so that the catalogue
+# parsed by one update is kept in memory for the next one. Its status is
+# served on a unix socket, see request_status.
 
 
 # Verbose mode
 # By default, daemon does not output to stdout
 VERBOSE = True
 
+# the seconds request_status waits for the daemon to answer
+STATUS_TIMEOUT = 5
+
+# the format of the times in the status
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 
 class InvalidIntervalException(Exception):
     pass
 
 
+class UpdateService:
+    '''
+    Runs update, a function taking the function reporting the steps of the
+    update (see driver_commands.update), every interval seconds. A single
+    update runs at a time: run_update does nothing while another is running,
+    and update itself returns False without updating while an update of
+    another process runs. The status of the service is kept for status().
+    '''
+
+    def __init__(self, update, interval):
+        self.update = update
+        self.interval = interval
+        # held while an update runs
+        self._running = threading.Lock()
+        # guards the status, which the status server reads from its threads
+        self._statusLock = threading.Lock()
+        # set to stop the service
+        self._stopped = threading.Event()
+        self._status = {"pid": os.getpid(), "state": "idle", "step": None,
+                        "runs": 0, "last_started": None,
+                        "last_finished": None, "last_error": None,
+                        "next_update": None, "interval_hours":
+                        interval / 3600}
+
+    def status(self):
+        '''
+        () -> dict
+
+        Returns a copy of the status of the service: its state ("idle" or
+        "updating"), the step of the running update, the number of updates
+        run, the times the last one started and finished, the error it
+        failed with if any, and the time of the next one.
+        '''
+        with self._statusLock:
+            return dict(self._status)
+
+    def _setStatus(self, **values):
+        '''
+        (**object) -> None
+
+        Sets the values of the status.
+        '''
+        with self._statusLock:
+            self._status.update(values)
+
+    def run_update(self):
+        '''
+        () -> bool
+
+        Runs an update, unless one is running already, and returns whether
+        it did.
+        '''
+        if not self._running.acquire(blocking=False):
+            return False
+        try:
+            self._setStatus(state="updating", step=None,
+                            last_started=_now(), last_error=None)
+            try:
+                if self.update(
+                        lambda step: self._setStatus(step=step)) is False:
+                    self._setStatus(last_error="skipped, another update was "
+                                    "running")
+            except Exception as error:
+                # the daemon keeps running, and tries again at the next time
+                self._setStatus(last_error=repr(error))
+            with self._statusLock:
+                self._status["runs"] += 1
+            self._setStatus(state="idle", step=None, last_finished=_now())
+        finally:
+            self._running.release()
+        return True
+
+    def run(self):
+        '''
+        () -> None
+
+        Runs an update now and then every interval seconds, until stop is
+        called.
+        '''
+        while not self._stopped.is_set():
+            if VERBOSE:
+                print("Updating...")
+            self.run_update()
+            next_update = datetime.datetime.now() + \
+                datetime.timedelta(seconds=self.interval)
+            self._setStatus(next_update=next_update.strftime(TIME_FORMAT))
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        '''
+        () -> None
+
+        Stops run after the running update, if any.
+        '''
+        self._stopped.set()
+
+
+class _StatusHandler(socketserver.StreamRequestHandler):
+    '''
+    Answers a request of request_status: a line holding "status", answered
+    with a line holding the status of the service in JSON.
+    '''
+
+    def handle(self):
+        command = self.rfile.readline().decode("UTF-8").strip()
+        if command == "status":
+            answer = self.server.service.status()
+        else:
+            answer = {"error": "unknown command: " + command}
+        self.wfile.write((json.dumps(answer) + "\n").encode("UTF-8"))
+
+
+class StatusServer(socketserver.ThreadingMixIn,
+                   socketserver.UnixStreamServer):
+    '''
+    Serves the status of service on the unix socket at path, to the
+    processes of the user only.
+    '''
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        self.service = service
+        socketserver.UnixStreamServer.__init__(self, path, _StatusHandler)
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.remove(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+def request_status(path):
+    '''
+    (str) -> dict
+
+    Returns the status of the daemon serving it on the unix socket at path,
+    as UpdateService.status returns it, or None if no daemon is running.
+    '''
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(STATUS_TIMEOUT)
+    try:
+        client.connect(path)
+        client.sendall(b"status\n")
+        answer = client.makefile("rb").readline()
+    except (FileNotFoundError, ConnectionRefusedError, socket.timeout):
+        return None
+    finally:
+        client.close()
+    if not answer:
+        return None
+    return json.loads(answer.decode("UTF-8"))
+
+
+def _now():
+    '''
+    () -> str
+
+    Returns the current time, as written in the status.
+    '''
+    return datetime.datetime.now().strftime(TIME_FORMAT)
+
+
 def main():
     sleeptime = 0
 
@@ -35,15 +214,31 @@ def main():
     else:
         raise InvalidIntervalException("Interval must be 1 hour or greater")
 
-    # command to call driver.py's update method
-    commandstr = "python3 driver.py --update"
+    # imported here, driver_commands asks this module for the status
+    import driver_commands
+    import storage_manager.storage_manager as STORAGE
 
-    while (1):
-        # daemon continues to run until it is killed by driver
-        if (VERBOSE):
-            print("Updating...")
-        subprocess.Popen(commandstr, shell=True)
-        time.sleep(sleeptime_hours)
+    path = STORAGE.AUTOUPDATE_SOCKET_PATH
+    if request_status(path) is not None:
+        print("The autoupdate daemon is running already.")
+        sys.exit(1)
+    # the socket left by a daemon which did not stop cleanly
+    if os.path.exists(path):
+        os.remove(path)
+
+    service = UpdateService(driver_commands.update, sleeptime_hours)
+    server = StatusServer(path, service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # stopped by stopautoupdate, which sends SIGTERM, once the running update
+    # is done. The handler runs in the main thread, which may hold the lock
+    # of the event stop sets, so stop is called from another thread
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+        target=service.stop).start())
+    try:
+        service.run()
+    finally:
+        server.shutdown()
+        server.server_close()
 
 
 if __name__ == "__main__":
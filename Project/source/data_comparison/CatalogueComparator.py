@@ -0,0 +1,96 @@
+from data_comparison.Comparator import *
+
+# fields of the stars of the origin catalogues which the Open Exoplanet
+# Catalogue keeps on the system. The coordinates are left out: the catalogues
+# format them differently, so comparing them only reports formatting noise
+SYSTEM_FIELDS = ("distance",)
+
+
+class CatalogueComparator():
+    def __init__(self, OEC_systems, OEC_nameToStar, origin_stars, origin,
+                 tolerances=None, useErrorBars=False):
+        '''([System], dict of str: Star, dict of str: Star, str, dict, bool)
+        -> NoneType
+        sets up the comparator of a whole origin catalogue against the Open
+        Exoplanet Catalogue
+        OEC_systems and OEC_nameToStar are the systems and the dictionary of
+        star names (including alternate names) of the Open Exoplanet
+        Catalogue, as returned by buildSystemFromXML
+        origin_stars maps the star names of the origin catalogue to its stars
+        origin, tolerances and useErrorBars are passed on to the Comparator of
+        every star
+        returns NoneType
+        '''
+        self.OEC_systems = OEC_systems
+        self.OEC_nameToStar = OEC_nameToStar
+        self.origin_stars = origin_stars
+        self.origin = origin
+        self.tolerances = tolerances
+        self.useErrorBars = useErrorBars
+
+    def matchStars(self):
+        '''() -> dict of Star: [Star]
+        Returns a dictionary mapping each star of the Open Exoplanet Catalogue
+        to the stars of the origin catalogue found under one of its names
+        '''
+        matches = {}
+        for name in self.origin_stars:
+            OEC_star = self.OEC_nameToStar.get(name)
+            if OEC_star is not None:
+                matches.setdefault(OEC_star, []).append(
+                    self.origin_stars[name])
+        return matches
+
+    def proposedChanges(self):
+        '''() -> list
+        Walks every system of the Open Exoplanet Catalogue once, down to its
+        stars (including the stars of its binaries) and their planets, and
+        returns the list of Addition and Modification objects proposed by the
+        origin catalogue at every level
+        '''
+        result_list = []
+        matches = self.matchStars()
+        for system in self.OEC_systems:
+            systemCompared = False
+            for OEC_star in system.starObjects:
+                for origin_star in matches.get(OEC_star, []):
+                    # the system fields are taken from the first star of the
+                    # origin catalogue found in the system
+                    if not systemCompared:
+                        result_list.extend(
+                            self.proposedChangeSystemCompare(system,
+                                                             origin_star))
+                        systemCompared = True
+                    starCompare = Comparator(origin_star, OEC_star,
+                                             self.origin, self.tolerances,
+                                             self.useErrorBars)
+                    result_list.extend(starCompare.proposedChangeStarCompare())
+        return result_list
+
+    def proposedChangeSystemCompare(self, OEC_system, origin_star):
+        '''(System, Star) -> list
+        Compares the SYSTEM_FIELDS of the star of the origin catalogue to the
+        fields of the system of the Open Exoplanet Catalogue holding its
+        match. Returns a list of Modification objects of the system.
+        '''
+        result_list = []
+        origin_system = System(OEC_system.name)
+        origin_system.lastupdate = origin_star.lastupdate
+        for field in SYSTEM_FIELDS:
+            if field in origin_star.getData():
+                origin_system.addVal(field, origin_star.getVal(field))
+                bounds = origin_star.getErrorBounds(field)
+                for attrib in bounds:
+                    origin_system.addError(field + attrib, bounds[attrib])
+
+        systemCompare = Comparator(origin_system, OEC_system, self.origin,
+                                   self.tolerances, self.useErrorBars)
+        systemChange = systemCompare.innerJoinDiff()
+        for field in systemChange:
+            if ((systemChange[field][0] is not MISSING) and (
+                        systemChange[field][0] != "")):
+                result_list.append(
+                    Modification(self.origin, OEC_system, origin_system,
+                                 field, systemChange[field][0],
+                                 systemChange[field][1]))
+        return result_list
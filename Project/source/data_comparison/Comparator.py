@@ -2,14 +2,26 @@ from data_parsing.Planet import *
 from data_parsing.Star import *
 from data_parsing.System import *
 from data_comparison.proposed_change import *
+from data_parsing.schema import MISSING
+from data_parsing.CatalogueIndex import cleanName
+
+# (relative, absolute) tolerance under which two numeric values of a field are
+# considered equal, so that unit conversion and formatting noise (1.30 against
+# 1.3000001) is not reported as a change
+DEFAULT_TOLERANCE = (1e-6, 0.0)
 
 
 class Comparator():
-    def __init__(self, obj1, obj2, origin):
-        '''(PlanetaryObject, PlanetaryObject, str) -> NoneTye
+    def __init__(self, obj1, obj2, origin, tolerances=None,
+                 useErrorBars=False):
+        '''(PlanetaryObject, PlanetaryObject, str, dict, bool) -> NoneTye
         sets up the comparator with two objects of PlanetaryObject
         type of two objects must match
         str must be one of {"NASA archive", "exoplanet.eu"}
+        tolerances maps the names of float fields to the (relative, absolute)
+        tolerances overriding DEFAULT_TOLERANCE for them
+        if useErrorBars is true, a numeric difference is only reported when
+        it falls outside the combined error bars of the two objects
 
         raises ObjectTypeMismatchException is objects do not match
         returns NoneType
@@ -20,6 +32,12 @@ class Comparator():
             self.obj2 = obj2
             self.working_type = type(obj1)
             self.origin = origin
+            if tolerances is None:
+                tolerances = {}
+            self.tolerances = tolerances
+            self.useErrorBars = useErrorBars
+            # planet matching of starCompare, computed on first use
+            self._planetMatches = None
         else:
             raise ObjectTypeMismatchException
 
@@ -52,23 +70,23 @@ class Comparator():
                 # fields not appearing in either data set
                 missing_keys.append(key)
             if key == "":
-                left_data[key] = "N/A"
-                result_dict['data'].append("N/A")
+                left_data[key] = MISSING
+                result_dict['data'].append(MISSING)
             else:
                 result_dict['data'].append(key)
 
         # generate entries of left and right based on sql join logic
         for key in result_dict['data']:
-            if left_data[key] == "":
+            if left_data[key] is MISSING or left_data[key] == "":
                 # left missing
-                left_data[key] = "N/A"
-                result_dict['left'].append("N/A")
+                left_data[key] = MISSING
+                result_dict['left'].append(MISSING)
             else:
                 # exists in left
                 result_dict['left'].append(left_data[key])
             if key in missing_keys or key == "":
                 # right missing
-                result_dict['right'].append("N/A")
+                result_dict['right'].append(MISSING)
             else:
                 # exists in right
                 result_dict['right'].append(right_data[key])
@@ -86,7 +104,8 @@ class Comparator():
 
         # remove entries not including new or missing fields
         for i in range(0, entry_count):
-            if ((raw_dict['right'] == "N/A") or (raw_dict['left'] == "N/A")):
+            if ((raw_dict['right'] is MISSING) or (
+                    raw_dict['left'] is MISSING)):
                 raw_dict['data'].pop(i)
                 raw_dict['left'].pop(i)
                 raw_dict['right'].pop(i)
@@ -105,56 +124,81 @@ class Comparator():
         for key in left_data:
             # this only gets data in both sets
             if key in right_data:
-                # try to numerical compare                    
-                try:
-                    if (float(left_data[key]) != float(right_data[key])):
-                        result_dict[key] = (
-                            float(left_data[key]), float(right_data[key]))
-                        # otherwise just normal compare
-                except ValueError:
-                    if (left_data[key].lower() != right_data[key].lower()):
-                        result_dict[key] = (left_data[key], right_data[key])
+                left = left_data[key]
+                right = right_data[key]
+                # the values are typed when they are read (see schema), so
+                # only numbers are compared numerically
+                if left.__class__ is float and right.__class__ is float:
+                    if self.isSignificant(key, left, right):
+                        result_dict[key] = (left, right)
+                # text is compared regardless of case
+                elif left.__class__ is str and right.__class__ is str:
+                    if left.lower() != right.lower():
+                        result_dict[key] = (left, right)
+                elif left != right:
+                    result_dict[key] = (left, right)
         return result_dict
 
+    def isSignificant(self, field, left, right):
+        '''(str, float, float) -> bool
+        Returns whether the difference between the value left of obj1 and
+        the value right of obj2 for the field is large enough to be reported.
+        Differences within the tolerance of the field are ignored and, if
+        error bars are used, so are the differences within the combined error
+        bars of both objects.
+        '''
+        if left == right:
+            return False
+        (relative, absolute) = self.tolerances.get(field, DEFAULT_TOLERANCE)
+        difference = abs(left - right)
+        if difference <= max(relative * max(abs(left), abs(right)),
+                             absolute):
+            return False
+        if self.useErrorBars:
+            # the bars facing each other are the ones that can overlap
+            if left > right:
+                bars = (errorBar(self.obj1, field, "errorminus") +
+                        errorBar(self.obj2, field, "errorplus"))
+            else:
+                bars = (errorBar(self.obj1, field, "errorplus") +
+                        errorBar(self.obj2, field, "errorminus"))
+            if difference <= bars:
+                return False
+        return True
+
     def proposedChangeStarCompare(self):
         '''() -> list
         Similar to starCompare but returns a list of Addition
         and Modification Objects
+        Only the star data changes, the planet data changes and the new
+        planets are computed; the other parts of the comparison are skipped
         '''
-        # why is variable a list?
-        result_dict = []
-
-        main_dictionary = self.starCompare()
+        result_list = []
 
         # return list of proposed changes of the planets in star
-        for planet in main_dictionary["planetDC"]:
-            for field in main_dictionary["planetDC"][planet]:
-                if main_dictionary["planetDC"][
-                    planet][field][0] != "N/A" and main_dictionary["planetDC"][
-                    planet][field][0] != "":
-                    result_dict.append(
-                        Modification(self.origin,
-                                     self.obj2.nameToPlanet[planet],
-                                     self.obj1.planetObjects[0], field,
-                                     main_dictionary["planetDC"][
-                                         planet][field][0],
-                                     main_dictionary["planetDC"][
-                                         planet][field][1])
-                    )
-        for field in main_dictionary["starC"]:
-            if ((main_dictionary["starC"][field][0] != "N/A") and (
-                        main_dictionary["starC"][field][0] != "")):
-                result_dict.append(
+        for (key, planet, match, planetCompare) in self.matchPlanets()[0]:
+            planetChange = planetCompare.innerJoinDiff()
+            for field in planetChange:
+                if ((planetChange[field][0] is not MISSING) and (
+                            planetChange[field][0] != "")):
+                    result_list.append(
+                        Modification(self.origin, match, planet, field,
+                                     planetChange[field][0],
+                                     planetChange[field][1]))
+        starChange = self.innerJoinDiff()
+        for field in starChange:
+            if ((starChange[field][0] is not MISSING) and (
+                        starChange[field][0] != "")):
+                result_list.append(
                     Modification(self.origin,
                                  self.obj2, self.obj1, field,
-                                 main_dictionary["starC"][field][0],
-                                 main_dictionary["starC"][field][1]))
-        for planet in main_dictionary["planetA"]:
-            result_dict.append(Addition(self.origin, main_dictionary["planetA"][
-                planet]))
-        i = 0
+                                 starChange[field][0],
+                                 starChange[field][1]))
+        planetsAddition = self.matchPlanets()[1]
+        for planet in planetsAddition:
+            result_list.append(Addition(self.origin, planetsAddition[planet]))
 
-        return result_dict
+        return result_list
 
     def starCompare(self):
         '''() -> Dictionary
@@ -162,7 +206,9 @@ class Comparator():
         Will find differing data for both the star and any planets
         attached to the system
 
-        Returns a dictionary of dictionaries
+        Returns a dictionary of dictionaries. The entries are computed the
+        first time they are read (see CompareResult), so a caller only pays
+        for the parts of the comparison it uses.
 
         Main dictionary contains:
           starC: dict of mismatched/CHANGED star data
@@ -170,12 +216,12 @@ class Comparator():
             generated by innerJoinDiff()
           starN: dict of NEW star data
             keys: star fields
-            generated by sqlJoinNewOnly(True)
+            generated by sqlJoin(True)
           planetN: dict of NEW planets
             keys: left, right
           planetDN: dict of NEW planet data
             keys: planet names
-            generated by sqlJoinNewOnly(True)
+            generated by sqlJoin(True)
           planetDC: dict of mismatched/CHANGED planet data
             keys: planet names
             generated by innerJoinDiff()
@@ -190,76 +236,164 @@ class Comparator():
             # do not call this method for non-stars
             raise ObjectTypeIncompatibleException
         else:
-            # starC
-            starDataChange = self.innerJoinDiff()
-
-            # starN
-            starDataNew = self.sqlJoin(True)
-
-            # planetN
-            newPlanets = {}
-            newPlanets["left"] = list(set(self.obj1.planetObjects) -
-                                      set(self.obj2.planetObjects))
-
-            newPlanets["right"] = list(set(self.obj2.planetObjects) -
-                                       set(self.obj1.planetObjects))
-
-            # planetDN and DC:
-            newPlanetsData = {}
-            planetsDataChange = {}
-
-            # examine all planets attached to system
-            planetsAddition = {}
-
-            for planet in self.obj1.planetObjects:
-                # if (planet in self.obj2.planetObjects):
-                found = 0
-                for planetName in self.obj2.nameToPlanet:
-                    cleanName = ''.join(
-                        ch for ch in planet.name if
-                        ch.isalnum()).lower()
-                    if (planet.name == planetName):
-                        # create comparartor instance on planets
-                        planetCompare = Comparator(planet,
-                                                   self.obj2.nameToPlanet[
-                                                       planet.name],
-                                                   self.origin)
-                        # get dictionary of new planet data for that planet
-                        newPlanetsData[planet.name] = planetCompare.sqlJoin(
-                            True)
-                        # get dictionary of changed planet data for that planet
-                        planetsDataChange[planet.name] = \
-                            planetCompare.innerJoinDiff()
-                        found = 1
-                    elif (cleanName == ''.join(
-                            ch for ch in planetName if
-                            ch.isalnum()).lower()):
-                        # create comparartor instance on planets
-                        planetCompare = Comparator(planet,
-                                                   self.obj2.nameToPlanet[
-                                                       cleanName],
-                                                   self.origin)
-                        # get dictionary of new planet data for that planet
-                        newPlanetsData[cleanName] = planetCompare.sqlJoin(
-                            True)
-                        # get dictionary of changed planet data for that planet
-                        planetsDataChange[cleanName] = \
-                            planetCompare.innerJoinDiff()
-                        found = 1
-
-                if found == 0:
-                    planetsAddition[planet.name] = planet
-
-            # generates output
-            output_dict = {}
-            output_dict["starC"] = starDataChange
-            output_dict["starN"] = starDataNew
-            output_dict["planetN"] = newPlanets
-            output_dict["planetDN"] = newPlanetsData
-            output_dict["planetDC"] = planetsDataChange
-            output_dict["planetA"] = planetsAddition
-
-            return output_dict
+            return CompareResult({
+                # starC
+                "starC": self.innerJoinDiff,
+                # starN
+                "starN": lambda: self.sqlJoin(True),
+                # planetN
+                "planetN": self.newPlanets,
+                # planetDN
+                "planetDN": lambda: dict(
+                    (match[0], match[3].sqlJoin(True)) for match in
+                    self.matchPlanets()[0]),
+                # planetDC
+                "planetDC": lambda: dict(
+                    (match[0], match[3].innerJoinDiff()) for match in
+                    self.matchPlanets()[0]),
+                # planetA
+                "planetA": lambda: self.matchPlanets()[1]})
+
+    def newPlanets(self):
+        '''() -> Dictionary
+        Returns a dictionary with keys left and right, mapping to the lists of
+        planet objects found only in obj1 and only in obj2 respectively
+        '''
+        newPlanets = {}
+        newPlanets["left"] = list(set(self.obj1.planetObjects) -
+                                  set(self.obj2.planetObjects))
+
+        newPlanets["right"] = list(set(self.obj2.planetObjects) -
+                                   set(self.obj1.planetObjects))
+        return newPlanets
+
+    def matchPlanets(self):
+        '''() -> (list, Dictionary)
+        Matches the planets of the star obj1 to the planets of the star obj2.
+        Returns a tuple of:
+          a list of (key, planet of obj1, planet of obj2, Comparator) for
+          every planet found in both stars, where key is the name the planet
+          was found under
+          a dictionary mapping the names of the planets found only in obj1 to
+          the planet objects
+        The matching is done once per Comparator and reused afterwards
+        '''
+        if self._planetMatches is not None:
+            return self._planetMatches
+
+        matches = []
+        planetsAddition = {}
+        # resolve each planet of obj1 to its counterpart in obj2 with
+        # direct lookups on the raw name, then on the normalized name
+        nameToPlanet = self.obj2.nameToPlanet
+        cleanNameToPlanet = None
+        for planet in self.obj1.planetObjects:
+            if planet.name in nameToPlanet:
+                key = planet.name
+                match = nameToPlanet[key]
+            else:
+                key = cleanName(planet.name)
+                match = nameToPlanet.get(key)
+                if match is None:
+                    # only index the normalized aliases of obj2 when a
+                    # planet can not be found under its own names
+                    if cleanNameToPlanet is None:
+                        cleanNameToPlanet = buildCleanNameIndex(
+                            nameToPlanet)
+                    match = cleanNameToPlanet.get(key)
+
+            if match is None:
+                planetsAddition[planet.name] = planet
+            else:
+                # create one comparator instance per matched planet
+                matches.append(
+                    (key, planet, match,
+                     Comparator(planet, match, self.origin, self.tolerances,
+                                self.useErrorBars)))
+
+        self._planetMatches = (matches, planetsAddition)
+        return self._planetMatches
+
+
+class CompareResult(dict):
+    '''
+    Dictionary whose entries are computed on demand. It is created from a
+    dictionary mapping each key to a function with no arguments; the function
+    is called the first time its key is read and the value is kept from then
+    on.
+    '''
+
+    def __init__(self, loaders):
+        dict.__init__(self)
+        self._loaders = loaders
+
+    def __missing__(self, key):
+        if key not in self._loaders:
+            raise KeyError(key)
+        value = self._loaders[key]()
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, key, default=None):
+        if key in self._loaders:
+            return self[key]
+        return default
+
+    def keys(self):
+        return self._loaders.keys()
+
+    def values(self):
+        return [self[key] for key in self._loaders]
+
+    def items(self):
+        return [(key, self[key]) for key in self._loaders]
+
+    def isComputed(self, key):
+        '''(str) -> bool
+        Returns whether the entry for key has already been computed
+        '''
+        return dict.__contains__(self, key)
+
+
+def errorBar(obj, field, attribute):
+    '''(PlanetaryObject, str, str) -> float
+    Returns the size of the error bar attribute ("errorplus" or "errorminus")
+    of the field of obj, or 0 if the object has no usable value for it
+    '''
+    try:
+        return abs(float(getattr(obj, "errors", {}).get(field + attribute, 0)))
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def buildCleanNameIndex(nameToObject):
+    '''(dict of str: PlanetaryObject) -> dict of str: PlanetaryObject
+    Returns a dictionary mapping the normalized version of every name in
+    nameToObject to its object. The first name to normalize to a given key
+    wins.
+    '''
+    index = {}
+    for name in nameToObject:
+        index.setdefault(cleanName(name), nameToObject[name])
+    return index
 
 
 class ObjectTypeMismatchException(Exception):
@@ -1,4 +1,40 @@
+import hashlib
 from datetime import datetime as dt
+from data_parsing import schema
+
+
+# colours of the values of the origin catalogue and of Open Exoplanet
+# Catalogue in fancyStr
+ORIGIN_COLOUR = "\x1b[2;30;42m"
+OEC_COLOUR = "\x1b[6;30;41m"
+END_COLOUR = "\x1b[0m"
+
+ADDITION_TEMPLATE = (
+    "Proposed addition:\n\n"
+    "Name of object added : {name}\n"
+    "Origin : {origin}\n"
+    "Type of object: {kind}\n"
+    "Last modified by {origin} on: {lastupdate}\n"
+    "Stats:\n"
+    "{stats}\n")
+
+MODIFICATION_TEMPLATE = (
+    "Proposed modification:\n\n"
+    "Name of object modified: {name}\n"
+    "Origin : {origin}\n"
+    "Type of object modified: {kind}\n"
+    "{system}"
+    "Field modified: {field}\n"
+    "Last modified by {origin} on: {lastupdate}\n"
+    "Value according to {origin}: {originValue}\n"
+    "Value according to Open Exoplanet Catalogue: {OECValue}\n"
+    "{limits}")
+
+# the text shown for each change by render_changes, as show_number prints it
+SHOWN_CHANGE_TEMPLATE = \
+    "\nShowing number : {number} (id {id})\n\n{change}\n\n"
+# the number of characters of the ids shown
+SHOWN_ID_LENGTH = 12
 
 
 class ProposedChange:
@@ -7,44 +43,119 @@ class ProposedChange:
     Modicfication
     
     origin must be one of {"NASA archive", "exoplanet.eu"}
+
+    Every change has an id derived from its content (see getId), which equal
+    changes share, and which stays the same from one update to the next.
+    The texts of str() and fancyStr() are rendered once and cached in the
+    change, until one of its attributes is set, unless the class does not
+    cache them. They are not pickled.
     '''
 
+    # whether the texts of the change are cached
+    _CACHED = True
+    # attributes holding the cached texts of the change
+    _RENDERED = ("_str", "_fancyStr")
+    # attributes that are not shown in the texts of the change
+    _NOT_RENDERED = _RENDERED + ("_index",)
+
     def __init__(self, origin):
         self.origin = origin
 
+    def __setattr__(self, name, value):
+        if name not in ProposedChange._NOT_RENDERED:
+            for rendered in ProposedChange._RENDERED:
+                self.__dict__.pop(rendered, None)
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        ''' () -> dict
+        Return the attributes of the change to pickle, without its cached
+        texts
+        '''
+        state = self.__dict__.copy()
+        for rendered in ProposedChange._RENDERED:
+            state.pop(rendered, None)
+        return state
+
+    def __str__(self):
+        if not self._CACHED:
+            return self.render()
+        text = self.__dict__.get("_str")
+        if text is None:
+            text = self._str = self.render()
+        return text
+
+    def fancyStr(self):
+        """ () -> str
+        Return a fancier, coloured version of __str__()
+        """
+        if not self._CACHED:
+            return self.render(fancy=True)
+        text = self.__dict__.get("_fancyStr")
+        if text is None:
+            text = self._fancyStr = self.render(fancy=True)
+        return text
+
+    def render(self, fancy=False):
+        """ (bool) -> str
+        Return the text of the change, coloured if fancy. The text is built
+        every time, str() and fancyStr() cache it
+        """
+        raise NotImplementedError
+
+    def identity(self):
+        """ () -> [str]
+        Return the texts of the values which make the change the change it
+        is, those compared by __eq__
+        """
+        raise NotImplementedError
+
+    def getId(self):
+        """ () -> str
+        Return the id of the change: the SHA-1 of its identity, in hex
+        """
+        text = "\x1f".join(self.identity())
+        return hashlib.sha1(text.encode("UTF-8")).hexdigest()
+
 
 class Addition(ProposedChange):
     '''
     object_ptr is the pointer to PlanetaryObject instance to be added.
+
+    The text of an addition shows the object added as it is when shown, so it
+    is not cached: setting a field of the object does not set an attribute
+    of the addition.
     '''
 
+    _CACHED = False
+
     def __init__(self, origin, object_ptr):
         self.object_ptr = object_ptr
         self.lastupdate = object_ptr.lastupdate
         ProposedChange.__init__(self, origin)
 
-    def __str__(self):
-        s = "Proposed addition:\n\n"
-        s += "Name of object added : "
-        s += self.object_ptr.name
-        s += "\nOrigin : "
-        s += str(self.origin)
-        s += "\n"
-        s += "Type of object: "
-        s += self.object_ptr.__class__.__name__
-        s += "\n"
-        s += "Last modified by "
-        s += str(self.origin)
-        s += " on: "
-        s += self.lastupdate
-        s += "\n"
-        s += "Stats:\n"
-        s += str(self.object_ptr)
-        s += "\n"
-        return s
-
-    def fancyStr(self):
-        return str(self)
+    def render(self, fancy=False):
+        """ (bool) -> str
+        Return the text of the addition, the same whether fancy or not
+        """
+        return ADDITION_TEMPLATE.format(
+            name=self.object_ptr.name, origin=self.origin,
+            kind=self.object_ptr.__class__.__name__,
+            lastupdate=self.lastupdate, stats=self.object_ptr)
+
+    def identity(self):
+        """ () -> [str]
+        Return the type, origin and name of the addition, and the fields and
+        values of the object added
+        """
+        data = self.object_ptr.data
+        fields = sorted(str(field) for field in data)
+        values = dict((str(field), data[field]) for field in data)
+        result = ["Addition", str(self.origin), self.object_ptr.name]
+        for field in fields:
+            result.append(field)
+            result.append(_identityValue(values[field]))
+        return result
 
     def __eq__(self, other):
         return (
@@ -78,7 +189,8 @@ class Modification(ProposedChange):
     Star objects or both Planet objects
     
     field_modified is the name of the field modified.
-    value_in_origin_catalogue / value_in_OEC - may or may not be of type str
+    value_in_origin_catalogue / value_in_OEC - the typed values of the field
+    (see data_parsing.schema), schema.MISSING if there is none
     '''
 
     def __init__(self, origin, OEC_object, origin_object,
@@ -100,6 +212,19 @@ class Modification(ProposedChange):
         self._index = None
         ProposedChange.__init__(self, origin)
 
+    def __setstate__(self, state):
+        """ (dict) -> None
+        Restore an unpickled modification. The values of the modifications
+        pickled before the values were typed are text, they are typed again
+        so that they compare equal to the values of new modifications
+        """
+        self.__dict__.update(state)
+        for attribute in ("value_in_origin_catalogue", "value_in_OEC"):
+            value = getattr(self, attribute, None)
+            if isinstance(value, str):
+                setattr(self, attribute, schema.ingest(self.field_modified,
+                                                       value))
+
     def __eq__(self, other):
         """ (ProposedChange) -> bool
         Return a comparison between the self proposed change and the other
@@ -125,6 +250,21 @@ class Modification(ProposedChange):
     def __ne__(self, other):
         return not (self == other)
 
+    def identity(self):
+        """ () -> [str]
+        Return the type, origin, object, field, date, values and limits of
+        the modification
+        """
+        return (["Modification", str(self.origin), self.OEC_object.name,
+                 self.OEC_object.__class__.__name__, str(self.getSystemName()),
+                 str(self.field_modified),
+                 str(getattr(self, "lastupdate", ""))] +
+                [_identityValue(value) for value in (
+                    self.value_in_OEC, self.value_in_origin_catalogue,
+                    self.OEC_upper, self.OEC_lower, self.origin_upper,
+                    self.origin_lower, self.upper_attrib_name,
+                    self.lower_attrib_name)])
+
     def getUpperLowerAttribs(self):
         """() -> (str, str, str,  str, str)
         Return the upper and lower limit attributes of the numeric field
@@ -138,23 +278,24 @@ class Modification(ProposedChange):
         origin_lower = 'N/A'
         upperAttribName = "N/A"
         lowerAttribName = "N/A"
-        for field in self.OEC_object.errors:
-            if self.field_modified in field and self.field_modified != field:
-                if field[len(self.field_modified):] in upperAttribs:
-                    upperAttribName = field[len(self.field_modified):]
-                    OEC_upper = self.OEC_object.errors[field]
-                if field[len(self.field_modified):] in lowerAttribs:
-                    lowerAttribName = field[len(self.field_modified):]
-                    OEC_lower = self.OEC_object.errors[field]
-
-        for field in self.origin_object.errors:
-            if self.field_modified in field and self.field_modified != field:
-                if field[len(self.field_modified):] in upperAttribs:
-                    upperAttribName = field[len(self.field_modified):]
-                    origin_upper = self.origin_object.errors[field]
-                if field[len(self.field_modified):] in lowerAttribs:
-                    lowerAttribName = field[len(self.field_modified):]
-                    origin_lower = self.origin_object.errors[field]
+        # error bounds are indexed by field name in each object
+        OEC_bounds = self.OEC_object.getErrorBounds(self.field_modified)
+        for attrib in OEC_bounds:
+            if attrib in upperAttribs:
+                upperAttribName = attrib
+                OEC_upper = OEC_bounds[attrib]
+            if attrib in lowerAttribs:
+                lowerAttribName = attrib
+                OEC_lower = OEC_bounds[attrib]
+
+        origin_bounds = self.origin_object.getErrorBounds(self.field_modified)
+        for attrib in origin_bounds:
+            if attrib in upperAttribs:
+                upperAttribName = attrib
+                origin_upper = origin_bounds[attrib]
+            if attrib in lowerAttribs:
+                lowerAttribName = attrib
+                origin_lower = origin_bounds[attrib]
         if OEC_upper == "":
             OEC_upper = "N/A"
         if OEC_lower == "":
@@ -171,103 +312,41 @@ class Modification(ProposedChange):
             OEC_upper, OEC_lower, origin_upper, origin_lower, upperAttribName,
             lowerAttribName)
 
-    def __str__(self):
-        s = "Proposed modification:\n\n"
-        s += "Name of object modified: "
-        s += self.OEC_object.name
-        s += "\nOrigin : "
-        s += str(self.origin)
-        s += "\n"
-        s += "Type of object modified: "
-        s += str(self.OEC_object.__class__.__name__)
-        s += "\n"
-        if self.OEC_object.__class__.__name__ != "System":
-            s += "Part of System: "
-            if self.OEC_object.__class__.__name__ == "Star":
-                s += self.OEC_object.nameSystem
-            elif self.OEC_object.__class__.__name__ == "Planet":
-                s += self.OEC_object.starObject.nameSystem
-            s += "\n"
-        s += "Field modified: "
-        s += str(self.field_modified)
-        s += "\n"
-        s += "Last modified by "
-        s += str(self.origin)
-        s += " on: "
-        s += self.lastupdate
-        s += "\n"
-        s += "Value according to "
-        s += str(self.origin)
-        s += ": "
-        s += str(self.value_in_origin_catalogue)
-        s += "\n"
-        s += "Value according to Open Exoplanet Catalogue: "
-        s += str(self.value_in_OEC)
-        s += "\n"
-        s += "OEC Upper Limit: "
-        s += str(self.OEC_upper)
-        s += "\n"
-        s += "OEC Lower Limit: "
-        s += str(self.OEC_lower)
-        s += "\n"
-        s += "Origin Upper Limit: "
-        s += str(self.origin_upper)
-        s += "\n"
-        s += "Origin Lower Limit: "
-        s += str(self.origin_lower)
-        s += "\n"
-        return s
-
-    def fancyStr(self):
-        """ () -> str
-        Return a fancier, coloured version of __str__()
+    def render(self, fancy=False):
+        """ (bool) -> str
+        Return the text of the modification. If fancy, the values of the
+        origin catalogue and of Open Exoplanet Catalogue are coloured, and
+        the limits of the origin catalogue come first
         """
-        s = "Proposed modification:\n\n"
-        s += "Name of object modified: "
-        s += self.OEC_object.name
-        s += "\nOrigin : "
-        s += str(self.origin)
-        s += "\n"
-        s += "Type of object modified: "
-        s += str(self.OEC_object.__class__.__name__)
-        s += "\n"
-        if self.OEC_object.__class__.__name__ != "System":
-            s += "Part of System: "
-            if self.OEC_object.__class__.__name__ == "Star":
-                s += self.OEC_object.nameSystem
-            elif self.OEC_object.__class__.__name__ == "Planet":
-                s += self.OEC_object.starObject.nameSystem
-            s += "\n"
-        s += "Field modified: "
-        s += str(self.field_modified)
-        s += "\n"
-        s += "Last modified by "
-        s += str(self.origin)
-        s += " on: "
-        s += self.lastupdate
-        s += "\n"
-        s += "Value according to "
-        s += str(self.origin)
-        s += ": "
-        s += "\x1b[2;30;42m" + str(self.value_in_origin_catalogue) + "\x1b[0m"
-        s += "\n"
-        s += "Value according to Open Exoplanet Catalogue: "
-        s += "\x1b[6;30;41m" + str(self.value_in_OEC) + "\x1b[0m"
-        s += "\n"
-        s += "Origin Upper Limit: "
-        s += "\x1b[2;30;42m" + str(self.origin_upper) + "\x1b[0m"
-        s += "\n"
-        s += "Origin Lower Limit: "
-        s += "\x1b[2;30;42m" + str(self.origin_lower) + "\x1b[0m"
-        s += "\n"
-        s += "OEC Upper Limit: "
-        s += "\x1b[6;30;41m" + str(self.OEC_upper) + "\x1b[0m"
-        s += "\n"
-        s += "OEC Lower Limit: "
-        s += "\x1b[6;30;41m" + str(self.OEC_lower) + "\x1b[0m"
-        s += "\n"
-
-        return s
+        kind = self.OEC_object.__class__.__name__
+        system = ""
+        if kind != "System":
+            system = "Part of System: " + self.getSystemName() + "\n"
+        OECLimits = [("OEC", self.OEC_upper, self.OEC_lower)]
+        originLimits = [("Origin", self.origin_upper, self.origin_lower)]
+        if fancy:
+            origin = (ORIGIN_COLOUR, END_COLOUR)
+            OEC = (OEC_COLOUR, END_COLOUR)
+            limits = originLimits + OECLimits
+        else:
+            origin = OEC = ("", "")
+            limits = OECLimits + originLimits
+        colours = {"OEC": OEC, "Origin": origin}
+        limitLines = []
+        for (catalogue, upper, lower) in limits:
+            start, end = colours[catalogue]
+            limitLines.append("%s Upper Limit: %s%s%s\n" % (
+                catalogue, start, upper, end))
+            limitLines.append("%s Lower Limit: %s%s%s\n" % (
+                catalogue, start, lower, end))
+        return MODIFICATION_TEMPLATE.format(
+            name=self.OEC_object.name, origin=self.origin, kind=kind,
+            system=system, field=self.field_modified,
+            lastupdate=self.lastupdate,
+            originValue=origin[0] + str(self.value_in_origin_catalogue) +
+            origin[1],
+            OECValue=OEC[0] + str(self.value_in_OEC) + OEC[1],
+            limits="".join(limitLines))
 
     def get_object_name(self):
         '''
@@ -300,6 +379,21 @@ class Modification(ProposedChange):
         return self.OEC_object.__class__.__name__
 
 
+def _identityValue(value):
+    '''
+    (object) -> str
+
+    Returns the text of value in the identity of a change, which is the same
+    for the values which compare equal: numbers are written as floats, and
+    the planetary objects by their type
+    '''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return schema.formatValue(float(value))
+    if hasattr(value, "data") and hasattr(value, "name"):
+        return value.__class__.__name__
+    return schema.formatValue(value)
+
+
 def merge_changes(first, second):
     '''
     ([ProposedChange], [ProposedChange]) -> [ProposedChange]
@@ -416,3 +510,36 @@ def sort_changes(changes_list):
     merge_sort_changes.
     '''
     changes_list = merge_sort_changes(changes_list)
+
+
+def render_changes(numbered_changes):
+    '''
+    (iterator of (int, ProposedChange)) -> iterator of str
+
+    Yields the text of each change with its number, as show_number shows it.
+    The texts are rendered one change at a time, as they are needed.
+    '''
+    for (number, change) in numbered_changes:
+        yield SHOWN_CHANGE_TEMPLATE.format(
+            number=number, id=change.getId()[:SHOWN_ID_LENGTH], change=change)
+
+
+def write_paged(texts, page_size, out, more=None):
+    '''
+    (iterator of str, int, file, function) -> int
+
+    Writes the texts to out as they are produced, flushing out after every
+    page of page_size texts. If more is given, it is called between the pages
+    and the writing stops when it returns False. Returns the number of texts
+    written.
+    '''
+    written = 0
+    for text in texts:
+        if written and written % page_size == 0:
+            out.flush()
+            if more is not None and not more():
+                break
+        out.write(text)
+        written += 1
+    out.flush()
+    return written
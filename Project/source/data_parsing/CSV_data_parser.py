@@ -129,7 +129,7 @@ def buildPlanet(line, heads, wanted, source, errors=None):
             val = val[1:]
         if val == "inf" or val == "nan":
             val = "N/A"
-        planet.errors[i] = val
+        planet.addError(i, val)
     return planet
 
 
@@ -299,7 +299,7 @@ def buildStar(line, heads, source, errors=None):
         val = line[_error_field[i]]
         if val.startswith("-"):
             val = val[1:]
-        star.errors[i] = val
+        star.addError(i, val)
     return star
 
 
@@ -0,0 +1,69 @@
+def cleanName(name):
+    '''
+    (str) -> str
+    Returns the name with every non alphanumeric character removed, in lower
+    case. Used to match objects whose names are formatted differently.
+    '''
+    return ''.join(ch for ch in name if ch.isalnum()).lower()
+
+
+class CatalogueIndex:
+    '''
+    Maps the names and alternate names of the systems, stars and planets of
+    the catalogue to where they are in the catalogue repository: the path of
+    their system file, and the path of their element from the root of that
+    file, ex: ("systems/Kepler-16.xml", "binary[1]/star[2]"). The path of a
+    system is ".".
+    '''
+
+    def __init__(self):
+        # (type, name) -> [(systemName, filename, elementPath)], a name may
+        # be used by more than one system
+        self.locations = dict()
+
+    def __len__(self):
+        return len(self.locations)
+
+    def add(self, kind, names, systemName, filename, elementPath):
+        '''
+        (str, [str], str, str, str) -> None
+        Index the object of type kind ("System", "Star" or "Planet") known
+        under names, found at elementPath in the file of its system
+        '''
+        location = (systemName, filename, elementPath)
+        for name in names:
+            for key in {name, cleanName(name)}:
+                found = self.locations.setdefault((kind, key), [])
+                if location not in found:
+                    found.append(location)
+
+    def lookup(self, kind, name, systemName=None):
+        '''
+        (str, str, str) -> (str, str)
+        Returns the filename and element path of the object of type kind
+        known under name, or None if it is not indexed. If the name is used in
+        more than one system, the one in systemName is returned, or None if
+        none of them is
+        '''
+        found = self.locations.get((kind, name))
+        if found is None:
+            found = self.locations.get((kind, cleanName(name)))
+        if not found:
+            return None
+        if len(found) > 1:
+            found = [location for location in found
+                     if location[0] == systemName]
+            if len(found) != 1:
+                return None
+        return found[0][1:]
+
+    def update(self, other):
+        '''
+        (CatalogueIndex) -> None
+        Adds every location of the index other to the index
+        '''
+        for key in other.locations:
+            found = self.locations.setdefault(key, [])
+            for location in other.locations[key]:
+                if location not in found:
+                    found.append(location)
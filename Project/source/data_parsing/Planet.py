@@ -2,6 +2,9 @@ from data_parsing.PlanetaryObject import *
 
 
 class Planet(PlanetaryObject):
+    __slots__ = ("nameStar", "starObject", "starObjectNamesToStar",
+                 "otherNamesPlanet", "otherNamesStar")
+
     def __init__(self, name):
         # data fields in the planet
         # self.data = {"namePlanet": name}
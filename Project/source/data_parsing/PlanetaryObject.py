@@ -1,4 +1,79 @@
+import sys
+from data_parsing import schema
+
+# attributes holding the upper and lower error bounds of a field; an error
+# bound is stored under the name of its field followed by the attribute,
+# ex: "masserrorplus"
+UPPER_ERROR_ATTRIBS = ("errorplus", "upperlimit")
+LOWER_ERROR_ATTRIBS = ("errorminus", "lowerlimit")
+# the classes of the values shown by __str__ as a reference to an object
+_RENDERED_AS_REFERENCE = frozenset(["Planet", "Star", "System",
+                                    "PlanetaryObject"])
+
+
+class ErrorBounds(dict):
+    '''
+    The errors dictionary of a planetary object, mapping the names of the
+    error bounds to their values. The bounds are indexed by field name when
+    they are first looked up, and every write to the dictionary drops the
+    index, so that it is never stale.
+    '''
+    __slots__ = ("_index",)
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._index = None
+
+    def __reduce__(self):
+        # the index is not pickled, it is built again when needed
+        return (self.__class__, (dict(self),))
+
+    def __setitem__(self, name, val):
+        dict.__setitem__(self, name, val)
+        self._index = None
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        self._index = None
+
+    def clear(self):
+        dict.clear(self)
+        self._index = None
+
+    def pop(self, *args):
+        self._index = None
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._index = None
+        return dict.popitem(self)
+
+    def setdefault(self, name, val=None):
+        self._index = None
+        return dict.setdefault(self, name, val)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._index = None
+
+    def forField(self, field):
+        '''(str) -> Dict of str
+        Returns a dictionary mapping the error attributes of the field to
+        their values, see PlanetaryObject.getErrorBounds
+        '''
+        if self._index is None:
+            index = dict()
+            for name in self:
+                _indexError(index, name, self[name])
+            self._index = index
+        return self._index.get(field, {})
+
+
 class PlanetaryObject:
+    # the attributes are kept in slots rather than in a __dict__, every
+    # subclass lists the attributes it adds
+    __slots__ = ("data", "name", "_errors", "lastupdate")
+
     def __init__(self, name=None):
         self.data = dict()
         self.name = self._fixStr(name)
@@ -14,42 +89,73 @@ class PlanetaryObject:
         PlanetaryObject, including all the keys and corresponding data values;
         If references to other planetary objects are present, they are ignored.
         '''
-        list_objects = ["Planet", "Star", "System", "PlanetaryObject"]
-        s = ""
-        s += "Object type : "
-        s += self.__class__.__name__
-        s += "\n"
-        s += "Name: "
-        s += self.name
-        s += "\n"
-        for key in self.data.keys():
-            s += str(key)
-            s += " :   "
-            if self.data[key].__class__.__name__ in list_objects:
-                s += "Points to an instance of class "
-                s += self.data[key].__class__.__name__
-            elif str(self.data[key]) == "":
-                s += 'N/A'
+        parts = ["Object type : ", self.__class__.__name__, "\n",
+                 "Name: ", self.name, "\n"]
+        for key in self.data:
+            val = self.data[key]
+            if val.__class__.__name__ in _RENDERED_AS_REFERENCE:
+                val = "Points to an instance of class " + \
+                    val.__class__.__name__
             else:
-                s += str(self.data[key])
-            s += "\n"
-        s += "\n"
-        return s
+                val = str(val) or "N/A"
+            parts.extend((str(key), " :   ", val, "\n"))
+        parts.append("\n")
+        return "".join(parts)
+
+    def __getstate__(self):
+        '''() -> Dict of Objects
+        Returns the attributes of the planetary object, for pickling
+        '''
+        state = dict()
+        for attribute in _slotNames(self.__class__):
+            if hasattr(self, attribute):
+                state[attribute] = getattr(self, attribute)
+        return state
+
+    def __setstate__(self, state):
+        '''(Dict of Objects) -> None
+        Restores the attributes of an unpickled planetary object. The state is
+        a dictionary of attributes, as pickled from the objects which had a
+        __dict__ as well as from the slotted ones. Attributes that the class
+        no longer has are dropped, and the values of the fields are typed
+        '''
+        if isinstance(state, tuple):
+            # (__dict__, slots) as pickled by the default protocol
+            merged = dict(state[0] or {})
+            merged.update(state[1] or {})
+            state = merged
+        slots = _slotNames(self.__class__)
+        for attribute in state:
+            if attribute in slots:
+                setattr(self, attribute, state[attribute])
+        # the errors dictionary was kept in the errors attribute
+        if "errors" in state:
+            self.errors = state["errors"]
+        # objects pickled before the values were typed hold text
+        data = getattr(self, "data", None)
+        if data:
+            for field in data:
+                if not isinstance(data[field], PlanetaryObject):
+                    data[field] = schema.ingest(field, data[field])
 
     def addVal(self, name, val):
         '''(str, Object) -> None
-        Adds a key value pair to the database in the planetary object
+        Adds a key value pair to the database in the planetary object. The
+        value is converted to the type of the field, missing values are
+        stored as schema.MISSING
         '''
-        if isinstance(name, str):
-            name = self._fixStr(name)
+        known = schema.FIELDS.get(name)
+        if known is not None:
+            # the registered fields are clean already
+            name = known
+        elif isinstance(name, str):
+            name = schema.field(sys.intern(self._fixStr(name)))
 
         if isinstance(val, PlanetaryObject):
             self.data[name] = val
-        elif isinstance(val, str):
-            self.data[name] = self._fixStr(val)
         else:
-            val = self._fixVal(val)
-            self.data[name] = val
+            # known fields are stored as typed values, see schema
+            self.data[name] = schema.ingest(name, val)
 
     def addValList(self, name, val):
         '''(str, Object) -> None
@@ -103,18 +209,41 @@ class PlanetaryObject:
         '''
         return self.data[name]
 
+    @property
+    def errors(self):
+        '''
+        The error bounds of the planetary object, an ErrorBounds dictionary
+        '''
+        return self._errors
+
+    @errors.setter
+    def errors(self, errors):
+        if not isinstance(errors, ErrorBounds):
+            errors = ErrorBounds(errors)
+        self._errors = errors
+
+    def addError(self, name, val):
+        '''(str, Object) -> None
+        Stores the error bound val under name in the errors dictionary of the
+        planetary object
+        '''
+        if isinstance(name, str):
+            name = sys.intern(name)
+        self.errors[name] = val
+
+    def getErrorBounds(self, field):
+        '''(str) -> Dict of str
+        Returns a dictionary mapping the error attributes of the field
+        (one of UPPER_ERROR_ATTRIBS or LOWER_ERROR_ATTRIBS) to their values,
+        in the order they were added to the errors dictionary
+        '''
+        errors = getattr(self, "_errors", None)
+        if errors is None:
+            return {}
+        return errors.forField(field)
+
     def _fixVal(self, val):
-        temp = None
-        if (val != ''):
-            try:
-                temp = float(val)
-            except ValueError:
-                temp = val
-            except TypeError:
-                temp = "N/A"
-        else:
-            temp = "N/A"
-        return temp
+        return schema.parseValue(val)
 
     def _fixStr(self, val):
         """ (str) -> str
@@ -124,3 +253,35 @@ class PlanetaryObject:
             return val.replace("\"", "").strip()
         else:
             return val
+
+
+def _indexError(errorIndex, name, val):
+    '''(Dict of Dict, str, Object) -> None
+    Adds the error bound val stored under name to errorIndex, if name is a
+    field name followed by a known error attribute
+    '''
+    if not isinstance(name, str):
+        return
+    for attrib in UPPER_ERROR_ATTRIBS + LOWER_ERROR_ATTRIBS:
+        if name.endswith(attrib) and len(name) > len(attrib):
+            field = sys.intern(name[:-len(attrib)])
+            errorIndex.setdefault(field, dict())[attrib] = val
+            return
+
+
+def _slotNames(cls):
+    '''(type) -> frozenset of str
+    Returns the names of the slots of the class and of its parents
+    '''
+    names = _slotNamesByClass.get(cls)
+    if names is None:
+        names = set()
+        for klass in cls.__mro__:
+            slots = klass.__dict__.get("__slots__", ())
+            names.update([slots] if isinstance(slots, str) else slots)
+        names = _slotNamesByClass[cls] = frozenset(names)
+    return names
+
+
+# the slots of each class, see _slotNames
+_slotNamesByClass = dict()
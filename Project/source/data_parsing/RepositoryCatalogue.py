@@ -0,0 +1,144 @@
+import collections
+import subprocess
+import xml.etree.ElementTree as ET
+
+from data_parsing.XML_data_parser import buildSystem
+from data_parsing.CatalogueIndex import CatalogueIndex
+from github.gitBackend import GitBackend, GitError
+
+# directory of the system files in the catalogue repository
+SYSTEMS_DIR = "systems"
+
+
+class SystemFile:
+    '''
+    The planetary objects built from one system file of the catalogue, in the
+    same form as the result of buildSystemFromXML, along with their index
+    '''
+
+    def __init__(self, path, data):
+        '''
+        (str, bytes) -> NoneType
+        Builds the objects of the system file at path, whose content is data
+        '''
+        self.result = ([], [], [], dict(), dict(), dict())
+        self.index = CatalogueIndex()
+        root = ET.fromstring(data)
+        # a file holds a single system, but the dump may wrap it
+        systemsXML = [root] if root.tag == "system" else root.iter("system")
+        for systemXML in systemsXML:
+            buildSystem(systemXML, *self.result, index=self.index,
+                        filename=path)
+
+
+class RepositoryCatalogue:
+    '''
+    Loads the catalogue from the system files of a clone of the catalogue
+    repository, instead of the gzip dump. The objects of each file are cached
+    by the git blob sha of the file, and when the repository moves to another
+    commit only the files that git diff reports as changed are parsed again.
+    '''
+
+    def __init__(self, repo, rev="HEAD"):
+        '''
+        (str, str) -> NoneType
+        Creates a catalogue for the repository at the path repo, read at the
+        commit rev
+        '''
+        self.repo = repo
+        self.rev = rev
+        # commit the files were last loaded from
+        self.commit = None
+        # path -> blob sha of the system files, in path order
+        self.blobs = collections.OrderedDict()
+        # (path, blob sha) -> SystemFile, the path is part of the key as the
+        # objects know the file they are in
+        self.cache = dict()
+        # number of files parsed by the last load
+        self.parsed = 0
+
+    def _git(self, *args):
+        '''
+        (str, ...) -> [str]
+        Runs a git command in the repository, and returns the NUL separated
+        fields of its output
+        '''
+        try:
+            output = subprocess.check_output(("git",) + args, cwd=self.repo,
+                                             stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError as error:
+            raise GitError("git " + " ".join(args) + " failed") from error
+        return [field for field in output.decode("UTF-8").split("\0")
+                if field]
+
+    def _listBlobs(self, commit, paths=None):
+        '''
+        (str, [str]) -> {str: str}
+        Returns the blob sha of the system files of commit, only of the given
+        paths if paths is given
+        '''
+        blobs = dict()
+        args = ["ls-tree", "-r", "-z", commit, "--"]
+        for entry in self._git(*(args + (paths or [SYSTEMS_DIR]))):
+            info, path = entry.split("\t", 1)
+            mode, kind, sha = info.split()
+            if kind == "blob" and path.endswith(".xml"):
+                blobs[path] = sha
+        return blobs
+
+    def load(self):
+        '''
+        () -> bool
+        Brings the cache up to date with the commit rev of the repository.
+        The first load parses every system file; the next ones only parse the
+        files changed since the last load. Returns whether anything changed
+        '''
+        with GitBackend(self.repo) as backend:
+            commit = backend.resolve(self.rev)
+            if commit is None:
+                raise GitError("no commit " + self.rev + " in " + self.repo)
+            self.parsed = 0
+            if commit == self.commit:
+                return False
+            if self.commit is None:
+                blobs = self._listBlobs(commit)
+                self.blobs.clear()
+            else:
+                # a renamed file is both removed and added
+                changed = self._git("diff", "--name-only", "--no-renames",
+                                    "-z", self.commit, commit, "--",
+                                    SYSTEMS_DIR)
+                blobs = self._listBlobs(commit, changed) if changed else {}
+                for path in changed:
+                    self.blobs.pop(path, None)
+            for path in blobs:
+                if (path, blobs[path]) not in self.cache:
+                    sha, kind, data = backend.readObject(blobs[path])
+                    self.cache[(path, sha)] = SystemFile(path, data)
+                    self.parsed += 1
+            self.blobs.update(blobs)
+            self.blobs = collections.OrderedDict(sorted(self.blobs.items()))
+            # drop the files which are no longer in the repository
+            for key in set(self.cache) - set(self.blobs.items()):
+                del self.cache[key]
+            self.commit = commit
+        return True
+
+    def build(self, index=None):
+        '''
+        (CatalogueIndex) -> ([System], [Star], [Planet], {systemName: System},
+                             {starName: Star}, {planetName: Planet})
+        Returns the catalogue, as buildSystemFromXML does, from the files
+        loaded by the last load. If an index is given, the location of every
+        object is added to it.
+        '''
+        result = ([], [], [], dict(), dict(), dict())
+        for path in self.blobs:
+            systemFile = self.cache[(path, self.blobs[path])]
+            for i in range(3):
+                result[i].extend(systemFile.result[i])
+            for i in range(3, 6):
+                result[i].update(systemFile.result[i])
+            if index is not None:
+                index.update(systemFile.index)
+        return result
@@ -2,6 +2,10 @@ from data_parsing.PlanetaryObject import *
 
 
 class Star(PlanetaryObject):
+    __slots__ = ("systemObject", "planetObjects", "systemObjectNamesToSystem",
+                 "nameToPlanet", "nameSystem", "otherNamesStar",
+                 "otherNamesSystem")
+
     def __init__(self, name):
         # data fields in the star
         # self.data = {"nameStar": name}
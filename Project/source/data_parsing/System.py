@@ -2,6 +2,8 @@ from data_parsing.PlanetaryObject import *
 
 
 class System(PlanetaryObject):
+    __slots__ = ("starObjects", "nameToStar", "otherNamesSystem")
+
     def __init__(self, name):
         # data fields in the system
         # self.data = {"nameSystem": name}
@@ -6,6 +6,7 @@ import xml.etree.ElementTree as ET
 from data_parsing.System import *
 from data_parsing.Star import *
 from data_parsing.Planet import *
+from data_parsing.CatalogueIndex import CatalogueIndex, cleanName
 
 url = "https://github.com/OpenExoplanetCatalogue/oec_gzip/raw/master/systems.xml.gz"
 '''
@@ -39,10 +40,11 @@ def readXML(path="../storage/OEC_XML.gz"):
     return oec
 
 
-def buildSystemFromXML(path="../storage/OEC_XML.gz"):
+def buildSystemFromXML(path="../storage/OEC_XML.gz", index=None):
     '''
-    () -> ([System], [Star], [Planet], {systemName: System}, {starName: Star},
-           {planetName: Planet})
+    (str, CatalogueIndex) -> ([System], [Star], [Planet],
+                              {systemName: System}, {starName: Star},
+                              {planetName: Planet})
     Parse the xml from the big xml document
     that contains every system into a tuple of system objects, star objects,
     and planet objects. Each Planetary Object dictionary contains the fields
@@ -50,209 +52,245 @@ def buildSystemFromXML(path="../storage/OEC_XML.gz"):
     The system have a list of references to its stars, the stars have a list of
     references to its planets, and the planets have a reference to the star
     and system it is in, and stars have a refernece to the system it is in
+    Stars nested in binaries are attached to the system that holds the
+    binaries. Every element of the document is visited once.
+    If an index is given, the location of every object is added to it.
     REQ: Valid internet connection
     '''
     # initialize empty lists that will be returned at the end  of all
     # planetary objects
     oec = readXML(path)
-    allSystems = []
-    allStars = []
-    allPlanets = []
-    allSystemsDict = dict()
-    allStarsDict = dict()
-    allPlanetsDict = dict()
+    result = ([], [], [], dict(), dict(), dict())
     # loop through each system in the xml
-    for systemXML in oec.findall(".//system"):
-        # loop through teach tag in the system that is name
-        i = 0
-        for child in systemXML.findall(".//name"):
-            cleanNameSystem = ''.join(
-                ch for ch in child.text if ch.isalnum()).lower()
-            if child.tag == "name":
-                # if it is the first name, create a System object with that
-                # main name
-                if i == 0:
-                    systemName = child.text
-                    system = System(systemName)
-                    allSystemsDict[child.text] = system
-                    system.otherNamesSystem.append(cleanNameSystem)
-                # if there are more names, create / add them to other names list
-                elif i == 1:
-                    system.otherNamesSystem.append(child.text)
-                    system.otherNamesSystem.append(cleanNameSystem)
-                    allSystemsDict[child.text] = system
-                else:
-                    system.otherNamesSystem.append(child.text)
-                    system.otherNamesSystem.append(cleanNameSystem)
-                    allSystemsDict[child.text] = system
-                i += 1
+    for systemXML in oec.iterfind(".//system"):
+        buildSystem(systemXML, *result, index=index)
+    return result
+
+
+def buildSystem(systemXML, allSystems, allStars, allPlanets, allSystemsDict,
+                allStarsDict, allPlanetsDict, index=None, filename=None):
+    '''
+    (Element, [System], [Star], [Planet], {systemName: System},
+     {starName: Star}, {planetName: Planet}, CatalogueIndex, str) -> System
+    Builds the System object of a system element of the catalogue, along with
+    its stars and planets, and adds them to the given lists and dictionaries
+    of all planetary objects. Returns the System.
+    If an index is given, the system, stars and planets are added to it as
+    found in the file filename of the repository, by default the file named
+    after the system.
+    '''
+    system = None
+    dataXML = []
+    # names are only taken from the system itself, not from its stars
+    for child in systemXML:
+        tag = child.tag.lower()
+        if tag == "name":
+            cleanNameSystem = cleanName(child.text)
+            # if it is the first name, create a System object with that main
+            # name
+            if system is None:
+                system = System(child.text)
+            # if there are more names, add them to other names list
             else:
                 system.otherNamesSystem.append(child.text)
-                system.otherNamesSystem.append(cleanNameSystem)
-                allSystemsDict[child.text] = system
+            system.otherNamesSystem.append(cleanNameSystem)
+            allSystemsDict[child.text] = system
+        elif tag not in _CONTAINER_TAGS:
+            dataXML.append(child)
+    # build the system data dictionary mapping the tag name to the tag value
+    # in the system
+    for child in dataXML:
+        system.addVal(child.tag, child.text)
 
-        # build the system data dictionary mapping the tag name to the tag value
-        # in the system
-        for child in systemXML:
-            if (child.tag.lower() != "star") and (child.tag.lower() != "name"):
-                system.addVal(child.tag, child.text)
+    if index is not None:
+        if filename is None:
+            filename = systemFilename(system.name)
+        index.add("System", [system.name] + system.otherNamesSystem,
+                  system.name, filename, ".")
+    # build a list of stars that are in the system, including the stars
+    # nested in binaries
+    localStarsDict = dict()
+    systemNames = _namesToObject(system.name, system.otherNamesSystem, system)
+    for starXML, starPath in _iterStars(systemXML):
+        star = buildStar(starXML, system, allStarsDict, localStarsDict,
+                         allPlanets, allPlanetsDict, systemNames)
+        # add the stars to the list of stars in the system
+        system.starObjects.append(star)
+        # and all stars list
+        allStars.append(star)
+        if index is not None:
+            _indexStar(index, star, filename, starPath)
+    system.nameToStar = localStarsDict
+    # add the system to the list of all systems list
+    allSystems.append(system)
+    return system
+
+
+def buildStar(starXML, system, allStarsDict, localStarsDict, allPlanets,
+              allPlanetsDict, systemNames=None):
+    '''
+    (Element, System, {starName: Star}, {starName: Star}, [Planet],
+     {planetName: Planet}, {systemName: System}) -> Star
+    Builds the Star object of a star element of the system, along with its
+    planets. The names of the star are added to allStarsDict and
+    localStarsDict, the planets are added to allPlanets and allPlanetsDict.
+    systemNames maps the names of the system to it, it is shared by the stars
+    of the system.
+    '''
+    if systemNames is None:
+        systemNames = _namesToObject(system.name, system.otherNamesSystem,
+                                     system)
+    star = None
+    planetsXML = []
+    dataXML = []
+    for child in starXML:
+        tag = child.tag.lower()
+        if tag == "name":
+            cleanNameStar = cleanName(child.text)
+            # if it is the first name, create a Star object with that main
+            # name
+            if star is None:
+                star = Star(child.text)
+            # if there are more names, add them to other names list
+            else:
+                star.otherNamesStar.append(child.text)
+            star.otherNamesStar.append(cleanNameStar)
+            allStarsDict[child.text] = star
+            localStarsDict[child.text] = star
+            localStarsDict[cleanNameStar] = star
+        elif tag == "planet":
+            planetsXML.append(child)
+        else:
+            dataXML.append(child)
+    # build the star data dictionary mapping the tag name to the tag value in
+    # the star
+    for child in dataXML:
+        star.addVal(child.tag, child.text)
+        for attribute in child.attrib:
+            if "error" in attribute or "limit" in attribute:
+                star.addError(child.tag + attribute, child.attrib[attribute])
 
-        # build a list of stars that are in the system
-        stars = []
-        # loop through each star in the system
-        localStarsDict = dict()
-        for starXML in systemXML.findall(".//star"):
-            ii = 0
-            # loop through teach tag in the star that is name
-            for child in starXML.findall(".//name"):
-                cleanNameStar = ''.join(
-                    ch for ch in child.text if ch.isalnum()).lower()
-                if child.tag == "name":
-                    # if it is the first name, create a Star object with that
-                    # main name
-                    if ii == 0:
-                        star = Star(child.text)
-                        allStarsDict[child.text] = star
-                        localStarsDict[child.text] = star
-                        localStarsDict[cleanNameStar] = star
-                        star.otherNamesStar.append(cleanNameStar)
-                    # if there are more names, create / add them to other names
-                    # list
-                    elif ii == 1:
-                        star.otherNamesStar.append(child.text)
-                        star.otherNamesStar.append(cleanNameStar)
-                        allStarsDict[child.text] = star
-                        localStarsDict[child.text] = star
-                        localStarsDict[cleanNameStar] = star
-                    else:
-                        star.otherNamesStar.append(child.text)
-                        star.otherNamesStar.append(cleanNameStar)
-                        allStarsDict[child.text] = star
-                        localStarsDict[child.text] = star
-                        localStarsDict[cleanNameStar] = star
-                    ii += 1
-                else:
-                    star.otherNamesStar.append(child.text)
-                    star.otherNamesStar.append(cleanNameStar)
-                    allStarsDict[child.text] = star
-                    localStarsDict[child.text] = star
-                    localStarsDict[cleanNameStar] = star
+    # the names the planets of the star know the star under, shared by the
+    # planets
+    starNames = _namesToObject(star.name, star.otherNamesStar, star)
+    # loop through each planet in the star
+    localPlanetsDict = dict()
+    for planetXML in planetsXML:
+        planet = buildPlanet(planetXML, allPlanetsDict, localPlanetsDict)
+        # add the star name that the planet is in
+        planet.nameStar = star.name
+        planet.starObjectNamesToStar = starNames
+        # and others if there are any
+        planet.otherNamesStar = star.otherNamesStar
+        # add this planet to the list of planets in the star
+        star.planetObjects.append(planet)
+        # and all planets list
+        allPlanets.append(planet)
+        # add the star reference in the planet
+        planet.starObject = star
 
-            # build the star data dictionary mapping the tag name to the tag
-            # value in the system
-            for child in starXML:
-                if (child.tag.lower() != "planet") and (
-                            child.tag.lower() != "name"):
-                    star.addVal(child.tag, child.text)
-                    for attribute in child.attrib:
-                        if "error" in attribute or "limit" in attribute:
-                            star.errors[child.tag + attribute] = child.attrib[
-                                attribute]
+    # add the name of the system that the star is in
+    star.nameSystem = system.name
+    star.systemObjectNamesToSystem = systemNames
+    star.nameToPlanet = localPlanetsDict
+    # and others if there are any
+    star.otherNamesSystem = system.otherNamesSystem
+    # add the system reference in the star
+    star.systemObject = system
+    return star
 
-            # build a list of planets that are in the star
-            planets = []
-            # loop through each planet in the star
-            localPlanetsDict = dict()
-            for planetXML in starXML.findall(".//planet"):
-                iii = 0
-                # loop through teach tag in the planet that is name
-                for child in planetXML.findall(".//name"):
-                    cleanNamePlanets = ''.join(
-                        ch for ch in child.text if ch.isalnum()).lower()
-                    if child.tag == "name":
-                        # if it is the first name, create a Planet object with
-                        # that main name
-                        if iii == 0:
-                            planet = Planet(child.text)
-                            allPlanetsDict[child.text] = planet
-                            localPlanetsDict[child.text] = planet
-                            localPlanetsDict[cleanNamePlanets] = planet
-                            planet.otherNamesPlanet.append(cleanNamePlanets)
-                        # if there are more names, create / add them to other
-                        # names list
-                        elif iii == 1:
-                            planet.otherNamesPlanet.append(child.text)
-                            planet.otherNamesPlanet.append(cleanNamePlanets)
-                            allPlanetsDict[child.text] = planet
-                            localPlanetsDict[child.text] = planet
-                            localPlanetsDict[cleanNamePlanets] = planet
-                        else:
-                            planet.otherNamesPlanet.append(child.text)
-                            planet.otherNamesPlanet.append(cleanNamePlanets)
-                            allPlanetsDict[child.text] = planet
-                            localPlanetsDict[child.text] = planet
-                            localPlanetsDict[cleanNamePlanets] = planet
-                        iii += 1
-                    else:
-                        planet.otherNamesPlanet.append(child.text)
-                        planet.otherNamesPlanet.append(cleanNamePlanets)
-                        allPlanetsDict[child.text] = planet
-                        localPlanetsDict[child.text] = planet
-                        localPlanetsDict[cleanNamePlanets] = planet
 
-                # build the planet data dictionary mapping the tag name to the
-                # tag value in the system
-                for child in planetXML:
-                    if (child.tag.lower() != "name") and (
-                                child.tag.lower() != "lastupdate"):
-                        planet.addVal(child.tag, child.text)
-                        for attribute in child.attrib:
-                            if "error" in attribute or "limit" in attribute:
-                                planet.errors[child.tag + attribute] = \
-                                    child.attrib[
-                                        attribute]
+def buildPlanet(planetXML, allPlanetsDict, localPlanetsDict):
+    '''
+    (Element, {planetName: Planet}, {planetName: Planet}) -> Planet
+    Builds the Planet object of a planet element of a star. The names of the
+    planet are added to allPlanetsDict and localPlanetsDict.
+    '''
+    planet = None
+    dataXML = []
+    for child in planetXML:
+        tag = child.tag.lower()
+        if tag == "name":
+            cleanNamePlanets = cleanName(child.text)
+            # if it is the first name, create a Planet object with that main
+            # name
+            if planet is None:
+                planet = Planet(child.text)
+            # if there are more names, add them to other names list
+            else:
+                planet.otherNamesPlanet.append(child.text)
+            planet.otherNamesPlanet.append(cleanNamePlanets)
+            allPlanetsDict[child.text] = planet
+            localPlanetsDict[child.text] = planet
+            localPlanetsDict[cleanNamePlanets] = planet
+        elif tag != "lastupdate":
+            dataXML.append(child)
+    # build the planet data dictionary mapping the tag name to the tag value
+    # in the planet
+    for child in dataXML:
+        planet.addVal(child.tag, child.text)
+        for attribute in child.attrib:
+            if "error" in attribute or "limit" in attribute:
+                planet.addError(child.tag + attribute, child.attrib[attribute])
+    return planet
 
-                # add the star name that the planet is in
-                planet.nameStar = star.name
-                planet.starObjectNamesToStar[star.name] = star
-                planet.starObjectNamesToStar[''.join(
-                    ch for ch in star.name if ch.isalnum()).lower()] = star
 
-                starData = star.getData()
-                # and others if there are any
-                planet.otherNamesStar = star.otherNamesStar
-                for starObject in star.otherNamesStar:
-                    planet.starObjectNamesToStar[
-                        starObject] = star
-                    planet.starObjectNamesToStar[
-                        ''.join(ch for ch in starObject if
-                                ch.isalnum()).lower()] = star
-                # add this planet to the list of planets in the star
-                planets.append(planet)
-                # and all planets list
-                allPlanets.append(planet)
-                # add the star reference in the planet
-                planet.starObject = star
+# tags holding other planetary objects, which are not data fields of the
+# object that contains them
+_CONTAINER_TAGS = frozenset(["star", "binary", "planet"])
 
-            # add the list of planets in the star to the star
-            star.planetObjects = planets
-            # add the name of the system that the star is in
-            star.nameSystem = system.name
-            star.systemObjectNamesToSystem[star.nameSystem] = system
-            star.systemObjectNamesToSystem[
-                ''.join(ch for ch in star.nameSystem if
-                        ch.isalnum()).lower()] = system
-            star.nameToPlanet = localPlanetsDict
-            systemData = system.getData()
-            # and others if there are any
-            star.otherNamesSystem = system.otherNamesSystem
-            for systemObject in system.otherNamesSystem:
-                star.systemObjectNamesToSystem[
-                    systemObject] = system
-                star.systemObjectNamesToSystem[
-                    ''.join(ch for ch in systemObject if
-                            ch.isalnum()).lower()] = system
-            # add the stars to the list of stars in the system
-            stars.append(star)
-            # and all stars list
-            allStars.append(star)
-            # add the system reference in the star
-            star.systemObject = system
-            # add the list of stars in the system to the system
-            system.starObjects = stars
-            system.nameToStar = localStarsDict
-        # add the system to the list of all systems list
-        allSystems.append(system)
 
-    return (allSystems, allStars, allPlanets, allSystemsDict, allStarsDict,
-            allPlanetsDict)
+def systemFilename(systemName):
+    '''
+    (str) -> str
+    Returns the path, in the catalogue repository, of the file of the system
+    named systemName
+    '''
+    return "systems/" + systemName + ".xml"
+
+
+def _iterStars(element, path=""):
+    '''
+    (Element, str) -> iterator of (Element, str)
+    Yields the star elements of a system or binary element in document order,
+    descending into nested binaries but not into the stars themselves, along
+    with their element path from the system, ex: "binary[1]/star[2]". path is
+    the element path of element
+    '''
+    positions = {"star": 0, "binary": 0}
+    for child in element:
+        if child.tag in positions:
+            positions[child.tag] += 1
+            childPath = "%s%s[%d]" % (path, child.tag, positions[child.tag])
+            if child.tag == "star":
+                yield child, childPath
+            else:
+                for star in _iterStars(child, childPath + "/"):
+                    yield star
+
+
+def _indexStar(index, star, filename, path):
+    '''
+    (CatalogueIndex, Star, str, str) -> None
+    Adds the star found at path in the system file filename, and its
+    planets, to the index
+    '''
+    index.add("Star", [star.name] + star.otherNamesStar, star.nameSystem,
+              filename, path)
+    for position, planet in enumerate(star.planetObjects, 1):
+        index.add("Planet", [planet.name] + planet.otherNamesPlanet,
+                  star.nameSystem, filename,
+                  path + "/planet[" + str(position) + "]")
+
+
+def _namesToObject(name, otherNames, obj):
+    '''
+    (str, [str], PlanetaryObject) -> {str: PlanetaryObject}
+    Returns a dict mapping the main name, the other names and the normalized
+    version of each of them to obj
+    '''
+    namesToObject = dict()
+    for objName in [name] + otherNames:
+        namesToObject[objName] = obj
+        namesToObject[cleanName(objName)] = obj
+    return namesToObject
@@ -0,0 +1,232 @@
+import datetime
+import math
+import sys
+
+# format of the dates of the catalogue, ex: "15/09/20"
+DATE_FORMAT = "%y/%m/%d"
+# text the catalogues use for a missing value
+MISSING_TEXT = "N/A"
+
+
+class Missing:
+    '''
+    The value of a field an object has no usable value for. There is a single
+    instance, MISSING, which is compared with `is`; it prints as "N/A" and is
+    false.
+    '''
+    __slots__ = ()
+
+    def __new__(cls):
+        # unpickling and copying give back the single instance
+        return MISSING
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __str__(self):
+        return MISSING_TEXT
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = object.__new__(Missing)
+
+
+def toText(val):
+    '''(str) -> str
+    Returns the text val without quotes and surrounding whitespace
+    '''
+    return val.replace("\"", "").strip()
+
+
+def toFloat(val):
+    '''(str) -> float
+    Returns the number written in val, MISSING if val holds no value, or the
+    text itself if it is not a number
+    '''
+    text = toText(val)
+    if text == "" or text == MISSING_TEXT:
+        return MISSING
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    if math.isnan(number) or math.isinf(number):
+        return MISSING
+    return number
+
+
+def toInt(val):
+    '''(str) -> int
+    Returns the whole number written in val, such as a year, MISSING if val
+    holds no value, or what toFloat returns if it is not a whole number
+    '''
+    number = toFloat(val)
+    if isinstance(number, float) and number.is_integer():
+        return int(number)
+    return number
+
+
+def toDate(val):
+    '''(str) -> datetime.date
+    Returns the date written in val in DATE_FORMAT, MISSING if val holds no
+    value, or the text itself if it is not such a date
+    '''
+    text = toText(val)
+    if text == "" or text == MISSING_TEXT:
+        return MISSING
+    try:
+        return datetime.datetime.strptime(text, DATE_FORMAT).date()
+    except ValueError:
+        return text
+
+
+def category(codes):
+    '''([str]) -> function
+    Returns a parser for a field whose value is one of codes. The parser
+    returns the code whatever the case val is written in, the text itself if
+    it is not a known code, or MISSING if val holds no value. The codes are
+    interned, so that the objects share them.
+    '''
+    byKey = dict((code.lower(), sys.intern(code)) for code in codes)
+
+    def toCategory(val):
+        text = toText(val)
+        if text == "" or text == MISSING_TEXT:
+            return MISSING
+        return byKey.get(text.lower()) or sys.intern(text)
+    return toCategory
+
+
+DISCOVERY_METHODS = ("RV", "transit", "timing", "imaging", "microlensing")
+LISTS = ("Confirmed planets", "Planets in binary systems, S-type",
+         "Controversial", "Orphan planets",
+         "Planets in binary systems, P-type", "Kepler Objects of Interest",
+         "Solar System", "Retracted planet candidate",
+         "Planets in open clusters", "Planets in globular clusters")
+
+
+class Field(str):
+    '''
+    The name of a field of the catalogue, as registered in FIELDS. It is used
+    wherever the name is: it compares and hashes as the name, and is known to
+    be clean. id is a small integer numbering the fields in the order they
+    were registered, parser is the parser of its values (None for text),
+    numeric is whether the catalogue requires a number in the tag, and
+    multiple is whether an object may have the tag more than once.
+    '''
+
+    def __new__(cls, name, id, parser=None, numeric=False, multiple=False):
+        field = str.__new__(cls, sys.intern(name))
+        field.id = id
+        field.parser = parser
+        field.numeric = numeric
+        field.multiple = multiple
+        return field
+
+    def __reduce__(self):
+        # pickled by name, and unpickled as the registered field
+        return (field, (str(self),))
+
+
+# the fields of the catalogue, by name
+FIELDS = dict()
+# the fields of the catalogue, by id
+FIELDS_BY_ID = []
+
+
+def register(name, parser=None, numeric=False, multiple=False):
+    '''(str, function, bool, bool) -> Field
+    Registers the field name, see Field, and returns it
+    '''
+    new = Field(name, len(FIELDS_BY_ID), parser, numeric, multiple)
+    FIELDS[new] = new
+    FIELDS_BY_ID.append(new)
+    return new
+
+
+def field(name):
+    '''(str) -> Field
+    Returns the registered field name, or name itself if it is not a field
+    of the catalogue
+    '''
+    return FIELDS.get(name, name)
+
+
+# the tags holding other objects or their names
+register("system")
+for _name in ("binary", "star", "planet", "name"):
+    register(_name, multiple=True)
+# the tags holding text
+for _name in ("new", "description", "imagedescription", "image",
+              "videolink", "rightascension", "declination", "spectraltype"):
+    register(_name)
+register("list", category(LISTS), multiple=True)
+register("discoverymethod", category(DISCOVERY_METHODS))
+register("lastupdate", toDate)
+register("istransiting", toInt)
+register("discoveryyear", toInt, numeric=True)
+register("separation", toFloat, numeric=True, multiple=True)
+# the tags holding measurements
+for _name in ("mass", "radius", "semimajoraxis", "period", "eccentricity",
+              "inclination", "periastron", "longitude", "ascendingnode",
+              "meananomaly", "temperature", "metallicity", "age", "distance",
+              "magV", "magJ", "magH", "magR", "magB", "magK", "magI", "magU",
+              "transittime", "periastrontime", "maximumrvtime",
+              "impactparameter", "spinorbitalignment", "positionangle"):
+    register(_name, toFloat, numeric=True)
+del _name
+
+
+def ingest(field, val):
+    '''(str, object) -> object
+    Returns the typed value of the field from val, as read from a catalogue.
+    Text and numbers are parsed with the parser of the field in FIELDS,
+    None is MISSING, and the values that are already typed are kept. The
+    values of the other fields follow the rules of parseValue, except that
+    text is kept as text.
+    '''
+    known = FIELDS.get(field)
+    parser = None if known is None else known.parser
+    if isinstance(val, str):
+        if parser is None:
+            return toText(val)
+        return parser(val)
+    if val is None or val is MISSING or isinstance(val, datetime.date):
+        return MISSING if val is None else val
+    if parser is not None and isinstance(val, (int, float)) and \
+            not isinstance(val, bool):
+        return parser(repr(val))
+    return parseValue(val)
+
+
+def parseValue(val):
+    '''(object) -> object
+    Returns val as a float if it is a number, MISSING if it is empty or has
+    no value, or val itself otherwise
+    '''
+    if val == '':
+        return MISSING
+    try:
+        return float(val)
+    except ValueError:
+        return val
+    except TypeError:
+        return MISSING
+
+
+def formatValue(val):
+    '''(object) -> str
+    Returns the text of the value val, as written in the catalogue files
+    '''
+    if isinstance(val, float):
+        text = repr(val)
+        # whole numbers are written without a fractional part
+        return text[:-2] if text.endswith(".0") else text
+    if isinstance(val, datetime.date):
+        return val.strftime(DATE_FORMAT)
+    return str(val)
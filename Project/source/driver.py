@@ -26,7 +26,8 @@ def main():
     # similar to longOTP
     longARG = ["show", "accept", "accept2", "deny",
                "showrange", "postpone", "setautoupdate", "showlatest",
-               "setrepo"]
+               "setrepo", "page", "pagesize", "origin", "type", "system",
+               "field", "since", "until", "query", "where", "setclone"]
 
     # arg, opt pre-processor, do not edit
     short = ':'.join([shortARG[i:i + 1] for i in range(0, len(shortARG), 1)]) \
@@ -59,23 +60,33 @@ def main():
     clearrepo_flag = False
     setrepo_flag = False
     repo_marker = None
+    # the way the catalogue is cloned, set by setclone
+    clone_marker = None
     fullreset_flag = False
-
-    # 0 for off, 1 for single select, 2 for range select
+    query_text = None
+    # the changes selected for acceptall, acceptall2, denyall and postponeall
+    where_filter = None
+    # the changes shown by showall
+    show_filter = ChangeFilter()
+    show_filtered = False
+    show_page = None
+    show_page_size = SHOWALL_PAGE_SIZE
+
+    # 0 for off, 1 for single select, 2 for range select, 3 for set select
     show_flag = 0
-    # 0 for off, 1 for single select, 2 for range select
+    # 0 for off, 1 for single select, 2 for range select, 3 for set select
     deny_flag = 0
-    # 0 for off, 1 for single select, 2 for range select
+    # 0 for off, 1 for single select, 2 for range select, 3 for set select
     postpone_flag = 0
-    # 0 for off, 1 for single select, 2 for range select
+    # 0 for off, 1 for single select, 2 for range select, 3 for set select
     accept_flag = 0
-    # 0 for off, 1 for single select, 2 for range select
+    # 0 for off, 1 for single select, 2 for range select, 3 for set select
     accept2_flag = 0
-    # list 1 element if single, 2 elements if range
+    # list 1 element if single, 2 elements if range, str if set
     show_marker = None
-    # list 1 element if single, 2 elements if range
+    # list 1 element if single, 2 elements if range, str if set
     deny_marker = None
-    # list 1 element if single, 2 elements if range
+    # list 1 element if single, 2 elements if range, str if set
     postpone_marker = None
 
     for o, a in opts:
@@ -95,7 +106,11 @@ def main():
 
         # show
         elif o in ("-" + shortARG[0], "--" + longARG[0]):
-            if ("-" in str(a)):
+            if is_selection(str(a)):
+                # a set of numbers, ranges and ids was specified
+                show_flag = 3
+                show_marker = str(a)
+            elif ("-" in str(a)):
                 show_flag = 2
                 show_marker = str(a).split("-")
             else:
@@ -109,7 +124,11 @@ def main():
 
         # accept
         elif o in ("-" + shortARG[1], "--" + longARG[1]):
-            if ("-" in str(a)):
+            if is_selection(str(a)):
+                # a set of numbers, ranges and ids was specified
+                accept_flag = 3
+                accept_marker = str(a)
+            elif ("-" in str(a)):
                 accept_flag = 2
                 accept_marker = str(a).split("-")
             else:
@@ -118,7 +137,11 @@ def main():
 
         # accept2
         elif o in ("-" + shortARG[2], "--" + longARG[2]):
-            if ("-" in str(a)):
+            if is_selection(str(a)):
+                # a set of numbers, ranges and ids was specified
+                accept2_flag = 3
+                accept2_marker = str(a)
+            elif ("-" in str(a)):
                 accept2_flag = 2
                 accept2_marker = str(a).split("-")
             else:
@@ -135,7 +158,11 @@ def main():
 
         # deny
         elif o in ("-" + shortARG[3], "--" + longARG[3]):
-            if ("-" in str(a)):
+            if is_selection(str(a)):
+                # a set of numbers, ranges and ids was specified
+                deny_flag = 3
+                deny_marker = str(a)
+            elif ("-" in str(a)):
                 # a range was specified
                 deny_flag = 2
                 deny_marker = str(a).split("-")
@@ -160,7 +187,11 @@ def main():
 
         # postpone
         elif o in ("--" + longARG[5]):
-            if ("-" in str(a)):
+            if is_selection(str(a)):
+                # a set of numbers, ranges and ids was specified
+                postpone_flag = 3
+                postpone_marker = str(a)
+            elif ("-" in str(a)):
                 # a range was specified
                 postpone_flag = 2
                 postpone_marker = str(a).split("-")
@@ -204,13 +235,56 @@ def main():
         elif o in ("--" + longOPT[11]):
             fullreset_flag = True
 
+        # page and pagesize of showall
+        elif o == "--" + longARG[9]:
+            show_page = int(a)
+        elif o == "--" + longARG[10]:
+            show_page_size = int(a)
+
+        # filters of showall: origin, type, system, field
+        elif o in ["--" + arg for arg in longARG[11:15]]:
+            show_filtered = True
+            attribute = {"type": "object_type"}.get(o[2:], o[2:])
+            setattr(show_filter, attribute, a)
+
+        # filters of showall: since, until
+        elif o in ["--" + arg for arg in longARG[15:17]]:
+            show_filtered = True
+            try:
+                setattr(show_filter, o[2:],
+                        parse_date(a, last=(o == "--until")))
+            except ValueError:
+                print("Invalid date, expected yy/mm/dd or yy/mm: " + a)
+                sys.exit(2)
+
+        # query
+        elif o == "--" + longARG[17]:
+            query_text = a
+
+        # where
+        elif o == "--" + longARG[18]:
+            try:
+                where_filter = parse_query(a)
+            except ValueError as error:
+                print(error)
+                sys.exit(2)
+
+        # setclone
+        elif o == "--" + longARG[19]:
+            clone_marker = a
+
         else:
             usage()
             assert False, "unhandled option"
 
     # show all
     if (show_all_flag):
-        show_all()
+        show_all(show_filter if show_filtered else None, show_page,
+                 show_page_size)
+
+    # query
+    if (query_text is not None):
+        query(query_text, show_page, show_page_size)
 
     # show
     if (show_flag == 2):
@@ -232,6 +306,13 @@ def main():
         except:
             print("Invalid Range.")
 
+    # show set
+    if (show_flag == 3):
+        try:
+            show_selected(select_changes(show_marker))
+        except ValueError as error:
+            print(error)
+
     # show
     if (show_flag == 1):
         try:
@@ -245,13 +326,10 @@ def main():
 
     # accept
     if (accept_flag == 1):
-        GIT.initGit()
-        accept(accept_marker[0], 1)
-        postpone_number(accept_marker[0])
+        accept_in_repo(1, lambda: accept(accept_marker[0], 1))
 
     # accept range
     if (accept_flag == 2):
-        GIT.initGit()
         try:
             if accept_marker[0].lower() == "s" or accept_marker[
                 0].lower() == "e":
@@ -263,29 +341,36 @@ def main():
                 end = accept_marker[1]
             else:
                 end = int(accept_marker[1])
-            accept_range(start, end, 1)
-            postpone_range(start, end)
-            print("Done.")
         except:
             print("Invalid Range")
+        else:
+            if accept_in_repo(1, lambda: accept_range(start, end, 1)) \
+                    is not None:
+                print("Done.")
+
+    # accept set
+    if (accept_flag == 3):
+        try:
+            ids = select_changes(accept_marker)
+        except ValueError as error:
+            print(error)
+        else:
+            if accept_in_repo(1, lambda: accept_selected(ids, 1)) \
+                    is not None:
+                print("Done.")
 
     # accept all
     if (accept_all_flag):
-        GIT.initGit()
-        accept_all(1)
-        postpone_all()
-        print("Accepted all.")
+        if accept_in_repo(1, lambda: accept_all(1, where_filter)) \
+                is not None:
+            print("Accepted all.")
 
     # accept2
     if (accept2_flag == 1):
-        GIT.initGit2()
-        accept(accept2_marker[0], 2)
-        postpone_number((accept2_marker[0]))
-        GIT.finalizeGit2()
+        accept_in_repo(2, lambda: accept(accept2_marker[0], 2))
 
     # accept2 range
     if (accept2_flag == 2):
-        GIT.initGit2()
         try:
             if accept2_marker[0].lower() == "s" or accept2_marker[
                 0].lower() == "e":
@@ -297,20 +382,29 @@ def main():
                 end = accept2_marker[1]
             else:
                 end = int(accept2_marker[1])
-            accept_range(start, end, 2)
-            postpone_range(start, end)
-            print("Done.")
         except:
             print("Invalid Range")
-        GIT.finalizeGit2()
+        else:
+            if accept_in_repo(2, lambda: accept_range(start, end, 2)) \
+                    is not None:
+                print("Done.")
+
+    # accept2 set
+    if (accept2_flag == 3):
+        try:
+            ids = select_changes(accept2_marker)
+        except ValueError as error:
+            print(error)
+        else:
+            if accept_in_repo(2, lambda: accept_selected(ids, 2)) \
+                    is not None:
+                print("Done.")
 
     # accept all
     if (accept_all2_flag):
-        GIT.initGit2()
-        accept_all(2)
-        GIT.finalizeGit2()
-        postpone_all()
-        print("Accepted all2")
+        if accept_in_repo(2, lambda: accept_all(2, where_filter)) \
+                is not None:
+            print("Accepted all2")
 
     # deny
     if (deny_flag == 1):
@@ -337,9 +431,17 @@ def main():
         except:
             print("Invalid Range")
 
+    # deny set
+    if (deny_flag == 3):
+        try:
+            deny_selected(select_changes(deny_marker))
+            print("Done.")
+        except ValueError as error:
+            print(error)
+
     # deny all
     if (deny_all_flag):
-        deny_all()
+        deny_all(where_filter)
 
     # postpone
     if (postpone_flag == 1):
@@ -368,9 +470,17 @@ def main():
         except:
             print("Invalid Range")
 
+    # postpone set
+    if (postpone_flag == 3):
+        try:
+            postpone_selected(select_changes(postpone_marker))
+            print("Done.")
+        except ValueError as error:
+            print(error)
+
     # postponeall
     if (postponeall_flag):
-        postpone_all()
+        postpone_all(where_filter)
 
     # clearblacklist
     if (clearblacklist_flag):
@@ -396,6 +506,10 @@ def main():
     if (clearrepo_flag):
         clearrepo()
 
+    # setclone
+    if (clone_marker is not None):
+        setclone(clone_marker)
+
     # fullreset
     if (fullreset_flag):
         fullreset()
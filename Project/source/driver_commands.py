@@ -5,10 +5,17 @@ import data_retrieval.remoteGet as REM
 import data_retrieval.apiGet as API
 import data_parsing.XML_data_parser as XML
 import data_parsing.CSV_data_parser as CSV
+from data_parsing.CatalogueIndex import CatalogueIndex
+from data_parsing.RepositoryCatalogue import RepositoryCatalogue
 import data_comparison.Comparator as COMP
+import data_comparison.CatalogueComparator as CATALOGUE
 import data_comparison.proposed_change as PC
 import github.gitClone as GIT
+from github.gitBackend import GitError
 import storage_manager.storage_manager as STORAGE
+import autoupdate_daemon as AUTOUPDATE
+from storage_manager.change_store import ChangeFilter, is_change_id, \
+    parse_date, parse_query, summary_text
 import datetime
 import subprocess
 import urllib
@@ -33,9 +40,19 @@ XML_path = "storage/OEC_XML.gz"
 # list of all proposed changes (accumulated on update())
 CHANGES = []
 
+# the catalogue loaded from the local clone, kept between updates
+OEC_catalogue = None
+
+# the number of changes show_all shows at a time
+SHOWALL_PAGE_SIZE = 20
+
 # the minimum autoupdate interval allowed (in hours)
 MIN_AUTOU_INTERVAL = 1
 
+# if True, numeric differences within the combined error bars of the two
+# catalogues are not reported as proposed changes
+USE_ERROR_BARS = False
+
 
 def status():
     '''() -> NoneType
@@ -44,11 +61,10 @@ def status():
     the number of changes pending to be reviewed.
     '''
 
-    unpack_changes()
     last_update = STORAGE.config_get("last_update")
     repo_url = STORAGE.config_get("repo_url")
 
-    num_changes = len(CHANGES)
+    num_changes = STORAGE.change_store().count()
     if last_update == "Never":
         print("Last Update: Never" + "\n")
         print("Repo: " + repo_url)
@@ -56,6 +72,30 @@ def status():
         print("\nLast Update: " + str(last_update))
         print("Number of proposed changes stored : " + str(num_changes) + "\n")
         print("Repo: " + repo_url)
+    autoupdate_status()
+
+
+def autoupdate_status():
+    '''() -> NoneType
+    Prints the status of the autoupdate daemon, as it reports it: whether it
+    is updating and at which step, and the times of its last and next
+    updates
+    '''
+
+    daemon = AUTOUPDATE.request_status(STORAGE.AUTOUPDATE_SOCKET_PATH)
+    if daemon is None:
+        print("Autoupdate: off")
+        return
+    print("Autoupdate: every " + str(daemon["interval_hours"]) + " hours")
+    if daemon["state"] == "updating":
+        print("Updating now, since " + str(daemon["last_started"]) + ": " +
+              str(daemon["step"] or "starting"))
+    elif daemon["last_finished"] is not None:
+        print("Last autoupdate finished : " + daemon["last_finished"])
+    if daemon["last_error"] is not None:
+        print("Last autoupdate failed : " + daemon["last_error"])
+    if daemon["next_update"] is not None:
+        print("Next autoupdate : " + daemon["next_update"])
 
 
 def usage():
@@ -88,24 +128,84 @@ def clean_files():
             pass
 
 
-def show_all():
-    '''() -> NoneType
-    Method for showing all proposed changes
+def show_all(change_filter=None, page=None, page_size=SHOWALL_PAGE_SIZE):
+    '''(ChangeFilter, int, int) -> NoneType
+    Method for showing all proposed changes, or those selected by
+    change_filter. If page is given, only that page of page_size changes is
+    shown (from 1). Otherwise the changes are read, rendered and written a
+    page at a time; on a terminal, the user is asked before every next page
     '''
 
-    unpack_changes()
-    # sort the list of proposed changes    
-    i = 1
-    while i <= len(CHANGES):
-        show_number(i)
-        i += 1
-    print("\nNumber of changes shown : " + str(len(CHANGES)))
+    store = STORAGE.change_store()
+    shown = _write_pages(
+        lambda offset, limit: PC.render_changes(
+            store.changes(change_filter, offset, limit)), page, page_size)
+    if shown is None:
+        return
+    print("\nNumber of changes shown : " + str(shown))
+    if change_filter is not None or page is not None:
+        print("Number of changes selected : " +
+              str(store.count(change_filter)))
     print("Last update : " + str(STORAGE.config_get("last_update")))
     # to reset last update time to default state ("Never"), and config file in
     # general : STORAGE.clean_config_file()
     print("End.\n")
 
 
+def query(text, page=None, page_size=SHOWALL_PAGE_SIZE):
+    '''(str, int, int) -> NoneType
+    Method for listing the proposed changes selected by the query text (see
+    change_store.parse_query), one line per change with its number. Only the
+    indexed columns of the changes are read, the changes themselves are not.
+    Pages are shown as show_all shows them
+    '''
+
+    try:
+        change_filter = parse_query(text)
+    except ValueError as error:
+        print(error)
+        return
+    store = STORAGE.change_store()
+    shown = _write_pages(
+        lambda offset, limit: (summary_text(summary) for summary in
+                               store.summaries(change_filter, offset, limit)),
+        page, page_size)
+    if shown is not None:
+        print("\nNumber of changes selected : " +
+              str(store.count(change_filter)))
+
+
+def _write_pages(select, page, page_size):
+    '''(function, int, int) -> int
+    Writes the texts returned by select(offset, limit): every text if page is
+    None, asking the user before every next page on a terminal, or the page
+    of page_size texts otherwise. Returns the number of texts written, or
+    None if the page is invalid
+    '''
+    if page_size < 1 or (page is not None and page < 1):
+        print("Invalid page.")
+        return None
+    more = None
+    if page is None:
+        texts = select(0, None)
+        if sys.stdin.isatty() and sys.stdout.isatty():
+            more = _more
+    else:
+        texts = select((page - 1) * page_size, page_size)
+    return PC.write_paged(texts, page_size, sys.stdout, more)
+
+
+def _more():
+    '''() -> bool
+    Asks the user whether to show the next page of changes
+    '''
+    try:
+        answer = input("-- More -- (Enter to continue, q to stop) ")
+    except EOFError:
+        return False
+    return answer.strip().lower() != "q"
+
+
 def show_range(start, end):
     '''(int, int) -> NoneType
     or (str, str) -> NoneType, where str in [s,e]
@@ -113,30 +213,9 @@ def show_range(start, end):
     Returns NoneType
     '''
 
-    unpack_changes()
-    # sort the list of proposed changes
-    if isinstance(start, str) and start.lower() == "s":
-        start = 1
-    elif isinstance(start, str) and start.lower() == "e":
-        start = len(CHANGES)
-    if isinstance(end, str) and end.lower() == "e":
-        end = len(CHANGES)
-    elif isinstance(end, str) and end.lower() == "s":
-        end = 1
-    bothInts = isinstance(start, int) and isinstance(end, int)
-    validRange = 1 <= start <= len(CHANGES) and 1 <= end <= len(CHANGES)
-    if (bothInts and validRange):
-        if start <= end:
-            i = start
-            while i <= end:
-                show_number(i)
-                i += 1
-        else:  # start > end
-            # reverse range
-            i = start
-            while i >= end:
-                show_number(i)
-                i -= 1
+    ids = _range_ids(start, end)
+    if ids is not None:
+        show_selected(ids)
     else:
         print("Invalid range")
 
@@ -146,47 +225,105 @@ def show_number(n):
     Method for showing the proposed change designated by 'n'
     '''
 
-    if len(CHANGES) == 0:
-        unpack_changes()
-    if n <= len(CHANGES) and n > 0:
-        print("\nShowing number : " + str(n) + "\n")
-        print(str(CHANGES[n - 1]))
-        print()
+    # only the change shown is read from the store
+    change = STORAGE.change_store().get(n)
+    if change is not None:
+        sys.stdout.write("".join(PC.render_changes([(n, change)])))
     else:
         print("Out of range.")
 
 
+def show_selected(ids):
+    '''([str]) -> NoneType
+    Method for showing the proposed changes with the ids, in that order
+    '''
+
+    numbered = STORAGE.change_store().numbered(ids)
+    for text in PC.render_changes(numbered):
+        sys.stdout.write(text)
+
+
 def accept(n, strategy):
-    '''(int, int) -> NoneType
+    '''(int, int) -> [str]
     Function for accepting a specific change/addition
     n argument is that change number to accept
     strategy argument accepts "1" or "2"
-    Returns NoneType
+    Returns the ids of the changes accepted, see accept_selected, or None
+    if there is no change numbered n
     '''
 
-    if len(CHANGES) == 0:
-        unpack_changes()
-    if n <= len(CHANGES) and n > 0:
-        if (strategy == 1):
-            GIT.modifyXML(CHANGES[n], n - 1)
-        else:
-            GIT.modifyXML(CHANGES[n], n - 1, mode=True)
-    else:
+    try:
+        ids = select_changes(str(n))
+    except ValueError:
         print("Out of range.")
-    print("\nAccepted: \n" + str(n))
+        return None
+    return accept_selected(ids, strategy)
+
+
+def accept_selected(ids, strategy):
+    '''([str], int) -> [str]
+    Function for accepting the changes/additions with the ids, in the order
+    of ids. Only those changes are read from the store
+    strategy 1 makes a branch per change, strategy 2 a single commit with
+    every change, in which every system file is rewritten once
+    Returns the ids of the changes accepted, which are those of ids still
+    stored, for the caller to remove exactly those
+    '''
 
+    numbered = STORAGE.change_store().numbered(ids)
+    if strategy == 1:
+        for (position, change) in numbered:
+            GIT.modifyXML(change, position - 1)
+    else:
+        GIT.acceptChanges([change for (position, change) in numbered])
+    print("\nAccepted: \n" + ", ".join(
+        str(position) for (position, change) in numbered))
+    return [change.getId() for (position, change) in numbered]
+
+
+def accept_in_repo(strategy, accept_function):
+    '''(int, function) -> [str]
+    Prepares the catalogue repository for accepting with strategy 1 or 2,
+    calls accept_function, which accepts changes with that strategy and
+    returns their ids (or None), sends the changes accepted, and then removes
+    them from the proposed changes
+    Returns the ids of the changes accepted, or None if none were, including
+    when the repository could not be cloned, updated or pushed to. With
+    strategy 1, the modifications which could not be committed or whose
+    pull request failed are kept
+    '''
 
-def accept_all(strategy):
-    '''() -> NoneType
-    Function for accepting all changes/additions
+    try:
+        if strategy == 1:
+            GIT.initGit()
+            ids = accept_function()
+            unpublished = set(GIT.finalizeGit())
+            if ids is not None:
+                ids = [change_id for change_id in ids if change_id not in
+                       unpublished]
+        else:
+            GIT.initGit2()
+            ids = accept_function()
+            GIT.finalizeGit2()
+    except GitError as error:
+        print("The catalogue repository could not be updated, the changes "
+              "were not accepted: " + str(error))
+        return None
+    if ids is not None:
+        postpone_selected(ids)
+    return ids
+
+
+def accept_all(strategy, change_filter=None):
+    '''(int, ChangeFilter) -> [str]
+    Function for accepting all changes/additions, or those selected by
+    change_filter
     strategy argument accepts "1" or "2"
+    Returns the ids of the changes accepted, see accept_selected
     '''
 
-    unpack_changes()
-    i = 1
-    while i <= len(CHANGES):
-        accept(i, strategy)
-        i += 1
+    return accept_selected(STORAGE.change_store().ids(change_filter),
+                           strategy)
 
 
 def deny_number(n):
@@ -195,18 +332,10 @@ def deny_number(n):
     designated by 'n'
     Returns NoneType
     '''
-    unpack_changes()
-    if n > 0 and n <= len(CHANGES):
-        # if given number is within the range, add the n-th change to black 
-        # list and pop it from thelist of changes
-        black_list = STORAGE.config_get("black_list")
-        black_list.append(CHANGES.pop(n - 1))
-        # update the blacklist
-        STORAGE.config_set("black_list", black_list)
-        # update the changes list in memory
-        STORAGE.write_changes_to_memory(CHANGES)
+    try:
+        deny_selected(select_changes(str(n)))
         print("Done.")
-    else:
+    except ValueError:
         print("Out of range.")
 
 
@@ -216,47 +345,34 @@ def deny_range(start, end):
     Method for denying a range of proposed changes between start and end
     Returns NoneType
     '''
-    global CHANGES
-    unpack_changes()
-    # sort the list of proposed changes
-    if isinstance(start, str) and start.lower() == "s":
-        start = 0
-    elif isinstance(start, str) and start.lower() == "e":
-        start = len(CHANGES)
-    if isinstance(end, str) and end.lower() == "e":
-        end = len(CHANGES)
-    elif isinstance(end, str) and end.lower() == "s":
-        end = 0
-    bothInts = isinstance(start, int) and isinstance(end, int)
-    validRange = 0 <= start <= len(CHANGES) and 0 <= end <= len(CHANGES)
-    if (bothInts and validRange):
-        black_list = STORAGE.config_get("black_list")
-        for i in range(end, start - 1, -1):
-            black_list.append(CHANGES.pop(i - 1))
-            # update the blacklist
-        STORAGE.config_set("black_list", black_list)
-        # update the changes list in memory
-        STORAGE.write_changes_to_memory(CHANGES)
+    ids = _range_ids(start, end)
+    if ids is not None:
+        deny_selected(ids)
     else:
         print("Invalid range")
 
 
-def deny_all():
-    '''() -> NoneType
-    Method for declining all proposed changes.
+def deny_all(change_filter=None):
+    '''(ChangeFilter) -> NoneType
+    Method for declining all proposed changes, or those selected by
+    change_filter.
     Returns NoneType
     '''
-    unpack_changes()
-    # add all currently pending changes to blacklist
-    black_list = STORAGE.config_get("black_list")
-    black_list.extend(CHANGES)
-    # write black list to memory    
-    STORAGE.config_set("black_list", black_list)
-    # clear the list of currently pending changes
-    STORAGE.write_changes_to_memory([])
+    # the changes are moved to the blacklist at once
+    STORAGE.change_store().remove(change_filter=change_filter,
+                                  blacklist=True)
     print("Done.")
 
 
+def deny_selected(ids):
+    '''([str]) -> NoneType
+    Method for declining the proposed changes with the ids: they are moved
+    to the blacklist in a single transaction, and the changes left keep
+    their numbers
+    '''
+    STORAGE.change_store().remove(ids, blacklist=True)
+
+
 def postpone_number(n):
     '''(int) -> NoneType
     Method for postponing a specific proposed changed, the one
@@ -264,14 +380,9 @@ def postpone_number(n):
     Returns NoneType
     '''
 
-    global CHANGES
-    if len(CHANGES) == 0:
-        unpack_changes()
-    length = len(CHANGES)
-    if n > 0 and n <= length:
-        CHANGES.pop(n - 1)
-        STORAGE.write_changes_to_memory(CHANGES)
-    else:
+    try:
+        postpone_selected(select_changes(str(n)))
+    except ValueError:
         print("Out of range.")
 
 
@@ -281,37 +392,60 @@ def postpone_range(start, end):
     Method for postponing a range of proposed changes between start and end
     Returns NoneType
     '''
-    global CHANGES
-    unpack_changes()
-    # sort the list of proposed changes
-    if isinstance(start, str) and start.lower() == "s":
-        start = 0
-    elif isinstance(start, str) and start.lower() == "e":
-        start = len(CHANGES)
-    if isinstance(end, str) and end.lower() == "e":
-        end = len(CHANGES)
-    elif isinstance(end, str) and end.lower() == "s":
-        end = 0
-    bothInts = isinstance(start, int) and isinstance(end, int)
-    validRange = 0 <= start <= len(CHANGES) and 0 <= end <= len(CHANGES)
-    if (bothInts and validRange):
-        indeces = set(range(start, end))
-        CHANGES = [i for j, i in enumerate(CHANGES) if j not in indeces]
-        STORAGE.write_changes_to_memory(CHANGES)
-
+    ids = _range_ids(start, end)
+    if ids is not None:
+        postpone_selected(ids)
     else:
         print("Invalid range.")
 
 
-def postpone_all():
-    '''() -> NoneType
-    Method for postponing all proposed changes.
+def postpone_all(change_filter=None):
+    '''(ChangeFilter) -> NoneType
+    Method for postponing all proposed changes, or those selected by
+    change_filter.
     Returns NoneType
     '''
-    STORAGE.write_changes_to_memory([])
+    STORAGE.change_store().remove(change_filter=change_filter)
     print("Done.")
 
 
+def postpone_selected(ids):
+    '''([str]) -> NoneType
+    Method for postponing the proposed changes with the ids: they are
+    removed in a single transaction, and the changes left keep their numbers
+    '''
+    STORAGE.change_store().remove(ids)
+
+
+def is_selection(text):
+    '''(str) -> bool
+    Returns whether text selects proposed changes by a set of numbers or
+    ids, such as "1,4,7-9" or "3fa2b1c4", rather than by a number or a range
+    '''
+    return "," in text or is_change_id(text)
+
+
+def select_changes(text):
+    '''(str) -> [str]
+    Returns the ids of the proposed changes written in text, such as "3",
+    "1-5", "s-e", "1,4,7-9" or "3fa2b1c4" (see ChangeStore.select)
+    Raises ValueError if text is not understood or names no change
+    '''
+    return STORAGE.change_store().select(text)
+
+
+def _range_ids(start, end):
+    '''(int, int) -> [str]
+    or (str, str) -> [str], where str in [s,e]
+    Returns the ids of the proposed changes numbered from start to end, or
+    None if the range is invalid
+    '''
+    try:
+        return select_changes(str(start) + "-" + str(end))
+    except ValueError:
+        return None
+
+
 def unpack_changes():
     '''
     () -> None
@@ -320,28 +454,70 @@ def unpack_changes():
     variable "CHANGES".
     '''
     global CHANGES
-    CHANGES = STORAGE.read_changes_from_memory()
-
-
-def update():
-    '''() -> NoneType
+    CHANGES = STORAGE.change_store().all()
+
+
+def loadOEC(index):
+    '''(CatalogueIndex) -> ([System], [Star], [Planet], {systemName: System},
+                            {starName: Star}, {planetName: Planet})
+    Returns the Open Exoplanet Catalogue, as buildSystemFromXML does, adding
+    the location of every object to index. When the local clone of the
+    catalogue exists, it is updated and only its system files changed since
+    the last load are parsed; otherwise the gzip dump is downloaded and
+    parsed.
+    Raises urllib.error.URLError if the dump cannot be downloaded.
+    '''
+    global OEC_catalogue
+    if GIT.mirror.isCloned():
+        try:
+            GIT.UpdateRepo()
+            if OEC_catalogue is None:
+                OEC_catalogue = RepositoryCatalogue(GIT.direc)
+            OEC_catalogue.load()
+            return OEC_catalogue.build(index)
+        except GitError:
+            print("The local catalogue could not be read, using the dump.\n")
+    XML.downloadXML(XML_path)
+    return XML.buildSystemFromXML(XML_path, index)
+
+
+def update(report=None):
+    '''(function) -> bool
     Method for updating system from remote databases and generating
     proposed changes. Network connection required.
-    Returns NoneType
+    report, if given, is called with the name of each step of the update as
+    it starts, such as "comparing", for the autoupdate daemon to report its
+    progress
+    Returns False, without updating, if another update is running in the
+    daemon or in another command, True otherwise
+    '''
+    if report is None:
+        report = lambda step: None
+    with STORAGE.update_lock() as locked:
+        if not locked:
+            print("Another update is running, try again once it is done.\n")
+            return False
+        _update(report)
+    return True
+
+
+def _update(report):
+    '''(function) -> NoneType
+    Runs the update, see update, with the lock of the updates held
     '''
-    # postpone all currently pending changes
-    STORAGE.write_changes_to_memory([])
     # open exoplanet catalogue
     global CHANGES
     CHANGES = []
+    OEC_index = CatalogueIndex()
+    report("loading the catalogue")
     try:
-        XML.downloadXML(XML_path)
+        OEC_lists = loadOEC(OEC_index)
     except urllib.error.URLError:
         print("No internet connection\n")
         return
-    OEC_lists = XML.buildSystemFromXML(XML_path)
+    # the accepted changes find their objects in the repository with it
+    STORAGE.write_index_to_memory(OEC_index)
     OEC_systems = OEC_lists[0]
-    OEC_stars = OEC_lists[1]
     OEC_planets = OEC_lists[2]
 
     # delete text files from previous update
@@ -349,6 +525,7 @@ def update():
 
     # targets:
     # Saves nasa database into a text file named nasa_file
+    report("downloading the NASA archive")
     NASA_getter = API.apiGet(NASA_link, nasa_file)
     try:
         NASA_getter.getFromAPI("&table=planets")
@@ -359,6 +536,7 @@ def update():
         print("No internet connection.\n")
 
     # Saves exoplanetEU database into a text file named exo_file
+    report("downloading exoplanet.eu")
     exoplanetEU_getter = API.apiGet(exoplanetEU_link, EU_file)
     try:
         exoplanetEU_getter.getFromAPI("")
@@ -368,43 +546,40 @@ def update():
         print("No internet connection.\n")
 
     # build the dict of stars from exoplanet.eu
+    report("comparing")
     EU_stars = CSV.buildDictStarExistingField(EU_file, "eu")
     # build the dict of stars from NASA
     NASA_stars = CSV.buildDictStarExistingField(nasa_file, "nasa")
-    # build the dictionary of stars from Open Exoplanet Catalogue
-    OEC_stars = XML.buildSystemFromXML(XML_path)[4]
+    # the dictionary of stars from Open Exoplanet Catalogue
+    OEC_stars = OEC_lists[4]
 
     # clean both dictionaries
     for d in [EU_stars, NASA_stars]:
         for key in d:
             if d.get(key).__class__.__name__ != "Star":
                 d.pop(key)
-    # retrieve the blacklist from memory
-    black_list = STORAGE.config_get("black_list")
-    # add chages from EU to the list (if they are not blacklisted by the user)
-    for key in EU_stars.keys():
-        if key in OEC_stars.keys():
-            Comp_object = COMP.Comparator(EU_stars.get(key),
-                                          OEC_stars.get(key), "eu")
-            LIST = Comp_object.proposedChangeStarCompare()
-            for C in LIST:
-                if (not C in black_list) and (not C in CHANGES):
-                    CHANGES.append(C)
-
-    # add chages from NASA to the list
-    for key in NASA_stars.keys():
-        if key in OEC_stars.keys():
-            Comp_object = COMP.Comparator(NASA_stars.get(key),
-                                          OEC_stars.get(key), "nasa")
-            LIST = Comp_object.proposedChangeStarCompare()
-            for C in LIST:
-                if (not C in black_list) and (not C in CHANGES):
-                    CHANGES.append(C)
+    # retrieve the ids of the blacklist from memory
+    black_list = STORAGE.change_store().blacklisted_ids()
+    # the ids of the changes in the list
+    seen = set()
+    # add chages from EU, then from NASA to the list (if they are not
+    # blacklisted by the user)
+    for (origin_stars, origin) in [(EU_stars, "eu"), (NASA_stars, "nasa")]:
+        Comp_object = CATALOGUE.CatalogueComparator(
+            OEC_systems, OEC_stars, origin_stars, origin,
+            useErrorBars=USE_ERROR_BARS)
+        LIST = Comp_object.proposedChanges()
+        for C in LIST:
+            change_id = C.getId()
+            if (not change_id in black_list) and (not change_id in seen):
+                seen.add(change_id)
+                CHANGES.append(C)
 
     # sort the list of proposed changes
     CHANGES = PC.merge_sort_changes(CHANGES)
     # write the list of proposed changes to memory using storage_manager
-    STORAGE.write_changes_to_memory(CHANGES)
+    report("storing the changes")
+    STORAGE.change_store().replace(CHANGES)
     # calculate current time
     curr_time = datetime.datetime.strftime(datetime.datetime.now(),
                                            '%Y-%m-%d %H:%M:%S')
@@ -419,7 +594,7 @@ def clearblacklist():
     
     Method for clearing declined blacklist of proposed changes
     '''
-    STORAGE.config_set("black_list", [])
+    STORAGE.change_store().clear_blacklist()
     print("Done.")
 
 
@@ -428,17 +603,18 @@ def showlastest(n):
     Method for showest the lastest 'n' proposed changes
     "showlastest_marker" is passed in as int
     '''
-    unpack_changes()
+    # the changes with the numbers they are stored under, which are not
+    # their positions in the list once changes were removed
+    numbered = list(STORAGE.change_store().changes())
 
-    if n >= 1 and n <= len(CHANGES):
+    if n >= 1 and n <= len(numbered):
         print("Showing the latest " + str(n) + " changes: ")
-        newChanges = PC.sort_changes_lastupdate(CHANGES)
-        i = 0
-        while i < n:
-            print("\nShowing number : " + str(newChanges[i]._index + 1) + "\n")
-            print(str(newChanges[i]))
-            print()
-            i += 1
+        newChanges = PC.sort_changes_lastupdate(
+            [change for (position, change) in numbered])
+        # _index is the position of the change in the list given to the sort
+        sys.stdout.write("".join(PC.render_changes(
+            (numbered[change._index][0], change)
+            for change in newChanges[:n])))
     else:
         print("Out of range.")
     pass
@@ -464,9 +640,12 @@ def setautoupdate(autoupdate_interval):
 
 def stopautoupdate():
     '''(int) -> NoneType
-    Kills the autoupdate_daemon
+    Stops the autoupdate_daemon, once its running update is done if it is
+    updating
     '''
-
+    daemon = AUTOUPDATE.request_status(STORAGE.AUTOUPDATE_SOCKET_PATH)
+    if daemon is not None and daemon["state"] == "updating":
+        print("The autoupdate daemon stops once its update is done.")
     subprocess.call("pkill -f autoupdate_daemon.py", shell=True)
 
 
@@ -482,39 +661,34 @@ def clearrepo():
     STORAGE.config_set("repo_url", STORAGE.DEFAULT_REPO_URL)
 
 
+def setclone(mode):
+    '''(str) -> NoneType
+    Sets how the catalogue is cloned, the next time it is: mode is one of
+    GIT.CLONE_MODES
+    '''
+    if mode not in GIT.CLONE_MODES:
+        print("Invalid clone mode, expected one of: " +
+              ", ".join(sorted(GIT.CLONE_MODES)))
+        return
+    STORAGE.config_set("clone_mode", mode)
+    if GIT.mirror.isCloned():
+        print("The catalogue is cloned already; the mode applies when it is "
+              "cloned again.")
+
+
 def accept_range(start, end, strategy):
-    '''(int, int, int) -> NoneType
-    or (str, str, int) -> NoneType, where str in [s,e]
+    '''(int, int, int) -> [str]
+    or (str, str, int) -> [str], where str in [s,e]
     Method for accepting a range of proposed changes between start and end
     where strategy designated the related strategy of accepting changes
-    Returns NoneType
+    Returns the ids of the changes accepted, see accept_selected, or None
+    if the range is invalid
     '''
-    unpack_changes()
-    # sort the list of proposed changes
-    if isinstance(start, str) and start.lower() == "s":
-        start = 1
-    elif isinstance(start, str) and start.lower() == "e":
-        start = len(CHANGES)
-    if isinstance(end, str) and end.lower() == "e":
-        end = len(CHANGES)
-    elif isinstance(end, str) and end.lower() == "s":
-        end = 1
-    bothInts = isinstance(start, int) and isinstance(end, int)
-    validRange = 1 <= start <= len(CHANGES) and 1 <= end <= len(CHANGES)
-    if (bothInts and validRange):
-        if start <= end:
-            i = start
-            while i <= end:
-                accept(i, strategy)
-                i += 1
-        else:  # start > end
-            # reverse range
-            i = start
-            while i >= end:
-                accept(i, strategy)
-                i -= 1
-    else:
+    ids = _range_ids(start, end)
+    if ids is None:
         print("Invalid range")
+        return None
+    return accept_selected(ids, strategy)
 
 
 def fullreset():
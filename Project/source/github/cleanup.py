@@ -2,184 +2,134 @@
 import xml.etree.ElementTree as ET
 import glob
 import os
-import hashlib
+import io
 import sys
 import datetime
 import re
+import concurrent.futures
 
-num_format = re.compile(r'^\-?[0-9]*\.?[0-9]*e?[\-\+]?[0-9]?[0-9]?$')
-
-# Variables to keep track of progress
-fileschecked = 0
-issues = 0
-xmlerrors = 0
-fileschanged = 0
-
-
-# Calculate md5 hash to check for changes in file.
-def md5_for_file(f, block_size=2 ** 20):
-    md5 = hashlib.md5()
-    while True:
-        data = f.read(block_size).encode("UTF-8")
-        if not data:
-            break
-        md5.update(data)
-    return md5.digest()
-
+# the catalogue schema is found from the root of the program, also when the
+# cleanup is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_parsing.schema as SCHEMA
 
-# Nicely indents the XML output
-def indent(elem, level=0):
-    i = "\n" + level * "\t"
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "\t"
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-        for elem in elem:
-            indent(elem, level + 1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
+num_format = re.compile(r'^\-?[0-9]*\.?[0-9]*e?[\-\+]?[0-9]?[0-9]?$')
 
+# Number of files handed to a worker process at a time
+CHUNK_SIZE = 16
 
-# Removes empty nodes from the tree
-def removeemptytags(elem):
-    if elem.text:
-        elem.text = elem.text.strip()
-    toberemoved = []
-    for child in elem:
-        if len(child) == 0 and child.text is None and len(child.attrib) == 0:
-            toberemoved.append(child)
-    for child in toberemoved:
-        elem.remove(child)
-    for child in elem:
-        removeemptytags(child)
-        # Convert error to errorminus and errorplus
-    if 'ep' in elem.attrib:
-        err = elem.attrib['ep']
-        del elem.attrib['ep']
-        elem.attrib['errorplus'] = err
-    if 'em' in elem.attrib:
-        err = elem.attrib['em']
-        del elem.attrib['em']
-        elem.attrib['errorminus'] = err
-    if 'error' in elem.attrib:
-        err = elem.attrib['error']
-        del elem.attrib['error']
-        elem.attrib['errorminus'] = err
-        elem.attrib['errorplus'] = err
-    if 'e' in elem.attrib:
-        err = elem.attrib['e']
-        del elem.attrib['e']
-        elem.attrib['errorminus'] = err
-        elem.attrib['errorplus'] = err
 
+class CleanupReport:
+    """ Keeps track of the progress of a cleanup run: the counters, and the
+    messages printed for the files checked, in order
+    """
 
+    def __init__(self, filename=None):
+        """ (str) -> NoneType
+        Create an empty report, for the file named filename if given
+        """
+        self.filename = filename
+        self.messages = []
+        self.fileschecked = 0
+        self.issues = 0
+        self.xmlerrors = 0
+        self.fileschanged = 0
+
+    def log(self, message):
+        """ (str) -> NoneType
+        Record a message to print for the file
+        """
+        self.messages.append(message)
+
+    def merge(self, other):
+        """ (CleanupReport) -> NoneType
+        Add the counters and messages of the report other to this report
+        """
+        self.messages.extend(other.messages)
+        self.fileschecked += other.fileschecked
+        self.issues += other.issues
+        self.xmlerrors += other.xmlerrors
+        self.fileschanged += other.fileschanged
+
+    def errorCode(self):
+        """ () -> int
+        Return the exit code of the run: 0 if nothing was found, 1 if files
+        were modified, 2 if some files are not valid XML and 3 if issues were
+        found
+        """
+        errorcode = 0
+        if self.fileschanged > 0:
+            errorcode = 1
+        if self.xmlerrors > 0:
+            errorcode = 2
+        if self.issues > 0:
+            errorcode = 3
+        return errorcode
+
+    def summary(self):
+        """ () -> [str]
+        Return the lines of the summary printed at the end of a run
+        """
+        lines = ["Cleanup script finished. %d files checked." %
+                 self.fileschecked]
+        if self.fileschanged > 0:
+            lines.append("%d file(s) modified." % self.fileschanged)
+        if self.xmlerrors > 0:
+            lines.append("%d XML errors found." % self.xmlerrors)
+        if self.issues > 0:
+            lines.append("Number of issues: %d (see above)." % self.issues)
+        else:
+            lines.append("No issues found.")
+        return lines
+
+
+# Normalize the newlines of a file, as reading it in text mode would
+def normalizenewlines(data):
+    return data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+
+# The tags of the catalogue are registered with their types in
+# data_parsing.schema
 # Check if an unknown tag is present (most likely an indication for a typo)
-validtags = [
-    "system", "name", "new", "description", "ascendingnode", "discoveryyear",
-    "lastupdate", "list", "discoverymethod", "semimajoraxis", "period", "magV",
-    "magJ",
-    "magH", "magR", "magB", "magK", "magI", "magU", "distance",
-    "longitude", "imagedescription", "image", "age", "declination",
-    "rightascension",
-    "metallicity", "inclination", "spectraltype", "binary", "planet",
-    "periastron", "star",
-    "mass", "eccentricity", "radius", "temperature", "videolink", "transittime",
-    "spinorbitalignment", "istransiting", "separation", "positionangle",
-    "periastrontime",
-    "meananomaly", "maximumrvtime", "impactparameter"]
-validattributes = [
+validtags = frozenset(SCHEMA.FIELDS)
+validattributes = frozenset([
     "error",
     "errorplus",
     "errorminus",
     "unit",
     "upperlimit",
     "lowerlimit",
-    "type"]
-validlists = [
-    "Confirmed planets",
-    "Planets in binary systems, S-type",
-    "Controversial",
-    "Orphan planets",
-    "Planets in binary systems, P-type",
-    "Kepler Objects of Interest",
-    "Solar System",
-    "Retracted planet candidate",
-    "Planets in open clusters",
-    "Planets in globular clusters"]
-validdiscoverymethods = ["RV", "transit", "timing", "imaging", "microlensing"]
-tagsallowmultiple = ["list", "name", "planet", "star", "binary", "separation"]
-numerictags = ["mass", "radius", "ascnedingnode", "discoveryyear",
-               "semimajoraxis", "period",
-               "magV", "magJ", "magH", "magR", "magB", "magK", "magI", "magU",
-               "distance", "longitude", "age",
-               "metallicity", "inclination", "periastron", "eccentricity",
-               "temperature", "transittime",
-               "spinorbitalignment", "separation", "positionangle",
-               "periastrontime", "meananomaly",
-               "maximumrvtime", "ascendingnode", "impactparameter"]
-numericattributes = ["error", "errorplus", "errorminus", "upperlimit",
-                     "lowerlimit"]
-nonzeroattributes = ["error", "errorplus", "errorminus"]
-
-
-def checkforvalidtags(elem):
-    problematictag = None
-    if elem.tag in numerictags:
-        if elem.text:
-            if not re.match(num_format, elem.text):
-                return elem.tag
-        deleteattribs = []
-        for a in elem.attrib:
-            if a in numericattributes:
-                if not re.match(num_format, elem.attrib[a]):
-                    return elem.tag
-    for child in elem:
-        _tmp = checkforvalidtags(child)
-        if _tmp:
-            problematictag = _tmp
-    if elem.tag not in validtags:
-        problematictag = elem.tag
-    for a in elem.attrib:
-        if a not in validattributes:
-            return a
-    return problematictag
-
-
-def checkforvaliderrors(elem):
-    problematictag = None
-    if elem.tag in numerictags:
-        deleteattribs = []
-        for a in elem.attrib:
-            if a in nonzeroattributes:
-                try:
-                    if len(elem.attrib[a]) == 0 or float(elem.attrib[a]) == 0.:
-                        deleteattribs.append(a)
-                except:
-                    print(
-                        "Warning: problem reading error bars in tag " + elem.tag)
-                    return 1
-        for a in deleteattribs:
-            print(
-                "Warning: deleting error bars with value 0 in tag " + elem.tag)
-            del elem.attrib[a]
-        if "errorplus" in elem.attrib:
-            if not "errorminus" in elem.attrib:
-                print(
-                    "Warning: one sided error found in tag " + elem.tag + ". Fixing it.")
-                elem.attrib["errorminus"] = elem.attrib["errorplus"]
-        if "errorminus" in elem.attrib:
-            if not "errorplus" in elem.attrib:
-                print(
-                    "Warning: one sided error found in tag " + elem.tag + ". Fixing it.")
-                elem.attrib["errorplus"] = elem.attrib["errorminus"]
-    for child in elem:
-        if checkforvaliderrors(child):
-            return 1
-    return 0
+    "type"])
+validlists = frozenset(SCHEMA.LISTS)
+validdiscoverymethods = frozenset(SCHEMA.DISCOVERY_METHODS)
+tagsallowmultiple = frozenset(
+    field for field in SCHEMA.FIELDS_BY_ID if field.multiple)
+numerictags = frozenset(
+    field for field in SCHEMA.FIELDS_BY_ID if field.numeric)
+numericattributes = frozenset(["error", "errorplus", "errorminus",
+                               "upperlimit", "lowerlimit"])
+nonzeroattributes = ("error", "errorplus", "errorminus")
+# Each planet needs to be in exactly one of these lists
+oneListOf = ("Confirmed planets", "Controversial",
+             "Kepler Objects of Interest", "Solar System",
+             "Retracted planet candidate")
+# Planets which have a radius that was not measured from a transit
+excludeList = frozenset([
+    'Mercury', 'Venus', 'Earth', 'Mars', 'Jupiter',
+    'Saturn',
+    'Uranus', 'Neptune', 'Pluto',
+    'PSR J1719-1438 b',
+    # radius estimated from  Roche Lobe radius
+    '',
+])
+
+# The messages of the rules are kept apart while walking the tree, and
+# printed in this order, which is the order the checks were historically run
+CHANNELS = (
+    "range", "unit me", "unit re", "unit rad", "lastupdate", "system name",
+    "planet name", "star name", "errorbars", "tags", "discoverymethod",
+    "duplicate planet", "duplicate star", "duplicate binary",
+    "binary P-type", "binary S-type", "list", "one list", "transit")
 
 
 # Convert units (makes data entry easier)
@@ -190,8 +140,6 @@ def convertunitattrib(elem, attribname, factor):
 
 
 def convertunit(elem, factor):
-    print(
-        "Converting unit of tag \"" + elem.tag + "\".")
     del elem.attrib['unit']
     if elem.text:
         elem.text = "%f" % (float(elem.text) * factor)
@@ -205,88 +153,136 @@ def convertunit(elem, factor):
     convertunitattrib(elem, "lowerlimit", factor)
 
 
-def checkForBinaryPlanet(root, criteria, liststring):
-    """ Checks if binary planets have been added to corresponding list
+# The rules of the cleanup. Each rule is called as rule(walk, elem, depth)
+# when the walk enters or leaves an element with one of the tags of the rule,
+# or any element if the rule has no tags, and in the order the rules are
+# registered. The rules run when entering an element see it, and its
+# subtree, as the checks of the previous phases left them; the rules run
+# when leaving it see the children already cleaned up.
+ENTER_RULES = []
+LEAVE_RULES = []
+FINISH_RULES = []
+_enterRulesByTag = {}
+_leaveRulesByTag = {}
+
+
+def onenter(*tags):
+    """ (str, ...) -> function
+    Register the decorated function as a rule run when entering an element
     """
-    global fileschanged
-    planets = root.findall(criteria)
-    for planet in planets:
-        plists = planet.findall(".//list")
-        if liststring not in [plist.text for plist in plists]:
-            ET.SubElement(planet, "list").text = liststring
-            print(
-                "Added '" + filename + "' to list '" + liststring + "'.")
-            fileschanged += 1
-
-
-def checkForTransitingPlanets(root):
-    """ Checks for transisting planets by first seeing if there is a transittime and then checking the discovery
-    method
+    def register(rule):
+        ENTER_RULES.append((frozenset(tags) if tags else None, rule))
+        _enterRulesByTag.clear()
+        return rule
+    return register
+
+
+def onleave(*tags):
+    """ (str, ...) -> function
+    Register the decorated function as a rule run when leaving an element
     """
-    global fileschanged
-    global issues
-    planets = root.findall(".//planet")
-    for planet in planets:
-        if not planet.findtext('.//istransiting'):
-            addtag = 0
-            hasTransittime = planet.findtext(".//transittime")
-            discoveryMethod = planet.findtext(".//discoverymethod")
-            planetRadius = planet.findtext(".//radius")
-            if hasTransittime or 'transit' == discoveryMethod:
-                addtag = 1
-            else:
-                if planetRadius:  # only measured from transits, imaging for now
-                    planetName = planet.findtext(".//name")
-                    excludeList = (
-                        'Mercury', 'Venus', 'Earth', 'Mars', 'Jupiter',
-                        'Saturn',
-                        'Uranus', 'Neptune', 'Pluto',
-                        'PSR J1719-1438 b',
-                        # radius estimated from  Roche Lobe radius
-                        '',
-                    )
-                    if planetName not in excludeList:
-                        if not discoveryMethod == 'imaging':
-                            print(
-                                '{} in {} has a radius but is is missing a istransiting tag'.format(
-                                    planetName, filename))
-                            issues += 1
-
-            if addtag:
-                ET.SubElement(planet, "istransiting").text = '1'
-                print(
-                    'Added istransiting tag to {}'.format(filename))
-                fileschanged += 1
-
-
-# Loop over all files and  create new data
-for filename in glob.glob("open_exoplanet_catalogue/systems*/*.xml"):
-    fileschecked += 1
-
-    # Save md5 for later
-    f = open(filename, 'rt')
-    md5_orig = md5_for_file(f)
-
-    # Open file
-    f = open(filename, 'rt')
+    def register(rule):
+        LEAVE_RULES.append((frozenset(tags) if tags else None, rule))
+        _leaveRulesByTag.clear()
+        return rule
+    return register
 
-    # Try to parse file
+
+def onfinish(rule):
+    """ (function) -> function
+    Register the decorated function as a rule run once the walk is over
+    """
+    FINISH_RULES.append(rule)
+    return rule
+
+
+def rulesfor(tag, rules, cache):
+    """ (str, list, dict) -> tuple
+    Return the rules in rules which apply to elements with the given tag
+    """
     try:
-        root = ET.parse(f).getroot()
-        planets = root.findall(".//planet")
-        stars = root.findall(".//star")
-        binaries = root.findall(".//binary")
-    except ET.ParseError as error:
-        print(
-            '{}, {}'.format(filename, error))
-        xmlerrors += 1
-        issues += 1
-        continue
-    finally:
-        f.close()
+        return cache[tag]
+    except KeyError:
+        found = tuple(rule for tags, rule in rules
+                      if tags is None or tag in tags)
+        cache[tag] = found
+        return found
+
+
+class Frame:
+    """ The state the rules keep for an element while it is walked
+    """
+    __slots__ = ("final", "problem", "childproblem", "badtag", "badattrib",
+                 "empty")
+
+    def __init__(self):
+        self.final = False
+        self.problem = None
+        self.childproblem = None
+        self.badtag = None
+        self.badattrib = None
+        self.empty = []
+
+
+class Walk:
+    """ A single traversal of the XML of a system file, which runs every rule
+    on every element it applies to
+    """
 
+    def __init__(self, report):
+        """ (CleanupReport) -> NoneType
+        Create a walk reporting to report
+        """
+        self.report = report
+        self.filename = report.filename
+        # the ancestors of the current element, and their frames
+        self.path = []
+        self.frames = []
+        self.buffers = dict((channel, []) for channel in CHANNELS)
+        self.errorbarsfailed = False
+        self.problematictag = None
+
+    def log(self, channel, message):
+        """ (str, str) -> NoneType
+        Record a message of the rules of channel
+        """
+        self.buffers[channel].append(message)
+
+    def run(self, root):
+        """ (Element) -> NoneType
+        Walk the tree under root, run the finishing rules and record the
+        messages of the rules in the report, in the order of the channels
+        """
+        self.visit(root)
+        for rule in FINISH_RULES:
+            rule(self)
+        for channel in CHANNELS:
+            self.report.messages.extend(self.buffers[channel])
+
+    def visit(self, elem):
+        """ (Element) -> NoneType
+        Run the rules on elem and its subtree
+        """
+        depth = len(self.path)
+        self.frames.append(Frame())
+        for rule in rulesfor(elem.tag, ENTER_RULES, _enterRulesByTag):
+            rule(self, elem, depth)
+        self.path.append(elem)
+        # the children added by the rules are visited as well
+        i = 0
+        while i < len(elem):
+            self.visit(elem[i])
+            i += 1
+        self.path.pop()
+        for rule in rulesfor(elem.tag, LEAVE_RULES, _leaveRulesByTag):
+            rule(self, elem, depth)
+        self.frames.pop()
+
+
+@onenter()
+def convertrange(walk, elem, depth):
     # Find tags with range=1 and convert to default error format
-    for elem in root.findall(".//*[@range='1']"):
+    if depth and elem.get("range") == "1":
         fragments = elem.text.split()
         elem.text = fragments[0]
         elem.attrib["errorminus"] = "%f" % (
@@ -294,137 +290,409 @@ for filename in glob.glob("open_exoplanet_catalogue/systems*/*.xml"):
         elem.attrib["errorplus"] = "%f" % (
             float(fragments[2]) - float(fragments[0]))
         del elem.attrib["range"]
-        print(
-            "Converted range to errorbars in tag '" + elem.tag + "'.")
-
-        # Convert units to default units
-    for mass in root.findall(".//planet/mass[@unit='me']"):
-        convertunit(mass, 0.0031457007)
-    for radius in root.findall(".//planet/radius[@unit='re']"):
-        convertunit(radius, 0.091130294)
-    for angle in root.findall(".//*[@unit='rad']"):
-        convertunit(angle, 57.2957795130823)
-
+        walk.log("range",
+                 "Converted range to errorbars in tag '" + elem.tag + "'.")
+
+
+@onenter()
+def convertunits(walk, elem, depth):
+    # Convert units to default units
+    unit = elem.get("unit")
+    if unit is None or not depth:
+        return
+    if depth > 1 and walk.path[-1].tag == "planet":
+        if elem.tag == "mass" and unit == "me":
+            walk.log("unit me",
+                     "Converting unit of tag \"" + elem.tag + "\".")
+            convertunit(elem, 0.0031457007)
+            return
+        if elem.tag == "radius" and unit == "re":
+            walk.log("unit re",
+                     "Converting unit of tag \"" + elem.tag + "\".")
+            convertunit(elem, 0.091130294)
+            return
+    if unit == "rad":
+        walk.log("unit rad", "Converting unit of tag \"" + elem.tag + "\".")
+        convertunit(elem, 57.2957795130823)
+
+
+@onenter("planet")
+def checklastupdate(walk, elem, depth):
     # Check lastupdate tag for correctness
-    for lastupdate in root.findall(".//planet/lastupdate"):
+    if not depth:
+        return
+    for lastupdate in elem.findall("./lastupdate"):
         la = lastupdate.text.split("/")
         if len(la) != 3 or len(lastupdate.text) != 8:
-            print(
-                "Date format not following 'yy/mm/dd' convention: " + filename)
-            issues += 1
+            walk.log("lastupdate",
+                     "Date format not following 'yy/mm/dd' convention: " +
+                     walk.filename)
+            walk.report.issues += 1
         if int(la[0]) + 2000 - datetime.date.today().year > 0 or int(
                 la[1]) > 12 or int(la[2]) > 31:
-            print(
-                "Date not valid: " + filename)
-            issues += 1
+            walk.log("lastupdate", "Date not valid: " + walk.filename)
+            walk.report.issues += 1
+
 
+@onenter()
+def checksystemname(walk, elem, depth):
     # Check that names follow conventions
-    if not root.findtext("./name") + ".xml" == os.path.basename(filename):
-        print(
-            "Name of system not the same as filename: " + filename)
-        issues += 1
-    for obj in planets + stars:
-        name = obj.findtext("./name")
-        if not name:
-            print(
-                "Didn't find name tag for object \"" + obj.tag + "\" in file \"" + filename + "\".")
-            issues += 1
-
-    # Check if tags are valid and have valid attributes
-    if checkforvaliderrors(root):
-        print(
-            "Problematic errorbar in in file \"" + filename + "\".")
-
-    problematictag = checkforvalidtags(root)
-    if problematictag:
-        print(
-            "Problematic tag/attribute '" + problematictag + "' found in file \"" + filename + "\".")
-        issues += 1
-    discoverymethods = root.findall(".//discoverymethod")
-    for dm in discoverymethods:
-        if not (dm.text in validdiscoverymethods):
-            print(
-                "Problematic discoverymethod '" + dm.text + "' found in file \"" + filename + "\".")
-            issues += 1
+    if not depth:
+        if not elem.findtext("./name") + ".xml" == os.path.basename(
+                walk.filename):
+            walk.log("system name",
+                     "Name of system not the same as filename: " +
+                     walk.filename)
+            walk.report.issues += 1
+
+
+@onenter("planet", "star")
+def checkname(walk, elem, depth):
+    if depth and not elem.findtext("./name"):
+        walk.log(elem.tag + " name",
+                 "Didn't find name tag for object \"" + elem.tag +
+                 "\" in file \"" + walk.filename + "\".")
+        walk.report.issues += 1
+
+
+@onenter()
+def checkerrorbars(walk, elem, depth):
+    # Remove error bars with value 0 and fix one sided ones, until an error
+    # bar cannot be read
+    if walk.errorbarsfailed or elem.tag not in numerictags:
+        return
+    deleteattribs = []
+    for a in elem.attrib:
+        if a in nonzeroattributes:
+            try:
+                if len(elem.attrib[a]) == 0 or float(elem.attrib[a]) == 0.:
+                    deleteattribs.append(a)
+            except:
+                walk.log("errorbars",
+                         "Warning: problem reading error bars in tag " +
+                         elem.tag)
+                walk.errorbarsfailed = True
+                return
+    for a in deleteattribs:
+        walk.log("errorbars",
+                 "Warning: deleting error bars with value 0 in tag " +
+                 elem.tag)
+        del elem.attrib[a]
+    if "errorplus" in elem.attrib:
+        if not "errorminus" in elem.attrib:
+            walk.log("errorbars", "Warning: one sided error found in tag " +
+                     elem.tag + ". Fixing it.")
+            elem.attrib["errorminus"] = elem.attrib["errorplus"]
+    if "errorminus" in elem.attrib:
+        if not "errorplus" in elem.attrib:
+            walk.log("errorbars", "Warning: one sided error found in tag " +
+                     elem.tag + ". Fixing it.")
+            elem.attrib["errorplus"] = elem.attrib["errorminus"]
+
+
+@onfinish
+def reporterrorbars(walk):
+    if walk.errorbarsfailed:
+        walk.log("errorbars", "Problematic errorbar in in file \"" +
+                 walk.filename + "\".")
+
+
+@onenter()
+def findproblematictag(walk, elem, depth):
+    # Check if tags are valid and have valid attributes. A badly formatted
+    # number hides the problems of the subtree of its tag.
+    frame = walk.frames[-1]
+    if elem.tag in numerictags:
+        if elem.text:
+            if not re.match(num_format, elem.text):
+                frame.final = True
+                frame.problem = elem.tag
+                return
+        for a in elem.attrib:
+            if a in numericattributes:
+                if not re.match(num_format, elem.attrib[a]):
+                    frame.final = True
+                    frame.problem = elem.tag
+                    return
+    if elem.tag not in validtags:
+        frame.badtag = elem.tag
+    for a in elem.attrib:
+        if a not in validattributes:
+            frame.badattrib = a
+            break
 
+
+@onleave()
+def reduceproblematictag(walk, elem, depth):
+    # The problem of a tag is its bad attribute, or else its own name if it
+    # is unknown, or else the last problem found in its children
+    frame = walk.frames[-1]
+    if not frame.final:
+        frame.problem = frame.badattrib or frame.badtag or frame.childproblem
+    if depth:
+        if frame.problem:
+            walk.frames[-2].childproblem = frame.problem
+    else:
+        walk.problematictag = frame.problem
+
+
+@onfinish
+def reportproblematictag(walk):
+    if walk.problematictag:
+        walk.log("tags", "Problematic tag/attribute '" + walk.problematictag +
+                 "' found in file \"" + walk.filename + "\".")
+        walk.report.issues += 1
+
+
+@onenter("discoverymethod")
+def checkdiscoverymethod(walk, elem, depth):
+    if depth and not (elem.text in validdiscoverymethods):
+        walk.log("discoverymethod",
+                 "Problematic discoverymethod '" + elem.text +
+                 "' found in file \"" + walk.filename + "\".")
+        walk.report.issues += 1
+
+
+@onenter("planet", "star", "binary")
+def checkduplicatetags(walk, elem, depth):
     # Check if there are duplicate tags
-    for obj in planets + stars + binaries:
-        uniquetags = []
-        for child in obj:
-            if not child.tag in tagsallowmultiple:
-                if child.tag in uniquetags:
-                    print(
-                        "Error: Found duplicate tag \"" + child.tag + "\" in file \"" + filename + "\".")
-                    issues += 1
-                else:
-                    uniquetags.append(child.tag)
-
-    # Check binary planet lists
-    checkForBinaryPlanet(root, ".//binary/planet",
-                         "Planets in binary systems, P-type")
-    checkForBinaryPlanet(root, ".//binary/star/planet",
-                         "Planets in binary systems, S-type")
+    if not depth:
+        return
+    uniquetags = set()
+    for child in elem:
+        if not child.tag in tagsallowmultiple:
+            if child.tag in uniquetags:
+                walk.log("duplicate " + elem.tag,
+                         "Error: Found duplicate tag \"" + child.tag +
+                         "\" in file \"" + walk.filename + "\".")
+                walk.report.issues += 1
+            else:
+                uniquetags.add(child.tag)
+
+
+@onenter("planet")
+def checkbinaryplanet(walk, elem, depth):
+    # Checks if binary planets have been added to corresponding list
+    if depth > 1 and walk.path[-1].tag == "binary":
+        liststring = "Planets in binary systems, P-type"
+    elif (depth > 2 and walk.path[-1].tag == "star" and
+          walk.path[-2].tag == "binary"):
+        liststring = "Planets in binary systems, S-type"
+    else:
+        return
+    if liststring not in [plist.text for plist in elem.iter("list")]:
+        ET.SubElement(elem, "list").text = liststring
+        walk.log("binary " + liststring[-6:],
+                 "Added '" + walk.filename + "' to list '" + liststring +
+                 "'.")
+        walk.report.fileschanged += 1
+
 
+@onenter("list")
+def checklist(walk, elem, depth):
     # Check for valid list names
-    lists = root.findall(".//list")
-    for l in lists:
-        if l.text not in validlists:
-            print(
-                "Error: Invalid list \"" + l.text + "\" in file \"" + filename + "\".")
-            issues += 1
+    if depth and elem.text not in validlists:
+        walk.log("list", "Error: Invalid list \"" + elem.text +
+                 "\" in file \"" + walk.filename + "\".")
+        walk.report.issues += 1
+
 
+@onenter("planet")
+def checkplanetlists(walk, elem, depth):
     # Check if each planet is in at least one list
-    oneListOf = ["Confirmed planets", "Controversial",
-                 "Kepler Objects of Interest", "Solar System",
-                 "Retracted planet candidate"]
-    for p in planets:
-        isInList = 0
-        for l in p.findall("./list"):
-            if l.text in oneListOf:
-                isInList += 1
-        if isInList != 1:
-            print(
-                "Error: Planet needs to be in exactly one of the following lists: '" + "', '".join(
-                    oneListOf) + "'. Check planets in file \"" + filename + "\".")
-            issues += 1
-
-    # Check transiting planets
-    checkForTransitingPlanets(root)
-
-    # Cleanup XML
-    removeemptytags(root)
-    indent(root)
-
-    # Write XML to file.
-    with open(filename, 'wb') as outfile:
-        ET.ElementTree(root).write(outfile, encoding="UTF-8",
-                                   xml_declaration=False)
-
-    # Check for new md5
-    f = open(filename, 'rt')
-    md5_new = md5_for_file(f)
-    if md5_orig != md5_new:
-        fileschanged += 1
-
-errorcode = 0
-print(
-    "Cleanup script finished. %d files checked." % fileschecked)
-if fileschanged > 0:
-    print(
-        "%d file(s) modified." % fileschanged)
-    errorcode = 1
-
-if xmlerrors > 0:
-    print(
-        "%d XML errors found." % xmlerrors)
-    errorcode = 2
-
-if issues > 0:
-    print(
-        "Number of issues: %d (see above)." % issues)
-    errorcode = 3
-else:
-    print(
-        "No issues found.")
-
-sys.exit(errorcode)
+    if not depth:
+        return
+    isInList = 0
+    for l in elem.findall("./list"):
+        if l.text in oneListOf:
+            isInList += 1
+    if isInList != 1:
+        walk.log("one list",
+                 "Error: Planet needs to be in exactly one of the following "
+                 "lists: '" + "', '".join(oneListOf) +
+                 "'. Check planets in file \"" + walk.filename + "\".")
+        walk.report.issues += 1
+
+
+@onenter("planet")
+def checktransitingplanet(walk, elem, depth):
+    """ Checks for transisting planets by first seeing if there is a transittime and then checking the discovery
+    method
+    """
+    if not depth or elem.findtext('.//istransiting'):
+        return
+    addtag = 0
+    hasTransittime = elem.findtext(".//transittime")
+    discoveryMethod = elem.findtext(".//discoverymethod")
+    planetRadius = elem.findtext(".//radius")
+    if hasTransittime or 'transit' == discoveryMethod:
+        addtag = 1
+    else:
+        if planetRadius:  # only measured from transits, imaging for now
+            planetName = elem.findtext(".//name")
+            if planetName not in excludeList:
+                if not discoveryMethod == 'imaging':
+                    walk.log("transit",
+                             '{} in {} has a radius but is is missing a '
+                             'istransiting tag'.format(planetName,
+                                                       walk.filename))
+                    walk.report.issues += 1
+
+    if addtag:
+        ET.SubElement(elem, "istransiting").text = '1'
+        walk.log("transit",
+                 'Added istransiting tag to {}'.format(walk.filename))
+        walk.report.fileschanged += 1
+
+
+@onenter()
+def striptext(walk, elem, depth):
+    if elem.text:
+        elem.text = elem.text.strip()
+
+
+@onleave()
+def removeemptytags(walk, elem, depth):
+    # Removes empty nodes from the tree. Whether an element is empty is
+    # decided before its own empty children are removed.
+    if depth and len(elem) == 0 and elem.text is None and \
+            len(elem.attrib) == 0:
+        walk.frames[-2].empty.append(elem)
+    for child in walk.frames[-1].empty:
+        elem.remove(child)
+
+
+@onleave()
+def converterrors(walk, elem, depth):
+    # Convert error to errorminus and errorplus
+    if 'ep' in elem.attrib:
+        err = elem.attrib['ep']
+        del elem.attrib['ep']
+        elem.attrib['errorplus'] = err
+    if 'em' in elem.attrib:
+        err = elem.attrib['em']
+        del elem.attrib['em']
+        elem.attrib['errorminus'] = err
+    if 'error' in elem.attrib:
+        err = elem.attrib['error']
+        del elem.attrib['error']
+        elem.attrib['errorminus'] = err
+        elem.attrib['errorplus'] = err
+    if 'e' in elem.attrib:
+        err = elem.attrib['e']
+        del elem.attrib['e']
+        elem.attrib['errorminus'] = err
+        elem.attrib['errorplus'] = err
+
+
+@onleave()
+def indent(walk, elem, depth):
+    # Nicely indents the XML output, once the children are indented
+    i = "\n" + depth * "\t"
+    if len(elem):
+        if not elem.text or not elem.text.strip():
+            elem.text = i + "\t"
+        if not elem.tail or not elem.tail.strip():
+            elem.tail = i
+        last = elem[-1]
+        if not last.tail or not last.tail.strip():
+            last.tail = i
+    else:
+        if depth and (not elem.tail or not elem.tail.strip()):
+            elem.tail = i
+
+
+def cleanFile(filename):
+    """ (str) -> CleanupReport
+    Check and fix the system file at filename, write the cleaned XML back
+    if it differs from the file and return the report of what was found
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    cleaned, report = cleanBuffer(data, filename)
+    # Only write the files that actually changed
+    if cleaned is not None and cleaned != data:
+        with open(filename, 'wb') as outfile:
+            outfile.write(cleaned)
+    return report
+
+
+def cleanBuffer(data, filename):
+    """ (bytes, str) -> (bytes, CleanupReport)
+    Check and fix the content data of the system file named filename.
+    Return the cleaned XML, or None if data is not valid XML, and the report
+    of what was found
+    """
+    report = CleanupReport(filename)
+    report.fileschecked += 1
+
+    # Try to parse file
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError as error:
+        report.log(
+            '{}, {}'.format(filename, error))
+        report.xmlerrors += 1
+        report.issues += 1
+        return None, report
+
+    # Check and fix the tree in a single walk
+    Walk(report).run(root)
+
+    # Write XML to memory.
+    outfile = io.BytesIO()
+    ET.ElementTree(root).write(outfile, encoding="UTF-8",
+                               xml_declaration=False)
+    cleaned = outfile.getvalue()
+
+    # Check for changes, ignoring the newline convention of the file
+    if normalizenewlines(data) != normalizenewlines(cleaned):
+        report.fileschanged += 1
+    return cleaned, report
+
+
+def checkFiles(filenames, processes=None):
+    """ ([str], int) -> CleanupReport
+    Check and fix every system file in filenames, using up to processes
+    worker processes (one per core by default). The messages of each file
+    are printed in the order of filenames, and the reports of the files are
+    merged into the returned report
+    """
+    total = CleanupReport()
+    if processes == 1 or len(filenames) <= 1:
+        reports = map(cleanFile, filenames)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(processes)
+        reports = executor.map(cleanFile, filenames, chunksize=CHUNK_SIZE)
+    try:
+        for report in reports:
+            for message in report.messages:
+                print(message)
+            total.merge(report)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return total
+
+
+def cleanFiles(filenames, processes=None):
+    """ ([str], int) -> int
+    Check and fix every system file in filenames with checkFiles, print a
+    summary of the run and return its error code
+    """
+    report = checkFiles(filenames, processes)
+    for line in report.summary():
+        print(line)
+    return report.errorCode()
+
+
+def main():
+    """ () -> NoneType
+    Clean the whole catalogue and exit with the error code of the run
+    """
+    sys.exit(cleanFiles(glob.glob("open_exoplanet_catalogue/systems*/*.xml")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import subprocess
+import time
+
+# identity used for the commits when git has none configured
+DEFAULT_COMMITTER = ("OPCAT", "opcat@localhost")
+# mode of the files committed
+FILE_MODE = "100644"
+
+
+class GitError(Exception):
+    """ Raised when a git process of the backend fails
+    """
+
+
+class GitBackend:
+    """ Builds commits in a git repository without a working copy. Objects
+    are read through a long-lived `git cat-file --batch` process, and commits
+    are streamed to a long-lived `git fast-import` process, so that any number
+    of commits costs two git processes.
+    """
+
+    def __init__(self, repo, committer=None):
+        """ (str, (str, str)) -> NoneType
+        Create a backend for the git repository (bare or not) at the path
+        repo. committer is the (name, email) of the commits, by default the
+        identity configured in git
+        """
+        self.repo = repo
+        self.committer = committer
+        self._catFile = None
+        self._fastImport = None
+        self._mark = 0
+        # marks of the commits of the fast-import stream, which only knows
+        # them by mark until they are written
+        self._marks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _git(self, *args):
+        """ (str, ...) -> bytes
+        Run a single git command in the repository and return its output
+        """
+        try:
+            return subprocess.check_output(("git",) + args, cwd=self.repo,
+                                           stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError as error:
+            raise GitError("git " + " ".join(args) + " failed") from error
+
+    def _getCommitter(self):
+        """ () -> (str, str)
+        Return the name and email of the committer
+        """
+        if self.committer is None:
+            try:
+                ident = self._git("var", "GIT_COMMITTER_IDENT").decode(
+                    "UTF-8")
+                name, rest = ident.split(" <", 1)
+                self.committer = (name, rest.split(">", 1)[0])
+            except (GitError, ValueError):
+                self.committer = DEFAULT_COMMITTER
+        return self.committer
+
+    def _catFileProcess(self):
+        """ () -> Popen
+        Return the cat-file process, starting it on first use
+        """
+        if self._catFile is None:
+            self._catFile = subprocess.Popen(
+                ["git", "cat-file", "--batch"], cwd=self.repo,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        return self._catFile
+
+    def _fastImportProcess(self):
+        """ () -> Popen
+        Return the fast-import process, starting it on first use
+        """
+        if self._fastImport is None:
+            self._fastImport = subprocess.Popen(
+                ["git", "fast-import", "--quiet", "--done"], cwd=self.repo,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        return self._fastImport
+
+    def readObject(self, name):
+        """ (str) -> (str, str, bytes)
+        Return the sha, type and content of the object named name, such as
+        "master" or "master:systems/Sun.xml", or None if there is no such
+        object
+        """
+        process = self._catFileProcess()
+        process.stdin.write(name.encode("UTF-8") + b"\n")
+        process.stdin.flush()
+        header = process.stdout.readline()
+        if not header:
+            raise GitError("git cat-file exited")
+        fields = header.split()
+        if len(fields) != 3:
+            # "<name> missing" or "<name> ambiguous"
+            return None
+        sha, kind, size = fields
+        content = process.stdout.read(int(size))
+        # the content is followed by a newline
+        process.stdout.read(1)
+        return sha.decode("ascii"), kind.decode("ascii"), content
+
+    def resolve(self, rev):
+        """ (str) -> str
+        Return the sha of the commit rev, or None if there is no such commit
+        """
+        found = self.readObject(rev + "^{commit}")
+        if found is None:
+            return None
+        return found[0]
+
+    def readBlob(self, rev, path):
+        """ (str, str) -> bytes
+        Return the content of the file at path in the commit rev, or None if
+        there is no such file
+        """
+        found = self.readObject(rev + ":" + path)
+        if found is None or found[1] != "blob":
+            return None
+        return found[2]
+
+    def commit(self, branch, parent, message, files):
+        """ (str, str, str, dict of {str: bytes}) -> str
+        Commit the files, a dict of path to content, on top of the commit
+        parent, and point the branch to the new commit. Files which are not in
+        files are kept as they are in parent, and the commit has no parent if
+        parent is None. A file whose content is None is deleted. Return the
+        sha of the commit. The branch is only
+        updated in the repository by flush or close.
+        """
+        process = self._fastImportProcess()
+        self._mark += 1
+        name, email = self._getCommitter()
+        encoded = message.encode("UTF-8")
+        stream = [("commit refs/heads/" + branch + "\n").encode("UTF-8"),
+                  ("mark :%d\n" % self._mark).encode("ascii"),
+                  ("committer %s <%s> %d +0000\n" % (
+                      name, email, int(time.time()))).encode("UTF-8"),
+                  ("data %d\n" % len(encoded)).encode("ascii"), encoded,
+                  b"\n"]
+        if parent is not None:
+            parent = self._marks.get(parent, parent)
+            stream.append(("from " + parent + "\n").encode("UTF-8"))
+        for path in sorted(files):
+            content = files[path]
+            if content is None:
+                stream.append(("D " + path + "\n").encode("UTF-8"))
+                continue
+            stream.append(("M " + FILE_MODE + " inline " + path +
+                           "\n").encode("UTF-8"))
+            stream.append(("data %d\n" % len(content)).encode("ascii"))
+            stream.append(content)
+            stream.append(b"\n")
+        stream.append(b"\n")
+        stream.append(("get-mark :%d\n" % self._mark).encode("ascii"))
+        process.stdin.write(b"".join(stream))
+        process.stdin.flush()
+        sha = process.stdout.readline().strip().decode("ascii")
+        if not sha:
+            raise GitError("git fast-import exited")
+        self._marks[sha] = ":%d" % self._mark
+        return sha
+
+    def flush(self):
+        """ () -> NoneType
+        Write the branches committed to so far to the repository, so that
+        other git commands see them
+        """
+        if self._fastImport is not None:
+            self._fastImport.stdin.write(b"checkpoint\nprogress flushed\n")
+            self._fastImport.stdin.flush()
+            self._fastImport.stdout.readline()
+
+    def close(self):
+        """ () -> NoneType
+        Write the branches committed to and stop the git processes
+        """
+        if self._catFile is not None:
+            self._catFile.stdin.close()
+            self._catFile.wait()
+            self._catFile.stdout.close()
+            self._catFile = None
+        if self._fastImport is not None:
+            process = self._fastImport
+            self._fastImport = None
+            self._marks = {}
+            process.stdin.write(b"done\n")
+            process.stdin.close()
+            returncode = process.wait()
+            process.stdout.close()
+            if returncode != 0:
+                raise GitError("git fast-import failed")
@@ -1,13 +1,50 @@
 from subprocess import call
 import xml.etree.ElementTree as ET
+import collections
 import data_comparison.proposed_change as PC
 import os
 import datetime
 import storage_manager.storage_manager as STORAGE
+import github.cleanup as CLEANUP
+import github.gitBackend as BACKEND
+import github.publisher as PUBLISHER
+import github.mirror as MIRROR
+from data_parsing.CatalogueIndex import CatalogueIndex
+import data_parsing.schema as SCHEMA
+import io
 
 # 'static' vars
 files = []
 direc = "github/open_exoplanet_catalogue"
+# branch the strategy 1 branches start from
+BASE_BRANCH = "master"
+backend = None
+publisher = None
+# the options of the mirror for each clone_mode of the config: the whole
+# history, the latest commit only, or the file contents only as needed
+CLONE_MODES = {"full": {}, "shallow": {"shallow": True},
+               "partial": {"blobFilter": True}}
+# the ids of the changes of the strategy 1 branches queued, by branch
+queued = {}
+# the ids of the strategy 1 changes which could not be committed
+skipped = []
+
+
+def makeMirror():
+    """ () -> Mirror
+    Return the local clone of the catalogue, cloned as the clone_mode of the
+    config says (see CLONE_MODES), fully if it is not set
+    """
+    mode = STORAGE.config_get("clone_mode")
+    return MIRROR.Mirror(direc, **CLONE_MODES.get(mode, {}))
+
+
+# local clone of the catalogue, reused across accepts
+mirror = makeMirror()
+# working copy the strategy 2 modifications are made in
+workdir = direc
+# where the objects of the catalogue are in the repository
+index = None
 link = STORAGE.config_get("repo_url")
 
 
@@ -23,9 +60,30 @@ def getNextBranchNumber():
     Return the next valid branch number, and increment the next branch so it is
     valid still
     """
-    branch_number = STORAGE.config_get("branch_number")
-    STORAGE.config_set("branch_number", branch_number + 1)
-    return branch_number
+    # incremented at once, so that no two processes take the same number
+    return STORAGE.config_update("branch_number", lambda n: n + 1) - 1
+
+
+def getIndex():
+    """ () -> CatalogueIndex
+    Return the index of the catalogue written by the last update, reading it
+    on first use. The index is empty if no update stored one
+    """
+    global index
+    if index is None:
+        index = STORAGE.read_index_from_memory() or CatalogueIndex()
+    return index
+
+
+def locate(proposedChange):
+    """ (Modification) -> (str, str)
+    Return the path of the system file of the object of the modification, and
+    the element path of the object in that file, or None if the object is not
+    in the index
+    """
+    return getIndex().lookup(proposedChange.getOECType(),
+                             proposedChange.get_object_name(),
+                             proposedChange.getSystemName())
 
 
 def getCurrentBranchNumber():
@@ -39,92 +97,143 @@ def initGit():
     ''' () -> None
     Does any initialization to use github with strategy 1
     '''
-    # change to actual repository later
     global link
-    call(["git", "--bare", "clone", getLink()], cwd="github")
+    # the catalogue is only cloned the first time, and fetched afterwards
+    mirror.ensure(getLink())
     link = getLink().split('/')[-1][0:-4]
-    call(["git", "remote", "add", "upstream",
-          getLink()],
-         cwd=direc)
-    call(["git", "push", "--set-upstream", "origin", "master"], cwd=direc)
-    call(["git", "checkout", "master"], cwd=direc)
     return link
 
 
+def getBackend():
+    """ () -> GitBackend
+    Return the backend building the commits in the repository, starting it on
+    first use
+    """
+    global backend
+    if backend is None:
+        backend = BACKEND.GitBackend(direc)
+    return backend
+
+
+def getPublisher():
+    """ () -> Publisher
+    Return the publisher of the strategy 1 branches, creating it on first use
+    """
+    global publisher
+    if publisher is None:
+        publisher = PUBLISHER.Publisher(direc)
+    return publisher
+
+
+def finalizeGit():
+    """ () -> [str]
+    Does any final commands to use github with strategy 1: the branches are
+    written, pushed together and their pull requests opened
+    Return the ids of the modifications which were not published: those
+    which could not be committed, and those whose pull request failed
+    Raise GitError if the branches could not be written or pushed
+    """
+    global backend
+    unpublished = list(skipped)
+    try:
+        if backend is not None:
+            backend.close()
+            backend = None
+        if publisher is not None:
+            for branch, code in publisher.publish():
+                if code != 0:
+                    print("Pull request for " + branch + " failed.")
+                    unpublished.append(queued[branch])
+    finally:
+        queued.clear()
+        del skipped[:]
+    return unpublished
+
+
 def initGit2():
     ''' () -> None
-    Does any initialization to use github with strategy 1
+    Does any initialization to use github with strategy 2: the branch of the
+    modifications is checked out in its own worktree of the mirror
     '''
     global link
+    global workdir
+    del files[:]
     branch = "OPCAT" + str(getNextBranchNumber())
-    call(["git", "--bare", "clone", getLink()], cwd="github")
+    mirror.ensure(getLink())
     link = getLink().split('/')[-1][0:-4]
-    call(["git", "remote", "add", "upstream",
-          getLink()],
-         cwd=direc)
-    call(["git", "push", "--set-upstream", "origin", "master"], cwd=direc)
-    call(["git", "checkout", "master"], cwd=direc)
-    call(["git", "checkout", "-b", branch], cwd=direc)
-    call(["git", "push", "upstream", branch], cwd=direc)
+    workdir = mirror.addWorktree(branch)
+    try:
+        run(["git", "push", "upstream", branch])
+    except BACKEND.GitError:
+        mirror.removeWorktree(workdir)
+        workdir = direc
+        raise
     return link
 
 
 def finalizeGit2():
     """ () -> None
     Does any final commands to use github with strategy 2
+    Raise GitError if the branch could not be committed or pushed, or its
+    pull request opened
     """
+    global workdir
     branch = "OPCAT" + str(getCurrentBranchNumber())
-    print("Performing cleanup...")
-    call(["python3", "cleanup.py"], cwd="github")
-    call(["git", "add", "systems"], cwd=direc)
-    call(["git", "commit", "-m", "Cleanup"], cwd=direc)
-    print("...Cleanup complete")
+    try:
+        if files:
+            print("Performing cleanup...")
+            cleanup(files)
+            run(["git", "add"] + files)
+            # the cleanup may have nothing to change
+            if call(["git", "diff", "--cached", "--quiet"], cwd=workdir):
+                run(["git", "commit", "-m", "Cleanup"])
+            print("...Cleanup complete")
 
-    call(["git", "push", "upstream", branch], cwd=direc)
+        run(["git", "push", "upstream", branch])
 
-    # pull-request
-    call(["hub", "pull-request", "-f", "-h", branch, "-m",
-          "Compiled modifications"], cwd=direc)
+        # pull-request
+        run(["hub", "pull-request", "-f", "-h", branch, "-m",
+             "Compiled modifications"])
+    finally:
+        if workdir != direc:
+            mirror.removeWorktree(workdir)
+            workdir = direc
 
 
-def saveDirName(direc):
-    """ (str) -> None
-    Save the directory name for the repo
+def run(args):
+    """ ([str]) -> None
+    Run the command args in the working copy of the modifications
+    Raise GitError if it fails
     """
-    file = open('dirname', 'w')
-    file.write(direc)
-    file.close()
+    if call(args, cwd=workdir) != 0:
+        raise BACKEND.GitError(" ".join(args[:2]) + " failed")
 
 
-def getDirName():
+def UpdateRepo():
     """ () -> None
-        Get the directory name for the repo
+    Update the the local github repo to latest, cloning it if needed
     """
-    try:
-        file = open('dirname', 'r')
-        return file.read()
-    except IOError:
-        return None
+    mirror.ensure(getLink())
 
 
-def UpdateRepo():
-    """ () -> None
-    Update the the local github repo to latest
+def systemPath(proposedChange):
+    """ (ProposedChange) -> str
+    Return the path of the system file the proposed change applies to,
+    relative to the root of the repository
     """
-    # check for local github repo
-    direc = getDirName()
-    if (direc == None):
-        direc = initGit()
-        saveDirName(direc)
-
-    # updating github repo
-    call(["git", "fetch"], cwd=direc)
-    call(["git", "pull"], cwd=direc)
-    # commit process
-    # require login info first
-    # call(["git", "add", "."] + files, cwd=direc)
-    # call(["git", "commit", "-m", "automated commit"], cwd=direc)
-    # call(["git", "push"], cwd=direc)
+    location = locate(proposedChange)
+    if location is not None:
+        return location[0]
+    return "systems/" + proposedChange.getSystemName() + ".xml"
+
+
+def cleanup(paths):
+    """ ([str]) -> int
+    Run the catalogue cleanup on the given system files only, where paths
+    are relative to the root of the repository. Return the error code of the
+    cleanup
+    """
+    return CLEANUP.cleanFiles([os.path.join(workdir, path) for path in paths])
 
 
 def modifyXML(proposedChange, n, mode=False):
@@ -138,108 +247,236 @@ def modifyXML(proposedChange, n, mode=False):
     """
     # case if proposed change is modification
     if isinstance(proposedChange, PC.Modification):
-        path = "github/open_exoplanet_catalogue/systems/" + \
-               proposedChange.getSystemName() + ".xml"
-        path2 = "systems/" + proposedChange.getSystemName() + ".xml"
-        oec = ET.parse(path)
         # apply strategy 2
         if mode:
-            branch = "opcat" + str(getCurrentBranchNumber())
-            # if the proposed change is a star, modify the star fields
-            if proposedChange.getOECType() == "Star":
-                # modify
-                modifyStar(oec, proposedChange)
-                # commit
-            # if the proposed change is a planet, modify the planet fields
-            elif proposedChange.getOECType() == "Planet":
-                # modify
-                modifyPlanet(oec, proposedChange)
-                # commit
-            call(["git", "add", path2], cwd=direc)
-            commitMessage = str(proposedChange)
-            call(["git", "commit", "-m", commitMessage], cwd=direc)
+            acceptChanges([proposedChange])
         # apply strategy 1
         else:
             branch = "opcat" + str(getNextBranchNumber())
-            # if the proposed change is a star, modify the star fields
-            call(["git", "checkout", "master"], cwd=direc)
-            call(["git", "checkout", "-b", branch], cwd=direc)
-            call(["git", "push", "upstream", branch], cwd=direc)
-            # modify
-            if proposedChange.getOECType() == "Star":
-                modifyStar(oec, proposedChange)
-                # commit
-            # if the proposed change is a planet, modify the planet fields
-            elif proposedChange.getOECType() == "Planet":
-                # modify
-                modifyPlanet(oec, proposedChange)
-            # commit
-            path2 = "systems/" + proposedChange.getSystemName() + ".xml"
-            call(["git", "add", path2], cwd=direc)
             commitMessage = str(proposedChange)
-
-            call(["git", "commit", "-m", commitMessage, path2], cwd=direc)
             print("Performing cleanup...")
-            call(["python3", "cleanup.py"], cwd="github")
-            call(["git", "commit", "-m", "Cleanup", path2], cwd=direc)
+            head = commitChange(getBackend(), proposedChange, branch)
             print("...Cleanup complete")
-            call(["git", "push", "upstream", branch], cwd=direc)
-            # pull-request
-            call(["hub", "pull-request", "-f", "-h", branch, "-m",
-                  commitMessage], cwd=direc)
+            # pushed, with its pull request, by finalizeGit
+            if head is not None:
+                getPublisher().add(branch, commitMessage)
+                queued[branch] = proposedChange.getId()
+            else:
+                skipped.append(proposedChange.getId())
+
+
+def commitChange(backend, proposedChange, branch, base=BASE_BRANCH):
+    """ (GitBackend, Modification, str, str) -> str
+    Commit the modification on a new branch started from base, without
+    touching the working copy: one commit with the modification, followed by
+    a commit with the cleanup of the system file if it changes anything.
+    Return the sha of the last commit of the branch, or None if the system
+    file of the modification, or its object, is not in base, in which case
+    nothing is committed
+    """
+    path = systemPath(proposedChange)
+    parent = backend.resolve(base)
+    data = backend.readBlob(parent, path)
+    if data is None:
+        print("Skipped, " + path + " is not in the catalogue: " +
+              commitSummary(proposedChange))
+        return None
+    modified = applyChangesToBuffer(data, [proposedChange])
+    if modified is None:
+        return None
+    head = backend.commit(branch, parent, str(proposedChange),
+                          {path: modified})
+    cleaned, report = CLEANUP.cleanBuffer(modified, path)
+    for message in report.messages:
+        print(message)
+    if cleaned is not None and cleaned != modified:
+        head = backend.commit(branch, head, "Cleanup", {path: cleaned})
+    return head
+
+
+def acceptChanges(proposedChanges):
+    """ ([ProposedChange]) -> [str]
+    Apply strategy 2 to a list of accepted proposed changes: the modifications
+    are written to the system files with applyChanges, and committed together
+    on the current branch. Return the paths of the modified system files.
+    """
+    paths = applyChanges(proposedChanges)
+    # remember the files of the branch, for the cleanup in finalizeGit2
+    files.extend(path for path in paths if path not in files)
+    if paths:
+        run(["git", "add"] + paths)
+        commitMessage = "Compiled modifications\n\n" + "\n".join(
+            commitSummary(proposedChange) for proposedChange in
+            proposedChanges if isinstance(proposedChange, PC.Modification))
+        run(["git", "commit", "-m", commitMessage])
+    return paths
+
+
+def applyChanges(proposedChanges):
+    """ ([ProposedChange]) -> [str]
+    Apply every modification in the list of proposed changes to the system
+    files of the repository. The modifications are grouped by system file, so
+    that each file is parsed once, modified in memory and written once.
+    Return the paths of the modified files, relative to the repository.
+    """
+    changesByPath = collections.OrderedDict()
+    for proposedChange in proposedChanges:
+        if isinstance(proposedChange, PC.Modification):
+            changesByPath.setdefault(systemPath(proposedChange), []).append(
+                proposedChange)
+    paths = []
+    for path in changesByPath:
+        with open(os.path.join(workdir, path), "rb") as f:
+            data = f.read()
+        modified = applyChangesToBuffer(data, changesByPath[path])
+        if modified is not None:
+            with open(os.path.join(workdir, path), "wb") as f:
+                f.write(modified)
+            paths.append(path)
+    return paths
+
+
+def applyChangesToBuffer(data, proposedChanges):
+    """ (bytes, [ProposedChange]) -> bytes
+    Given the content of a system file, apply the modifications of the
+    proposed changes to it and update its date. The modifications whose
+    object is not in the file are skipped. Return the new content, or None if
+    every modification was skipped
+    """
+    oec = ET.ElementTree(ET.fromstring(data))
+    applied = False
+    for proposedChange in proposedChanges:
+        if applyChange(oec, proposedChange):
+            applied = True
+        else:
+            print("Skipped, " + proposedChange.get_object_name() +
+                  " is not in its system file: " +
+                  commitSummary(proposedChange))
+    if not applied:
+        return None
+    modifyDateToCurrent(oec)
+    output = io.BytesIO()
+    oec.write(output)
+    return output.getvalue()
+
+
+def applyChange(oec, proposedChange):
+    """ (ElementTree, ProposedChange) -> bool
+    Given the XML for the related proposed change, apply the modification to
+    the element of the object it refers to, in memory. Return whether the
+    element was found
+    """
+    # if the proposed change is a star, modify the star fields
+    if proposedChange.getOECType() == "Star":
+        return modifyStar(oec, proposedChange)
+    # if the proposed change is a planet, modify the planet fields
+    elif proposedChange.getOECType() == "Planet":
+        return modifyPlanet(oec, proposedChange)
+    # if the proposed change is a system, modify the system fields
+    elif proposedChange.getOECType() == "System":
+        return modifySystem(oec, proposedChange)
+    return False
+
+
+def commitSummary(proposedChange):
+    """ (Modification) -> str
+    Return a one line description of a modification for commit messages
+    """
+    return (proposedChange.getSystemName() + ": " +
+            proposedChange.get_object_name() + " " +
+            str(proposedChange.field_modified) + " " +
+            str(proposedChange.value_in_OEC) + " -> " +
+            str(proposedChange.value_in_origin_catalogue) + " (" +
+            str(proposedChange.origin) + ")")
 
 
 def modifyStar(oec, proposedChange):
-    """ (ElementTree, ProposedChange) -> None
+    """ (ElementTree, ProposedChange) -> bool
     Given the XML for the related proposed change, and a ProposedChange for a
-    star, apply the modifications of the proposed change into the XML
+    star, apply the modifications of the proposed change into the XML. Return
+    False if the star is not in the XML
     """
-    specificStarXML = None
-    path = "github/open_exoplanet_catalogue/systems/" + \
-           proposedChange.getSystemName() + ".xml"
-    # find the star we want
-    for starXML in oec.findall(".//star"):
-        for child in starXML.findall(".//name"):
-            if child.text == proposedChange.get_object_name():
-                specificStarXML = starXML
+    specificStarXML = findElement(oec, proposedChange, "star")
+    if specificStarXML is None:
+        return False
 
     # now modify our data field we want
-    child = specificStarXML.find(".//" + str(proposedChange.field_modified))
-    child.text = str(proposedChange.value_in_origin_catalogue)
-    oec.write(path)
-    modifyDateToCurrent(oec, proposedChange)
+    child = findField(specificStarXML, proposedChange)
+    child.text = SCHEMA.formatValue(
+        proposedChange.value_in_origin_catalogue)
+    return True
+
+
+def findField(element, proposedChange):
+    """ (Element, Modification) -> Element
+    Return the child of the element for the field modified by the proposed
+    change, added to the element if it has none
+    """
+    field = str(proposedChange.field_modified)
+    child = element.find("./" + field)
+    if child is None:
+        child = ET.SubElement(element, field)
+    return child
+
+
+def findElement(oec, proposedChange, tag):
+    """ (ElementTree, Modification, str) -> Element
+    Return the element, with the given tag, of the object of the proposed
+    change in the XML of its system, or None if it is not there. The element
+    is found with its path in the index; objects which are not indexed, or
+    whose element has moved since the index was built, are searched by name
+    """
+    name = proposedChange.get_object_name()
+    location = locate(proposedChange)
+    if location is not None:
+        element = oec.getroot().find(location[1])
+        if element is not None and element.tag == tag and \
+                name in [child.text for child in element.findall("./name")]:
+            return element
+    found = None
+    for elementXML in oec.iter(tag):
+        for child in elementXML.findall(".//name"):
+            if child.text == name:
+                found = elementXML
+    return found
+
+
+def modifySystem(oec, proposedChange):
+    """ (ElementTree, ProposedChange) -> bool
+    Given the XML for the related proposed change, and a ProposedChange for a
+    system, apply the modifications of the proposed change into the XML.
+    Return True, the system being the root of the XML
+    """
+    # the system fields are the direct children of the root
+    child = findField(oec.getroot(), proposedChange)
+    child.text = SCHEMA.formatValue(
+        proposedChange.value_in_origin_catalogue)
+    return True
 
 
-def modifyDateToCurrent(oec, proposedChange):
+def modifyDateToCurrent(oec):
     """(ElementTree) -> None
-    Given the XML for the related proposed change, modify the date to be the
-    current date
+    Given the XML of a system, modify the date to be the current date
     """
-    path = "github/open_exoplanet_catalogue/systems/" + \
-           proposedChange.getSystemName() + ".xml"
     child = oec.find(".//lastupdate")
     child.text = datetime.datetime.strftime(datetime.datetime.now(),
                                             '%Y/%m/%d')[2:]
-    oec.write(path)
 
 
 def modifyPlanet(oec, proposedChange):
-    """ (ElementTree, ProposedChange) -> None
+    """ (ElementTree, ProposedChange) -> bool
     Given the XML for the related proposed, and a ProposedChange for a star,
-    apply the modifications of the proposed change into the XML
+    apply the modifications of the proposed change into the XML. Return False
+    if the planet is not in the XML
     """
-    specificPlanetXML = None
-    path = "github/open_exoplanet_catalogue/systems/" + \
-           proposedChange.getSystemName() + ".xml"
-    # find the planet we want
-    for planetXML in oec.findall(".//planet"):
-        for child in planetXML.findall(".//name"):
-            if child.text == proposedChange.get_object_name():
-                specificPlanetXML = planetXML
+    specificPlanetXML = findElement(oec, proposedChange, "planet")
+    if specificPlanetXML is None:
+        return False
 
     # now modify our data field we want
-    child = specificPlanetXML.find(".//" + str(proposedChange.field_modified))
-    child.text = str(proposedChange.value_in_origin_catalogue)
+    child = findField(specificPlanetXML, proposedChange)
+    child.text = SCHEMA.formatValue(
+        proposedChange.value_in_origin_catalogue)
     # modify the related error bounds if they exist
     if proposedChange.origin_upper != "N/A" and proposedChange.upper_attrib_name != "N/A":
         if proposedChange.OEC_upper != "N/A" and float(
@@ -257,6 +494,4 @@ def modifyPlanet(oec, proposedChange):
         elif proposedChange.OEC_lower == "N/A":
             child.attrib[
                 proposedChange.lower_attrib_name] = proposedChange.origin_lower
-    oec.write(path)
-    # update the date to the current
-    modifyDateToCurrent(oec, proposedChange)
+    return True
@@ -0,0 +1,109 @@
+import os
+import subprocess
+from github.gitBackend import GitError
+
+# branch of the catalogue the changes are made against
+DEFAULT_BRANCH = "master"
+# remote the pull requests are made to
+UPSTREAM = "upstream"
+
+
+class Mirror:
+    """ A local clone of the catalogue repository, which is cloned once and
+    then kept up to date with fetches. The clone's own working copy tracks the
+    default branch and is never edited: branches are edited in worktrees.
+    """
+
+    def __init__(self, path, shallow=False, blobFilter=False):
+        """ (str, bool, bool) -> NoneType
+        Create a mirror at the path. If shallow, only the latest commit is
+        cloned; if blobFilter, the file contents are only downloaded when
+        they are needed
+        """
+        self.path = path
+        self.shallow = shallow
+        self.blobFilter = blobFilter
+
+    def _git(self, *args, cwd=None):
+        """ (str, ...) -> str
+        Run a git command in the mirror, and return its output
+        """
+        try:
+            return subprocess.check_output(
+                ("git",) + args, cwd=cwd or self.path,
+                stderr=subprocess.DEVNULL).decode("UTF-8")
+        except subprocess.CalledProcessError as error:
+            raise GitError("git " + " ".join(args) + " failed") from error
+
+    def isCloned(self):
+        """ () -> bool
+        Return whether the mirror has been cloned
+        """
+        return os.path.exists(os.path.join(self.path, ".git"))
+
+    def clone(self, url):
+        """ (str) -> NoneType
+        Clone the repository at url into the mirror
+        """
+        parent = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+        args = ["clone", "-q", "--branch", DEFAULT_BRANCH]
+        if self.shallow:
+            args += ["--depth", "1", "--no-single-branch"]
+        if self.blobFilter:
+            args.append("--filter=blob:none")
+        self._git(*(args + [url, os.path.abspath(self.path)]), cwd=parent)
+
+    def setRemote(self, name, url):
+        """ (str, str) -> NoneType
+        Point the remote name to url, adding it if needed
+        """
+        remotes = self._git("remote").split()
+        if name not in remotes:
+            self._git("remote", "add", name, url)
+        elif self._git("remote", "get-url", name).strip() != url:
+            self._git("remote", "set-url", name, url)
+
+    def update(self):
+        """ () -> NoneType
+        Fetch the new commits of the repository, and fast-forward the default
+        branch to them
+        """
+        self._git("fetch", "-q", "--prune", "origin")
+        self._git("merge", "-q", "--ff-only", "origin/" + DEFAULT_BRANCH)
+
+    def ensure(self, url):
+        """ (str) -> bool
+        Make the mirror an up to date clone of the repository at url, which
+        is also its upstream remote. Return whether it had to be cloned
+        """
+        cloned = not self.isCloned()
+        if cloned:
+            self.clone(url)
+        else:
+            self.setRemote("origin", url)
+            self.update()
+        self.setRemote(UPSTREAM, url)
+        return cloned
+
+    def worktreePath(self, branch):
+        """ (str) -> str
+        Return the path of the worktree of branch
+        """
+        return os.path.abspath(self.path) + "-worktrees/" + branch
+
+    def addWorktree(self, branch, start=DEFAULT_BRANCH):
+        """ (str, str) -> str
+        Create a worktree with branch checked out, starting the branch at
+        start, and return its path
+        """
+        path = self.worktreePath(branch)
+        self._git("worktree", "add", "-q", "-B", branch, path, start)
+        return path
+
+    def removeWorktree(self, path):
+        """ (str) -> NoneType
+        Remove the worktree at path, keeping its branch
+        """
+        self._git("worktree", "remove", "--force", path)
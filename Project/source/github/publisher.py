@@ -0,0 +1,75 @@
+import subprocess
+import concurrent.futures
+from github.gitBackend import GitError
+
+# command used to open the pull requests
+HUB_COMMAND = ("hub",)
+# remote the branches are pushed to
+REMOTE = "upstream"
+# number of pull requests opened at the same time
+PR_WORKERS = 4
+
+
+class Publisher:
+    """ Collects the branches made for accepted changes, and publishes them
+    together: all the branches are pushed with a single git push, and their
+    pull requests are opened from a bounded pool of workers
+    """
+
+    def __init__(self, repo, remote=REMOTE, hubCommand=HUB_COMMAND,
+                 workers=PR_WORKERS):
+        """ (str, str, tuple of str, int) -> NoneType
+        Create a publisher for the git repository at the path repo, pushing
+        to remote and opening the pull requests with hubCommand, at most
+        workers at a time
+        """
+        self.repo = repo
+        self.remote = remote
+        self.hubCommand = tuple(hubCommand)
+        self.workers = workers
+        self.pending = []
+
+    def add(self, branch, message):
+        """ (str, str) -> NoneType
+        Queue the branch to be pushed, with a pull request described by
+        message
+        """
+        self.pending.append((branch, message))
+
+    def push(self):
+        """ () -> int
+        Push every queued branch in a single git push, and return its exit
+        code
+        """
+        branches = [branch for branch, message in self.pending]
+        return subprocess.call(["git", "push", self.remote] + branches,
+                               cwd=self.repo)
+
+    def pullRequest(self, branch, message):
+        """ (str, str) -> int
+        Open the pull request of branch, and return the exit code of the
+        command
+        """
+        return subprocess.call(list(self.hubCommand) + [
+            "pull-request", "-f", "-h", branch, "-m", message], cwd=self.repo)
+
+    def publish(self):
+        """ () -> [(str, int)]
+        Push the queued branches, then open their pull requests. Return the
+        branches with the exit code of their pull request, in the order they
+        were queued. The queue is emptied
+        Raise GitError if the push failed, in which case no pull request is
+        opened
+        """
+        pending = self.pending
+        if not pending:
+            return []
+        pushed = self.push() == 0
+        self.pending = []
+        if not pushed:
+            raise GitError("Pushing the branches failed.")
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            codes = list(executor.map(lambda change: self.pullRequest(*change),
+                                      pending))
+        return [(branch, code) for (branch, message), code in
+                zip(pending, codes)]
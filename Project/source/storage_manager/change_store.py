@@ -0,0 +1,662 @@
+import calendar
+import contextlib
+import datetime
+import pickle
+import shlex
+import sqlite3
+import string
+from data_parsing import schema
+from data_comparison.proposed_change import SHOWN_ID_LENGTH
+
+# the version of the tables of the store, kept as the user_version of the
+# database; version 0 keyed the changes by their position
+SCHEMA_VERSION = 1
+
+# the seconds a process waits for another to finish writing to the store
+# before giving up with sqlite3.OperationalError
+BUSY_TIMEOUT = 60
+
+# the fewest characters an id is shortened to, see ChangeStore.select
+MIN_ID_PREFIX = 8
+
+# the columns of the changes table which a ChangeFilter can match, by the name
+# of the filter attribute
+FILTER_COLUMNS = (("origin", "origin"), ("object_type", "object_type"),
+                  ("system", "system_name"), ("field", "field"))
+
+# the secondary indexes of the changes table, by name. The columns matched
+# regardless of case are indexed regardless of case, for the index to be
+# used by the filters, and then by position, for the changes a filter
+# selects to be listed in order from the index alone
+INDEXES = (("changes_position", "position"),
+           ("changes_origin", "origin COLLATE NOCASE, position"),
+           ("changes_object_type", "object_type COLLATE NOCASE, position"),
+           ("changes_system_name", "system_name COLLATE NOCASE, position"),
+           ("changes_field", "field COLLATE NOCASE, position"),
+           ("changes_lastupdate", "lastupdate, position"))
+
+# the columns of the changes table read by ChangeStore.summaries
+SUMMARY_COLUMNS = ("position", "id", "origin", "object_type", "system_name",
+                   "object_name", "field", "lastupdate")
+
+# the terms of a query, see parse_query, by the name of the filter attribute
+# they set
+QUERY_TERMS = {"origin": "origin", "type": "object_type", "system": "system",
+               "field": "field", "since": "since", "until": "until"}
+
+
+class ChangeFilter:
+    '''
+    Selects the stored proposed changes to show. Every attribute left to None
+    selects all the changes: origin, object_type ("Planet", "Star" or
+    "System"), system (the name of the system of the object) and field (the
+    field modified) match regardless of case, and may hold "*" wildcards
+    matching any text, ex: "Kepler*"; since and until are the datetime.date
+    range, both included, the changes were last updated in.
+    '''
+
+    def __init__(self, origin=None, object_type=None, system=None,
+                 field=None, since=None, until=None):
+        self.origin = origin
+        self.object_type = object_type
+        self.system = system
+        self.field = field
+        self.since = since
+        self.until = until
+
+    def where(self):
+        '''
+        () -> (str, [object])
+
+        Returns the WHERE clause of the changes table selecting the changes,
+        and its parameters. The clause is empty if every change is selected.
+        '''
+        conditions = []
+        params = []
+        for (attribute, column) in FILTER_COLUMNS:
+            value = getattr(self, attribute)
+            if value is None:
+                continue
+            if "*" in value:
+                # LIKE matches regardless of case
+                conditions.append(column + " LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(value))
+            else:
+                conditions.append(column + " = ? COLLATE NOCASE")
+                params.append(value)
+        if self.since is not None:
+            conditions.append("lastupdate >= ?")
+            params.append(self.since.isoformat())
+        if self.until is not None:
+            conditions.append("lastupdate <= ?")
+            params.append(self.until.isoformat())
+        if not conditions:
+            return ("", params)
+        return (" WHERE " + " AND ".join(conditions), params)
+
+
+class ChangeStore:
+    '''
+    The proposed changes pending review, stored in an SQLite database. Each
+    change is a row keyed by the id of the change (see ProposedChange.getId)
+    holding the change pickled, the number it is shown under (its position in
+    the list of changes at the last update, from 1) and the columns it is
+    selected by, so that a page of the changes can be read without
+    unpickling the others. The changes keep their number when other changes
+    are removed. Several processes may use the store at once, such as the
+    autoupdate daemon and the commands of the user: every change to the
+    store is a single transaction, and reading never waits for writing.
+    '''
+
+    def __init__(self, path):
+        '''
+        (str) -> None
+
+        Opens the store in the database file at path, creating it if needed.
+        '''
+        self.path = path
+        # the transactions are begun by _transaction, see there
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT,
+                                          isolation_level=None)
+        # the readers of the store read the last changes committed, and do
+        # not keep a writer from committing, nor the writer them from reading
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        # the ids selected by the bulk operations, and their positions
+        self.connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS selected ("
+            "id TEXT PRIMARY KEY, "
+            "position INTEGER)")
+        with self._transaction():
+            # read again in the transaction, another process may have
+            # created the tables in the meantime
+            version = self.connection.execute(
+                "PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                self._create(version)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        '''
+        () -> context manager
+
+        Runs the statements executed in the context in a single transaction,
+        committed when the context is left, or rolled back if it is left by
+        an exception. The transaction holds the write lock of the database
+        from its start, waiting BUSY_TIMEOUT seconds at most for the other
+        processes writing to the store, so that a transaction never fails
+        half way because another process wrote in the meantime.
+        '''
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+
+    def _create(self, version):
+        '''
+        (int) -> None
+
+        Creates the tables of the store in the database, which has the
+        tables of the version version of the store; the changes stored in
+        earlier versions are moved into the new tables. Runs in the
+        transaction of the caller.
+        '''
+        tables = set(row[0] for row in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"))
+        changes_list = []
+        black_list = []
+        if version == 0 and "changes" in tables:
+            # the changes were keyed by their position
+            changes_list = [pickle.loads(row[0]) for row in
+                            self.connection.execute(
+                                "SELECT change FROM changes "
+                                "ORDER BY position")]
+            if "blacklist" in tables:
+                black_list = [pickle.loads(row[0]) for row in
+                              self.connection.execute(
+                                  "SELECT change FROM blacklist "
+                                  "ORDER BY rowid")]
+        self.connection.execute("DROP TABLE IF EXISTS changes")
+        self.connection.execute("DROP TABLE IF EXISTS blacklist")
+        self.connection.execute(
+            "CREATE TABLE changes ("
+            "id TEXT PRIMARY KEY, "
+            "position INTEGER NOT NULL, "
+            "origin TEXT, "
+            "object_type TEXT, "
+            "system_name TEXT, "
+            "object_name TEXT, "
+            "field TEXT, "
+            "lastupdate TEXT, "
+            "change BLOB NOT NULL)")
+        for (name, column) in INDEXES:
+            self.connection.execute(
+                "CREATE INDEX " + name + " ON changes (" + column + ")")
+        # the changes declined by the user, which are not proposed again
+        self.connection.execute(
+            "CREATE TABLE blacklist ("
+            "id TEXT PRIMARY KEY, "
+            "change BLOB NOT NULL)")
+        self.connection.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        self._add_to_blacklist(black_list)
+        self._replace(changes_list)
+
+    def close(self):
+        '''
+        () -> None
+
+        Closes the database of the store.
+        '''
+        self.connection.close()
+
+    def replace(self, changes_list):
+        '''
+        ([ProposedChange]) -> None
+
+        Replaces the stored changes with changes_list, numbered in its order.
+        Only the changes which were not stored yet are written, the others
+        are given their new number, and the changes which are not in
+        changes_list are removed. Of equal changes, the first is kept. The
+        changes in the blacklist are left out, including those denied by
+        another process while changes_list was made.
+        '''
+        with self._transaction():
+            self._replace(changes_list)
+
+    def _replace(self, changes_list):
+        '''
+        ([ProposedChange]) -> None
+
+        Replaces the stored changes with changes_list, as replace does, in
+        the transaction of the caller.
+        '''
+        numbered = dict()
+        for (position, change) in enumerate(changes_list, 1):
+            numbered.setdefault(change.getId(), (position, change))
+        self._select((change_id, numbered[change_id][0])
+                     for change_id in numbered)
+        self.connection.execute(
+            "DELETE FROM selected WHERE id IN (SELECT id FROM blacklist)")
+        self.connection.execute(
+            "DELETE FROM changes WHERE id NOT IN (SELECT id FROM selected)")
+        self.connection.execute(
+            "UPDATE changes SET position = (SELECT position FROM selected "
+            "WHERE selected.id = changes.id)")
+        new = set(row[0] for row in self.connection.execute(
+            "SELECT id FROM selected WHERE id NOT IN (SELECT id FROM "
+            "changes)"))
+        self.connection.executemany(
+            "INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (_row(change_id, numbered[change_id][0], numbered[change_id][1])
+             for change_id in numbered if change_id in new))
+
+    def count(self, change_filter=None):
+        '''
+        (ChangeFilter) -> int
+
+        Returns the number of changes stored, or selected by change_filter.
+        '''
+        (where, params) = _where(change_filter)
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM changes" + where, params).fetchone()[0]
+
+    def get(self, position):
+        '''
+        (int) -> ProposedChange
+
+        Returns the change numbered position, or None if there is no such
+        change.
+        '''
+        row = self.connection.execute(
+            "SELECT change FROM changes WHERE position = ?",
+            (position,)).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def changes(self, change_filter=None, offset=0, limit=None):
+        '''
+        (ChangeFilter, int, int) -> iterator of (int, ProposedChange)
+
+        Yields the number and change of the changes selected by
+        change_filter, in order, skipping the first offset of them and
+        stopping after limit of them. Only the changes yielded are read and
+        unpickled, as they are yielded.
+        '''
+        (where, params) = _where(change_filter)
+        query = "SELECT position, change FROM changes" + where + \
+            " ORDER BY position LIMIT ? OFFSET ?"
+        # a negative limit is no limit
+        params = params + [-1 if limit is None else limit, offset]
+        for (position, change) in self.connection.execute(query, params):
+            yield (position, pickle.loads(change))
+
+    def summaries(self, change_filter=None, offset=0, limit=None):
+        '''
+        (ChangeFilter, int, int) -> iterator of tuple
+
+        Yields the columns of the changes selected by change_filter, named
+        in SUMMARY_COLUMNS, as changes() yields the changes. No change is
+        unpickled.
+        '''
+        (where, params) = _where(change_filter)
+        query = "SELECT " + ", ".join(SUMMARY_COLUMNS) + " FROM changes" + \
+            where + " ORDER BY position LIMIT ? OFFSET ?"
+        params = params + [-1 if limit is None else limit, offset]
+        return iter(self.connection.execute(query, params))
+
+    def all(self):
+        '''
+        () -> [ProposedChange]
+
+        Returns the list of every stored change, in order.
+        '''
+        return [change for (position, change) in self.changes()]
+
+    def ids(self, change_filter=None):
+        '''
+        (ChangeFilter) -> [str]
+
+        Returns the ids of the changes selected by change_filter, in order.
+        '''
+        (where, params) = _where(change_filter)
+        return [row[0] for row in self.connection.execute(
+            "SELECT id FROM changes" + where + " ORDER BY position", params)]
+
+    def select(self, text):
+        '''
+        (str) -> [str]
+
+        Returns the ids of the changes written in text: comma separated
+        numbers, ranges of numbers and ids, ex: "1,4,7-9,3fa2b1c4". "s" is
+        the first number and "e" the last; a range may go backwards, ex:
+        "e-s", and selects the changes numbered within it. An id may be
+        shortened to its first MIN_ID_PREFIX characters or more, as long as
+        a single change has an id starting with them. Ids are returned once,
+        in the order they are written.
+        Raises ValueError if text is not understood, or names no change.
+        '''
+        (first, last) = self.connection.execute(
+            "SELECT MIN(position), MAX(position) FROM changes").fetchone()
+        selected = []
+        seen = set()
+        for part in text.split(","):
+            part = part.strip()
+            if is_change_id(part):
+                found = [self._find_id(part)]
+            else:
+                found = self._find_positions(
+                    [_parse_position(bound, first, last)
+                     for bound in part.split("-")])
+            for change_id in found:
+                if change_id not in seen:
+                    seen.add(change_id)
+                    selected.append(change_id)
+        return selected
+
+    def _find_id(self, prefix):
+        '''
+        (str) -> str
+
+        Returns the id of the single change whose id starts with prefix.
+        Raises ValueError if there is no such change, or more than one.
+        '''
+        found = [row[0] for row in self.connection.execute(
+            "SELECT id FROM changes WHERE id GLOB ? LIMIT 2",
+            (prefix.lower() + "*",))]
+        if not found:
+            raise ValueError("No change has the id " + prefix)
+        if len(found) > 1:
+            raise ValueError("More than one change has an id starting "
+                             "with " + prefix)
+        return found[0]
+
+    def _find_positions(self, bounds):
+        '''
+        ([int]) -> [str]
+
+        Returns the ids of the change numbered bounds[0], or of the changes
+        numbered from bounds[0] to bounds[1], in that order.
+        Raises ValueError if there is no change numbered bounds[0], or more
+        than two bounds.
+        '''
+        if len(bounds) == 1:
+            found = [row[0] for row in self.connection.execute(
+                "SELECT id FROM changes WHERE position = ?", bounds)]
+            if not found:
+                raise ValueError("No change is numbered " + str(bounds[0]))
+            return found
+        if len(bounds) != 2:
+            raise ValueError("Invalid range")
+        order = "ASC" if bounds[0] <= bounds[1] else "DESC"
+        return [row[0] for row in self.connection.execute(
+            "SELECT id FROM changes WHERE position BETWEEN ? AND ? "
+            "ORDER BY position " + order, sorted(bounds))]
+
+    def numbered(self, ids):
+        '''
+        ([str]) -> [(int, ProposedChange)]
+
+        Returns the number and change of the changes with the ids, in the
+        order of ids. The ids of no change are left out.
+        '''
+        found = dict()
+        for start in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[start:start + _MAX_PARAMS]
+            query = "SELECT id, position, change FROM changes WHERE id " \
+                "IN (" + ", ".join("?" * len(chunk)) + ")"
+            for (change_id, position, change) in self.connection.execute(
+                    query, chunk):
+                found[change_id] = (position, pickle.loads(change))
+        return [found[change_id] for change_id in ids if change_id in found]
+
+    def remove(self, ids=None, change_filter=None, blacklist=False):
+        '''
+        ([str], ChangeFilter, bool) -> int
+
+        Removes the changes with the ids if they are given, or else the
+        changes selected by change_filter, and returns the number of changes
+        removed. If blacklist, they are added to the blacklist. This is done
+        in a single transaction; the other changes are left as they are.
+        '''
+        with self._transaction():
+            if ids is not None:
+                self._select((change_id, None) for change_id in ids)
+                where = " WHERE id IN (SELECT id FROM selected)"
+                params = []
+            else:
+                (where, params) = _where(change_filter)
+            if blacklist:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO blacklist (id, change) SELECT id, "
+                    "change FROM changes" + where + " ORDER BY position",
+                    params)
+            removed = self.connection.execute(
+                "DELETE FROM changes" + where, params).rowcount
+        return removed
+
+    def _select(self, selected):
+        '''
+        (iterator of (str, int)) -> None
+
+        Fills the selected table with the ids and positions of selected, the
+        first position of an id being kept.
+        '''
+        self.connection.execute("DELETE FROM selected")
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO selected VALUES (?, ?)", selected)
+
+    def blacklist(self):
+        '''
+        () -> [ProposedChange]
+
+        Returns the changes in the blacklist, in the order they were added.
+        '''
+        return [pickle.loads(row[0]) for row in self.connection.execute(
+            "SELECT change FROM blacklist ORDER BY rowid")]
+
+    def blacklisted_ids(self):
+        '''
+        () -> set of str
+
+        Returns the ids of the changes in the blacklist.
+        '''
+        return set(row[0] for row in self.connection.execute(
+            "SELECT id FROM blacklist"))
+
+    def add_to_blacklist(self, changes_list):
+        '''
+        ([ProposedChange]) -> None
+
+        Adds the changes of changes_list to the blacklist.
+        '''
+        with self._transaction():
+            self._add_to_blacklist(changes_list)
+
+    def _add_to_blacklist(self, changes_list):
+        '''
+        ([ProposedChange]) -> None
+
+        Adds the changes of changes_list to the blacklist, in the transaction
+        of the caller.
+        '''
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO blacklist (id, change) VALUES (?, ?)",
+            ((change.getId(), pickle.dumps(change, pickle.HIGHEST_PROTOCOL))
+             for change in changes_list))
+
+    def clear_blacklist(self):
+        '''
+        () -> None
+
+        Removes every change from the blacklist.
+        '''
+        with self._transaction():
+            self.connection.execute("DELETE FROM blacklist")
+
+
+def is_change_id(text):
+    '''
+    (str) -> bool
+
+    Returns whether text is an id of a change, or the start of one, rather
+    than a number: MIN_ID_PREFIX hexadecimal digits or more.
+    '''
+    text = text.strip()
+    return len(text) >= MIN_ID_PREFIX and \
+        all(ch in string.hexdigits for ch in text)
+
+
+def _parse_position(text, first, last):
+    '''
+    (str, int, int) -> int
+
+    Returns the number written in text, where "s" is first and "e" is last.
+    Raises ValueError if it is not a number from 1 to last.
+    '''
+    text = text.strip().lower()
+    if text == "s":
+        position = first
+    elif text == "e":
+        position = last
+    elif text.isdigit():
+        position = int(text)
+    else:
+        raise ValueError("Invalid number or id: " + text)
+    if last is None or not 1 <= position <= last:
+        raise ValueError("Out of range: " + text)
+    return position
+
+
+def summary_text(summary):
+    '''
+    (tuple) -> str
+
+    Returns the line describing a change from its summary, as yielded by
+    ChangeStore.summaries, ex:
+    "    12  3fa2b1c4d5e6  nasa  Planet  Kepler-10 b (Kepler-10)  mass
+    16/06/02"
+    '''
+    (position, change_id, origin, object_type, system_name, object_name, field,
+     lastupdate) = summary
+    name = object_name
+    if system_name and system_name != object_name:
+        name += " (" + system_name + ")"
+    if lastupdate:
+        # yyyy-mm-dd is written yy/mm/dd
+        lastupdate = lastupdate[2:].replace("-", "/")
+    return "%6d  %s  %-4s  %-6s  %s  %s  %s\n" % (
+        position, change_id[:SHOWN_ID_LENGTH], origin, object_type, name, field or "added",
+        lastupdate or schema.MISSING_TEXT)
+
+
+def parse_date(text, last=False):
+    '''
+    (str, bool) -> datetime.date
+
+    Returns the date written as yy/mm/dd in text, as the catalogues write the
+    dates they were last updated on. A month written as yy/mm is its first
+    day, or its last day if last.
+    Raises ValueError if text is not such a date.
+    '''
+    text = text.strip()
+    if text.count("/") == 1:
+        month = datetime.datetime.strptime(text, "%y/%m").date()
+        if last:
+            days = calendar.monthrange(month.year, month.month)[1]
+            return month.replace(day=days)
+        return month
+    return datetime.datetime.strptime(text, schema.DATE_FORMAT).date()
+
+
+def parse_query(text):
+    '''
+    (str) -> ChangeFilter
+
+    Returns the filter of the query text, made of space separated terms
+    name=value, where name is one of QUERY_TERMS. Values may be quoted, as in
+    system="HD 1", and the dates are written as parse_date reads them, ex:
+    "origin=nasa field=mass type=planet system=Kepler* since=16/06"
+    Raises ValueError if a term is not understood.
+    '''
+    change_filter = ChangeFilter()
+    for term in shlex.split(text):
+        (name, sep, value) = term.partition("=")
+        attribute = QUERY_TERMS.get(name.strip().lower())
+        if not sep or attribute is None or not value:
+            raise ValueError("Invalid query term: " + term)
+        if attribute in ("since", "until"):
+            value = parse_date(value, last=(attribute == "until"))
+        setattr(change_filter, attribute, value)
+    return change_filter
+
+
+def _like_pattern(value):
+    '''
+    (str) -> str
+
+    Returns the LIKE pattern, escaped by "\\", matching value where "*"
+    matches any text.
+    '''
+    for special in ("\\", "%", "_"):
+        value = value.replace(special, "\\" + special)
+    return value.replace("*", "%")
+
+
+# the most parameters given to a query, below the limit of older versions of
+# SQLite
+_MAX_PARAMS = 900
+
+
+def _where(change_filter):
+    '''
+    (ChangeFilter) -> (str, [object])
+
+    Returns the WHERE clause and parameters selecting change_filter, which
+    select every change if it is None.
+    '''
+    if change_filter is None:
+        return ("", [])
+    return change_filter.where()
+
+
+def _row(change_id, position, change):
+    '''
+    (str, int, ProposedChange) -> tuple
+
+    Returns the row of the changes table storing change, whose id is
+    change_id, numbered position.
+    '''
+    if hasattr(change, "OEC_object"):
+        obj = change.OEC_object
+        field = str(change.field_modified)
+    else:
+        obj = change.object_ptr
+        field = None
+    # the changes pickled by early versions have no lastupdate
+    lastupdate = schema.toDate(str(getattr(change, "lastupdate", "")))
+    if not hasattr(lastupdate, "isoformat"):
+        lastupdate = None
+    else:
+        lastupdate = lastupdate.isoformat()
+    return (change_id, position, str(change.origin), obj.__class__.__name__,
+            _system_name(obj), change.get_object_name(), field, lastupdate,
+            pickle.dumps(change, pickle.HIGHEST_PROTOCOL))
+
+
+def _system_name(obj):
+    '''
+    (PlanetaryObject) -> str
+
+    Returns the name of the system obj is in, or None if it is not known.
+    '''
+    kind = obj.__class__.__name__
+    if kind == "System":
+        return obj.name
+    if kind == "Star":
+        return getattr(obj, "nameSystem", None) or None
+    if kind == "Planet" and getattr(obj, "starObject", None) is not None:
+        return getattr(obj.starObject, "nameSystem", None) or None
+    return None
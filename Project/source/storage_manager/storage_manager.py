@@ -1,11 +1,23 @@
+import contextlib
+import fcntl
+import os
 import pickle
+import sys
+import tempfile
 
 DEFAULT_REPO_URL \
     = "https://github.com/EricPapagiannis/open_exoplanet_catalogue.git"
 MANUAL_PATH = "storage/program_data/manual"
 PROPOSED_CHANGES_PATH = "storage/program_data/CHANGES_STORAGE"
 CONFIG_PATH = "storage/program_data/program_config"
+CATALOGUE_INDEX_PATH = "storage/program_data/CATALOGUE_INDEX"
+CHANGE_STORE_PATH = "storage/program_data/CHANGES.sqlite"
+AUTOUPDATE_SOCKET_PATH = "storage/program_data/autoupdate.sock"
+# the file locked while an update runs, by the daemon or by the user
+UPDATE_LOCK_PATH = "storage/program_data/update.lock"
 ENCODING = "ASCII"
+# the file locked while the config file is rewritten, next to it
+CONFIG_LOCK_SUFFIX = ".lock"
 
 
 def manual():
@@ -36,12 +48,43 @@ def read_file(path):
     return s
 
 
+def change_store():
+    '''
+    () -> ChangeStore
+
+    Returns the store of the proposed changes pending review, which retains
+    them between the invocations of the program. CHANGE_STORE_PATH determines
+    the path of its database. When the database is created, the changes
+    stored by earlier versions of the program (see read_changes_from_memory)
+    are moved into it, along with their blacklist.
+    '''
+    global _change_store
+    # imported here, the module is also run as a script from its directory
+    from storage_manager.change_store import ChangeStore
+    if _change_store is None or _change_store.path != CHANGE_STORE_PATH:
+        created = not os.path.exists(CHANGE_STORE_PATH)
+        _change_store = ChangeStore(CHANGE_STORE_PATH)
+        if created:
+            _change_store.replace(read_changes_from_memory())
+            # the blacklist was kept in the config file
+            black_list = config_get("black_list")
+            if black_list:
+                _change_store.add_to_blacklist(black_list)
+                config_set("black_list", [])
+    return _change_store
+
+
+# the store returned by change_store()
+_change_store = None
+
+
 def write_changes_to_memory(changes_list):
     '''
     ([ProposedChange]) -> None
     
     Takes a list of ProposedChanges and stores it on the hard drive in order to
-    retain it between the invocations of the program.
+    retain it between the invocations of the program, in the pickle format of
+    the earlier versions of the program.
     PROPOSED_CHANGES_PATH determines the path to write to.
     '''
     with open(PROPOSED_CHANGES_PATH, "wb") as File:
@@ -52,7 +95,8 @@ def read_changes_from_memory():
     '''
     () -> [ProposedChange]
     
-    Reads the list of proposed changes from the memory and returns it.
+    Reads the list of proposed changes from the memory and returns it, as
+    written by write_changes_to_memory.
     PROPOSED_CHANGES_PATH determines the path to read from.
     
     Throws EOFError if file is empty.
@@ -67,6 +111,35 @@ def read_changes_from_memory():
     return changes_list
 
 
+def write_index_to_memory(index):
+    '''
+    (CatalogueIndex) -> None
+
+    Stores the index of the catalogue on the hard drive, so that the changes
+    accepted in later invocations of the program can find their objects.
+    CATALOGUE_INDEX_PATH determines the path to write to.
+    '''
+    with open(CATALOGUE_INDEX_PATH, "wb") as File:
+        pickle.dump(index, File)
+
+
+def read_index_from_memory():
+    '''
+    () -> CatalogueIndex
+
+    Reads the index of the catalogue from the memory and returns it, or None
+    if no index was stored.
+    CATALOGUE_INDEX_PATH determines the path to read from.
+    '''
+    try:
+        with open(CATALOGUE_INDEX_PATH, "rb") as File:
+            index = pickle.load(File, encoding=ENCODING)
+    # if the index was never written, there is no index
+    except (EOFError, FileNotFoundError) as e:
+        index = None
+    return index
+
+
 def clean_config_file():
     '''
     () - > None
@@ -77,9 +150,21 @@ def clean_config_file():
     
     "last_update" -> str : time of last update (Default : "Never")
     "black_list" -> [] : the storage of ProposedChange objects declined by the
-    user
+    user, kept by earlier versions of the program (see change_store())
     "auto_update_settings" -> None for never | int for number of hours between
     updates
+    "clone_mode" -> str : how the catalogue is cloned, see
+    gitClone.CLONE_MODES (Default : "full")
+    '''
+    with _config_lock():
+        _write_config(_default_config())
+
+
+def _default_config():
+    '''
+    () -> dict
+
+    Returns the content of the config file in its original clean state.
     '''
     global DEFAULT_REPO_URL
     content = {}
@@ -89,8 +174,104 @@ def clean_config_file():
     content["auto_update_settings"] = None
     content["repo_url"] = DEFAULT_REPO_URL
     content["branch_number"] = 1
-    with open(CONFIG_PATH, "wb") as File:
-        pickle.dump(content, File)
+    content["clone_mode"] = "full"
+    return content
+
+
+@contextlib.contextmanager
+def _config_lock():
+    '''
+    () -> context manager
+
+    Holds the lock of the config file while in the context, so that the
+    processes of the program, such as the autoupdate daemon and the commands
+    of the user, rewrite the config file one at a time. The lock is not
+    reentrant.
+    '''
+    with open(CONFIG_PATH + CONFIG_LOCK_SUFFIX, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def update_lock():
+    '''
+    () -> context manager
+
+    Takes the lock of the updates while in the context, if no other process
+    holds it, so that an update of the user and one of the autoupdate daemon
+    never run at the same time. Gives whether the lock was taken.
+    '''
+    with open(UPDATE_LOCK_PATH, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_config():
+    '''
+    () -> dict
+
+    Returns the config dictionary, or None if the config file is empty or
+    does not exist.
+    '''
+    try:
+        with open(CONFIG_PATH, "rb") as File:
+            return pickle.load(File, encoding=ENCODING)
+    except (EOFError, FileNotFoundError) as e:
+        return None
+
+
+def _write_config(config_dict):
+    '''
+    (dict) -> None
+
+    Replaces the config file with config_dict at once: it is written to a
+    temporary file, which is then renamed over the config file, so that the
+    config file read by other processes is always whole.
+    '''
+    direc = os.path.dirname(CONFIG_PATH) or "."
+    with tempfile.NamedTemporaryFile(dir=direc, delete=False) as File:
+        try:
+            pickle.dump(config_dict, File)
+            File.flush()
+            os.fsync(File.fileno())
+        except BaseException:
+            os.remove(File.name)
+            raise
+    os.replace(File.name, CONFIG_PATH)
+
+
+def config_update(key, function):
+    '''
+    (key, function) -> object
+
+    Sets the key given as param in the config dictionary in memory to the
+    value function returns for its current value (None if there is none), and
+    returns that value. No other process changes the config file in between,
+    so that updates, such as incrementing a counter, are not lost.
+
+    If the config file is empty or unreadable for any reason, it is reset to
+    default state first.
+    '''
+    with _config_lock():
+        config_dict = _read_config()
+        # if the storage file is unreadable, reset the file to default state
+        if config_dict is None:
+            config_dict = _default_config()
+        val = function(config_dict.get(key))
+        config_dict[key] = val
+        _write_config(config_dict)
+    return val
 
 
 def config_set(key, val):
@@ -103,21 +284,7 @@ def config_set(key, val):
     If the config file is empty or unreadable for any reason, returns None and
     calls clean_config_file() to reset it to default state.
     '''
-    reset = False
-    try:
-        with open(CONFIG_PATH, "rb") as File:
-            config_dict = pickle.load(File, encoding=ENCODING)
-    # if the storage file is unreadable, reset the file to default state
-    except (EOFError, FileNotFoundError) as e:
-        reset = True
-        config_dict = None
-    if reset:
-        clean_config_file()
-        with open(CONFIG_PATH, "rb") as File:
-            config_dict = pickle.load(File, encoding=ENCODING)
-    config_dict[key] = val
-    with open(CONFIG_PATH, "wb") as File:
-        pickle.dump(config_dict, File)
+    config_update(key, lambda old: val)
 
 
 def config_get(key):
@@ -129,19 +296,14 @@ def config_get(key):
     If the config file is empty or unreadable for any reason, returns None and
     calls clean_config_file() to reset it to default state.
     '''
-    reset = False
-    try:
-        with open(CONFIG_PATH, "rb") as File:
-            config_dict = pickle.load(File, encoding=ENCODING)
-            result = config_dict.get(key)
+    # the config file is replaced at once, so it is read without the lock
+    config_dict = _read_config()
     # if the storage file is unreadable, return None, reset the file to default
     # state
-    except (EOFError, FileNotFoundError) as e:
-        result = None
-        reset = True
-    if reset:
+    if config_dict is None:
         clean_config_file()
-    return result
+        return None
+    return config_dict.get(key)
 
 
 def reset_to_default():
@@ -149,15 +311,20 @@ def reset_to_default():
     () -> None
     
     Returns all program configurations to default state, which includes: (1) - 
-    clearing the stored list of proposed changes, and (2) - resetting the 
-    config file to default configuration.
+    clearing the stored list of proposed changes and their blacklist, and (2)
+    - resetting the config file to default configuration.
     '''
     write_changes_to_memory([])
+    change_store().replace([])
+    change_store().clear_blacklist()
     clean_config_file()
 
 
 if __name__ == "__main__":
+    # the program's packages, rather than this directory, are importable
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     MANUAL_PATH = "../" + MANUAL_PATH
     PROPOSED_CHANGES_PATH = "../" + PROPOSED_CHANGES_PATH
     CONFIG_PATH = "../" + CONFIG_PATH
+    CHANGE_STORE_PATH = "../" + CHANGE_STORE_PATH
     reset_to_default()
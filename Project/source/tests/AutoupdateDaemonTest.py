@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from autoupdate_daemon import UpdateService, StatusServer, request_status
+
+
+class BlockingUpdate:
+    '''
+    An update which reports a step, then waits until it is released
+    '''
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.calls = 0
+
+    def __call__(self, report):
+        self.calls += 1
+        report("comparing")
+        self.started.set()
+        self.released.wait(5)
+
+
+class UpdateServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.update = BlockingUpdate()
+        self.service = UpdateService(self.update, 3600)
+        self.thread = threading.Thread(target=self.service.run_update)
+        self.addCleanup(self.thread.join)
+        self.addCleanup(self.update.released.set)
+
+    def testSingleFlight(self):
+        self.thread.start()
+        self.update.started.wait(5)
+        # no update starts while one is running
+        self.assertFalse(self.service.run_update())
+        self.update.released.set()
+        self.thread.join()
+        self.assertEqual(self.update.calls, 1)
+        self.assertTrue(self.service.run_update())
+        self.assertEqual(self.update.calls, 2)
+
+    def testStatus(self):
+        self.assertEqual(self.service.status()["state"], "idle")
+        self.thread.start()
+        self.update.started.wait(5)
+        status = self.service.status()
+        self.assertEqual(status["state"], "updating")
+        self.assertEqual(status["step"], "comparing")
+        self.update.released.set()
+        self.thread.join()
+        status = self.service.status()
+        self.assertEqual((status["state"], status["step"], status["runs"]),
+                         ("idle", None, 1))
+        self.assertIsNotNone(status["last_finished"])
+
+
+class UpdateServiceRunTest(unittest.TestCase):
+
+    def testFailedUpdateReported(self):
+        def fail(report):
+            raise OSError("no space left")
+        service = UpdateService(fail, 3600)
+        self.assertTrue(service.run_update())
+        self.assertIn("no space left", service.status()["last_error"])
+        self.assertEqual(service.status()["state"], "idle")
+        # the guard is released after a failure
+        self.assertTrue(service.run_update())
+
+    def testSkippedUpdateReported(self):
+        # an update of another process was running
+        service = UpdateService(lambda report: False, 3600)
+        self.assertTrue(service.run_update())
+        self.assertIn("another update", service.status()["last_error"])
+
+    def testRunStops(self):
+        service = UpdateService(lambda report: service.stop(), 3600)
+        service.run()
+        self.assertEqual(service.status()["runs"], 1)
+        self.assertIsNotNone(service.status()["next_update"])
+
+
+class StatusServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.direc)
+        self.path = os.path.join(self.direc, "autoupdate.sock")
+
+    def testRequestStatus(self):
+        update = BlockingUpdate()
+        service = UpdateService(update, 7200)
+        server = StatusServer(self.path, service)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        updating = threading.Thread(target=service.run_update)
+        updating.start()
+        try:
+            update.started.wait(5)
+            status = request_status(self.path)
+            self.assertEqual(status["state"], "updating")
+            self.assertEqual(status["step"], "comparing")
+            self.assertEqual(status["interval_hours"], 2)
+            self.assertEqual(status["pid"], os.getpid())
+        finally:
+            update.released.set()
+            updating.join()
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        # the socket is removed when the server stops
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(request_status(self.path))
+
+    def testNoDaemon(self):
+        self.assertIsNone(request_status(self.path))
+        # a socket left by a daemon which did not stop cleanly
+        with open(self.path, "w"):
+            pass
+        self.assertIsNone(request_status(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from data_comparison.CatalogueComparator import *
+from data_comparison.proposed_change import *
+from data_parsing.Planet import *
+from data_parsing.Star import *
+from data_parsing.System import *
+import unittest
+
+
+class TestCatalogueComparator(unittest.TestCase):
+    def setUp(self):
+        # a system of the Open Exoplanet Catalogue with two stars
+        self.OEC_system = System("sys")
+        self.OEC_system.addVal("distance", 10)
+        self.OEC_starA = Star("sys A")
+        self.OEC_starA.addVal("mass", 1)
+        self.OEC_starB = Star("sys B")
+        self.OEC_starB.addVal("mass", 2)
+        self.OEC_planet = Planet("sys B b")
+        self.OEC_planet.addVal("period", 3)
+        self.OEC_starB.planetObjects = [self.OEC_planet]
+        self.OEC_starB.nameToPlanet = {"sys B b": self.OEC_planet}
+        self.OEC_system.starObjects = [self.OEC_starA, self.OEC_starB]
+        for star in self.OEC_system.starObjects:
+            star.systemObject = self.OEC_system
+            star.nameSystem = "sys"
+        self.OEC_planet.starObject = self.OEC_starB
+        self.OEC_nameToStar = {"sys A": self.OEC_starA,
+                               "sys B": self.OEC_starB,
+                               "HD 1 B": self.OEC_starB}
+
+        # the matching stars of an origin catalogue
+        self.starA = Star("sys A")
+        self.starA.addVal("mass", 1)
+        self.starA.addVal("distance", 12)
+        self.starA.addError("distanceerrorplus", "0.5")
+        self.starB = Star("HD 1 B")
+        self.starB.addVal("mass", 2.5)
+        self.starB.addVal("distance", 12)
+        planet = Planet("sys B b")
+        planet.addVal("period", 4)
+        self.starB.planetObjects = [planet]
+        self.other = Star("elsewhere")
+        self.other.addVal("mass", 5)
+        self.origin_stars = {"sys A": self.starA, "HD 1 B": self.starB,
+                             "elsewhere": self.other}
+
+    def testMatchStars(self):
+        comparator = CatalogueComparator([self.OEC_system],
+                                         self.OEC_nameToStar,
+                                         self.origin_stars, "eu")
+        matches = comparator.matchStars()
+        self.assertEqual(matches, {self.OEC_starA: [self.starA],
+                                   self.OEC_starB: [self.starB]})
+
+    def testProposedChangesAtEveryLevel(self):
+        comparator = CatalogueComparator([self.OEC_system],
+                                         self.OEC_nameToStar,
+                                         self.origin_stars, "eu")
+        changes = comparator.proposedChanges()
+        found = sorted((c.getOECType(), c.get_object_name(), c.field_modified)
+                       for c in changes)
+        self.assertEqual(found, [("Planet", "sys B b", "period"),
+                                 ("Star", "sys B", "mass"),
+                                 ("System", "sys", "distance")])
+
+    def testSystemModification(self):
+        comparator = CatalogueComparator([self.OEC_system],
+                                         self.OEC_nameToStar,
+                                         self.origin_stars, "eu")
+        changes = comparator.proposedChangeSystemCompare(self.OEC_system,
+                                                         self.starA)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0].getSystemName(), "sys")
+        self.assertEqual(changes[0].value_in_origin_catalogue, 12.0)
+        self.assertEqual(changes[0].value_in_OEC, 10.0)
+        self.assertEqual(changes[0].origin_upper, "0.5")
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
@@ -0,0 +1,375 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import storage_manager.storage_manager as STORAGE
+import storage_manager.change_store as STORE
+from storage_manager.change_store import ChangeStore, ChangeFilter, \
+    is_change_id, parse_date, parse_query, summary_text
+from data_comparison.proposed_change import Addition, Modification
+import data_parsing.Planet as Planet
+import data_parsing.Star as Star
+import data_parsing.System as System
+
+
+def makeChanges():
+    '''() -> [ProposedChange]
+    Returns changes of every type of object, from both catalogues
+    '''
+    system = System.System("Kepler-1")
+    system.lastupdate = "16/05/01"
+    star = Star.Star("Kepler-1")
+    star.nameSystem = "Kepler-1"
+    star.lastupdate = "16/06/01"
+    planet = Planet.Planet("Kepler-1 b")
+    planet.starObject = star
+    planet.lastupdate = "16/07/01"
+    other = Planet.Planet("HD 1 b")
+    otherStar = Star.Star("HD 1")
+    otherStar.nameSystem = "HD 1"
+    other.starObject = otherStar
+    other.lastupdate = "15/01/01"
+    return [Modification("nasa", planet, planet, "mass", 2.5, 2.0),
+            Modification("eu", planet, planet, "radius", 1.5, 1.0),
+            Modification("nasa", star, star, "mass", 1.1, 1.0),
+            Modification("nasa", system, system, "distance", 11.0, 10.0),
+            Modification("eu", other, other, "mass", 3.0, 4.0),
+            Addition("eu", other)]
+
+
+class ChangeStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.direc)
+        self.store = ChangeStore(os.path.join(self.direc, "changes.sqlite"))
+        self.addCleanup(self.store.close)
+        self.changes = makeChanges()
+        self.store.replace(self.changes)
+
+    def names(self, change_filter=None, offset=0, limit=None):
+        return [(position, change.get_object_name(),
+                 getattr(change, "field_modified", None))
+                for (position, change) in self.store.changes(
+                    change_filter, offset, limit)]
+
+    def testReplaceKeepsOrder(self):
+        self.assertEqual(self.store.count(), 6)
+        self.assertEqual(self.store.all(), self.changes)
+        self.assertEqual(self.store.get(3), self.changes[2])
+        self.assertIsNone(self.store.get(7))
+        self.store.replace(self.changes[:2])
+        self.assertEqual(self.store.all(), self.changes[:2])
+
+    def testReplaceKeepsStoredChanges(self):
+        ids = self.store.ids()
+        self.assertEqual(ids, [change.getId() for change in self.changes])
+        changes = [self.changes[5], self.changes[1], self.changes[5]]
+        with mock.patch.object(STORE, "_row", side_effect=STORE._row) as row:
+            self.store.replace(changes + [self.changes[0]])
+            # only the new changes are written
+            self.assertEqual(row.call_count, 0)
+        self.assertEqual(self.store.ids(), [ids[5], ids[1], ids[0]])
+        self.assertEqual([p for (p, n, f) in self.names()], [1, 2, 4])
+
+    def testPages(self):
+        self.assertEqual(self.names(offset=1, limit=2),
+                         [(2, "Kepler-1 b", "radius"), (3, "Kepler-1", "mass")])
+        self.assertEqual([p for (p, n, f) in self.names(offset=4)], [5, 6])
+
+    def testFilters(self):
+        change_filter = ChangeFilter(origin="NASA", field="mass")
+        self.assertEqual(self.names(change_filter),
+                         [(1, "Kepler-1 b", "mass"), (3, "Kepler-1", "mass")])
+        self.assertEqual(self.store.count(change_filter), 2)
+        change_filter = ChangeFilter(object_type="planet", system="kepler-1")
+        self.assertEqual([p for (p, n, f) in self.names(change_filter)],
+                         [1, 2])
+        change_filter = ChangeFilter(system="HD 1")
+        self.assertEqual([p for (p, n, f) in self.names(change_filter)],
+                         [5, 6])
+
+    def testDateRange(self):
+        change_filter = ChangeFilter(since=datetime.date(2016, 6, 1),
+                                     until=datetime.date(2016, 7, 1))
+        self.assertEqual([p for (p, n, f) in self.names(change_filter)],
+                         [1, 2, 3])
+        change_filter = ChangeFilter(until=datetime.date(2016, 1, 1))
+        self.assertEqual([p for (p, n, f) in self.names(change_filter)],
+                         [5, 6])
+
+    def testWildcards(self):
+        change_filter = ChangeFilter(system="kepler*", field="*a*")
+        self.assertEqual([p for (p, n, f) in self.names(change_filter)],
+                         [1, 2, 3, 4])
+        # the other characters LIKE gives a meaning to are matched as they are
+        self.assertEqual(self.store.count(ChangeFilter(system="Kepler_*")), 0)
+        self.assertEqual(self.store.count(ChangeFilter(system="%*")), 0)
+
+    def testQuery(self):
+        change_filter = parse_query(
+            "origin=NASA field=mass type=planet system=Kepler* since=16/06")
+        self.assertEqual(self.names(change_filter),
+                         [(1, "Kepler-1 b", "mass")])
+        change_filter = parse_query('system="HD 1" until=16/06')
+        self.assertEqual(change_filter.system, "HD 1")
+        self.assertEqual(change_filter.until, datetime.date(2016, 6, 30))
+        self.assertEqual([p for (p, n, f) in self.names(change_filter)],
+                         [5, 6])
+        for text in ["mass", "colour=red", "since=16-06-01", "field="]:
+            with self.assertRaises(ValueError):
+                parse_query(text)
+
+    def testParseDate(self):
+        self.assertEqual(parse_date("16/06/02"), datetime.date(2016, 6, 2))
+        self.assertEqual(parse_date("16/02"), datetime.date(2016, 2, 1))
+        self.assertEqual(parse_date("16/02", last=True),
+                         datetime.date(2016, 2, 29))
+
+    def testSummaries(self):
+        summaries = list(self.store.summaries(ChangeFilter(origin="eu")))
+        ids = [change.getId() for change in self.changes]
+        self.assertEqual(
+            summaries[0],
+            (2, ids[1], "eu", "Planet", "Kepler-1", "Kepler-1 b", "radius",
+             "2016-07-01"))
+        self.assertEqual(summary_text(summaries[0]),
+                         "     2  " + ids[1][:12] + "  eu    Planet  "
+                         "Kepler-1 b (Kepler-1)  radius  16/07/01\n")
+        self.assertEqual(summary_text(summaries[2]),
+                         "     6  " + ids[5][:12] + "  eu    Planet  "
+                         "HD 1 b (HD 1)  added  15/01/01\n")
+
+    def testFiltersUseIndexes(self):
+        for change_filter in [ChangeFilter(origin="nasa"),
+                              ChangeFilter(object_type="Star"),
+                              ChangeFilter(system="Kepler*"),
+                              ChangeFilter(field="mass"),
+                              ChangeFilter(since=datetime.date(2016, 1, 1))]:
+            (where, params) = change_filter.where()
+            plan = self.store.connection.execute(
+                "EXPLAIN QUERY PLAN SELECT position FROM changes" + where,
+                params).fetchall()
+            self.assertIn("USING COVERING INDEX", plan[0][-1])
+
+    def testNumbered(self):
+        ids = [change.getId() for change in self.changes]
+        numbered = self.store.numbered([ids[3], "0" * 40, ids[0]])
+        self.assertEqual(numbered, [(4, self.changes[3]),
+                                    (1, self.changes[0])])
+
+    def testRemoveKeepsNumbers(self):
+        ids = self.store.ids()
+        self.assertEqual(self.store.remove([ids[1], ids[4], ids[4]]), 2)
+        self.assertEqual(self.store.all(),
+                         [self.changes[i] for i in (0, 2, 3, 5)])
+        self.assertEqual([p for (p, n, f) in self.names()], [1, 3, 4, 6])
+        self.assertEqual(self.store.get(6), self.changes[5])
+        self.assertEqual(self.store.blacklist(), [])
+
+    def testRemoveBlacklists(self):
+        removed = self.store.remove(change_filter=ChangeFilter(origin="eu"),
+                                    blacklist=True)
+        self.assertEqual(removed, 3)
+        self.assertEqual(self.store.all(), [self.changes[i] for i in
+                                            (0, 2, 3)])
+        self.assertEqual(self.store.blacklist(),
+                         [self.changes[i] for i in (1, 4, 5)])
+        self.assertEqual(self.store.blacklisted_ids(),
+                         set(self.changes[i].getId() for i in (1, 4, 5)))
+        self.store.clear_blacklist()
+        self.assertEqual(self.store.blacklist(), [])
+
+    def testRemoveIsOneTransaction(self):
+        # a failure while removing the changes leaves them as they were
+        with mock.patch.object(ChangeStore, "_select",
+                               side_effect=sqlite3.OperationalError):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.store.remove(self.store.ids(), blacklist=True)
+        self.assertEqual(self.store.all(), self.changes)
+        self.assertEqual(self.store.blacklist(), [])
+
+    def testRemoveAll(self):
+        self.assertEqual(self.store.remove(blacklist=True), 6)
+        self.assertEqual(self.store.count(), 0)
+        self.assertEqual(len(self.store.blacklist()), 6)
+
+    def testWriteAheadLog(self):
+        self.assertEqual(self.store.connection.execute(
+            "PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def testReplaceLeavesOutConcurrentDenies(self):
+        # the daemon lists the changes while the user denies one
+        daemon = ChangeStore(self.store.path)
+        self.addCleanup(daemon.close)
+        self.store.remove([self.changes[1].getId()], blacklist=True)
+        daemon.replace(self.changes)
+        self.assertEqual(self.store.all(),
+                         [self.changes[i] for i in (0, 2, 3, 4, 5)])
+
+    def testReadingDoesNotBlockWriting(self):
+        other = ChangeStore(self.store.path)
+        self.addCleanup(other.close)
+        changes = self.store.changes()
+        self.assertEqual(next(changes), (1, self.changes[0]))
+        # the reader keeps reading the changes as they were
+        self.assertEqual(other.remove(other.ids()), 6)
+        self.assertEqual(len(list(changes)), 5)
+        self.assertEqual(self.store.count(), 0)
+
+    def testWritersTakeTurns(self):
+        ids = self.store.ids()
+        started = threading.Event()
+
+        def write():
+            other = ChangeStore(self.store.path)
+            try:
+                with other._transaction():
+                    started.set()
+                    other.connection.execute(
+                        "DELETE FROM changes WHERE id = ?", (ids[0],))
+                    time.sleep(0.2)
+            finally:
+                started.set()
+                other.close()
+        thread = threading.Thread(target=write)
+        thread.start()
+        started.wait()
+        # waits for the other writer rather than failing
+        self.assertEqual(self.store.remove(ids[:2], blacklist=True), 1)
+        thread.join()
+        self.assertEqual(self.store.ids(), ids[2:])
+        self.assertEqual(self.store.blacklist(), [self.changes[1]])
+
+    def testSelect(self):
+        ids = self.store.ids()
+        self.assertEqual(self.store.select("3"), [ids[2]])
+        self.assertEqual(self.store.select("1,4,2-3,4"),
+                         [ids[0], ids[3], ids[1], ids[2]])
+        self.assertEqual(self.store.select("e-4"), [ids[5], ids[4], ids[3]])
+        self.assertEqual(self.store.select("s-e"), ids)
+        self.assertEqual(self.store.select(ids[4][:8] + ", 1," + ids[4]),
+                         [ids[4], ids[0]])
+        self.assertEqual(self.store.select(ids[4].upper()), [ids[4]])
+        for text in ["0", "7", "1-7", "1-2-3", "a", "1,,2", "0" * 40]:
+            with self.assertRaises(ValueError):
+                self.store.select(text)
+
+    def testSelectAfterRemove(self):
+        ids = self.store.ids()
+        self.store.remove([ids[0], ids[2]])
+        self.assertEqual(self.store.select("s-e"),
+                         [ids[1], ids[3], ids[4], ids[5]])
+        self.assertEqual(self.store.select("2-4"), [ids[1], ids[3]])
+        with self.assertRaises(ValueError):
+            self.store.select("3")
+
+    def testSelectAmbiguousId(self):
+        # the changes stored under ids starting the same
+        ids = ["abcdef12" + change.getId()[8:] for change in self.changes]
+        self.store.replace([])
+        with self.store.connection:
+            self.store.connection.executemany(
+                "INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [STORE._row(ids[i], i + 1, self.changes[i])
+                 for i in range(len(ids))])
+        with self.assertRaises(ValueError):
+            self.store.select("abcdef12")
+        self.assertEqual(self.store.select(ids[2]), [ids[2]])
+
+    def testIsChangeId(self):
+        self.assertTrue(is_change_id("3fa2b1c4"))
+        self.assertTrue(is_change_id(" 3FA2B1C4D5E6 "))
+        for text in ["3fa2b1c", "12345678g", "1-5", "s-e", "1234"]:
+            self.assertFalse(is_change_id(text))
+
+    def testOnlyShownChangesAreUnpickled(self):
+        with mock.patch.object(STORE.pickle, "loads",
+                               side_effect=STORE.pickle.loads) as loads:
+            changes = self.store.changes(ChangeFilter(origin="eu"), 0, 1)
+            self.assertEqual(next(changes)[0], 2)
+            self.assertEqual(loads.call_count, 1)
+
+
+class ChangeStoreMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.direc)
+        for (name, path) in [("PROPOSED_CHANGES_PATH", "CHANGES_STORAGE"),
+                             ("CHANGE_STORE_PATH", "CHANGES.sqlite"),
+                             ("CONFIG_PATH", "program_config")]:
+            patcher = mock.patch.object(STORAGE, name,
+                                        os.path.join(self.direc, path))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(STORAGE, "_change_store", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testLegacyChangesMovedOnce(self):
+        changes = makeChanges()
+        STORAGE.write_changes_to_memory(changes)
+        store = STORAGE.change_store()
+        self.addCleanup(store.close)
+        self.assertIs(STORAGE.change_store(), store)
+        self.assertEqual(store.all(), changes)
+        store.replace([])
+        store.close()
+        # the changes are only moved when the store is created
+        with mock.patch.object(STORAGE, "_change_store", None):
+            store = STORAGE.change_store()
+            self.addCleanup(store.close)
+            self.assertEqual(store.count(), 0)
+
+    def testLegacyBlacklistMoved(self):
+        changes = makeChanges()
+        STORAGE.config_set("black_list", changes[:2])
+        store = STORAGE.change_store()
+        self.addCleanup(store.close)
+        self.assertEqual(store.blacklist(), changes[:2])
+        self.assertEqual(STORAGE.config_get("black_list"), [])
+
+    def testStoreKeyedByPositionUpgraded(self):
+        # the store of the earlier version, which kept the changes by their
+        # position
+        changes = makeChanges()
+        path = os.path.join(self.direc, "old.sqlite")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE changes (position INTEGER PRIMARY "
+                           "KEY, origin TEXT, object_type TEXT, system_name "
+                           "TEXT, object_name TEXT, field TEXT, lastupdate "
+                           "TEXT, change BLOB NOT NULL)")
+        connection.execute("CREATE TABLE blacklist (change BLOB NOT NULL)")
+        connection.executemany(
+            "INSERT INTO changes (position, change) VALUES (?, ?)",
+            [(position, STORE.pickle.dumps(change)) for (position, change)
+             in enumerate(changes[2:], 1)])
+        connection.execute("INSERT INTO blacklist VALUES (?)",
+                           (STORE.pickle.dumps(changes[0]),))
+        connection.commit()
+        connection.close()
+        store = ChangeStore(path)
+        self.addCleanup(store.close)
+        self.assertEqual(store.all(), changes[2:])
+        self.assertEqual(store.ids(), [c.getId() for c in changes[2:]])
+        self.assertEqual(store.count(ChangeFilter(origin="eu")), 2)
+        self.assertEqual(store.blacklist(), changes[:1])
+        store.close()
+        store = ChangeStore(path)
+        self.addCleanup(store.close)
+        self.assertEqual(store.all(), changes[2:])
+
+    def testNoLegacyChanges(self):
+        store = STORAGE.change_store()
+        self.addCleanup(store.close)
+        self.assertEqual(store.all(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import unittest
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+from unittest import mock
+import github.cleanup as CLEANUP
+
+# systems taken from the Open Exoplanet Catalogue
+SYSTEM_11_COM = """<system>
+\t<name>11 Com</name>
+\t<rightascension>12 20 43</rightascension>
+\t<declination>+17 47 34</declination>
+\t<distance errorminus="1.7" errorplus="1.7">88.9</distance>
+\t<star>
+\t\t<name>11 Com</name>
+\t\t<name>HD 107383</name>
+\t\t<mass errorminus="0.3" errorplus="0.3">2.7</mass>
+\t\t<radius errorminus="2" errorplus="2">19</radius>
+\t\t<temperature errorminus="100" errorplus="100">4742</temperature>
+\t\t<spectraltype>G8 III</spectraltype>
+\t\t<planet>
+\t\t\t<name>11 Com b</name>
+\t\t\t<list>Confirmed planets</list>
+\t\t\t<mass errorminus="1.5" errorplus="1.5" type="msini">19.4</mass>
+\t\t\t<period errorminus="0.32" errorplus="0.32">326.03</period>
+\t\t\t<discoverymethod>RV</discoverymethod>
+\t\t\t<lastupdate>15/09/20</lastupdate>
+\t\t\t<discoveryyear>2008</discoveryyear>
+\t\t</planet>
+\t</star>
+\t<videolink>http://youtu.be/qyJXJJDrEDo</videolink>
+</system>"""
+
+SYSTEM_KEPLER_16 = """<system>
+\t<name>Kepler-16</name>
+\t<distance>60</distance>
+\t<binary>
+\t\t<name>Kepler-16</name>
+\t\t<period>41</period>
+\t\t<star>
+\t\t\t<name>Kepler-16 A</name>
+\t\t\t<mass>0.6897</mass>
+\t\t</star>
+\t\t<star>
+\t\t\t<name>Kepler-16 B</name>
+\t\t\t<mass>0.20255</mass>
+\t\t</star>
+\t\t<planet>
+\t\t\t<name>Kepler-16 (AB) b</name>
+\t\t\t<list>Confirmed planets</list>
+\t\t\t<mass error="0.1">0.333</mass>
+\t\t\t<period>228.776</period>
+\t\t\t<discoverymethod>transit</discoverymethod>
+\t\t\t<lastupdate>12/11/27</lastupdate>
+\t\t\t<discoveryyear>2011</discoveryyear>
+\t\t</planet>
+\t</binary>
+</system>"""
+
+
+class CleanupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.direc)
+        self.com = self.writeSystem("11 Com", SYSTEM_11_COM)
+        self.kepler = self.writeSystem("Kepler-16", SYSTEM_KEPLER_16)
+
+    def writeSystem(self, name, content):
+        path = os.path.join(self.direc, name + ".xml")
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def clean(self, filenames, processes=None):
+        # the messages of the run are printed, keep the test output quiet
+        with mock.patch("builtins.print"):
+            return CLEANUP.checkFiles(filenames, processes)
+
+    def testCleanFilesOnlyTouchesGivenFiles(self):
+        report = self.clean([self.kepler])
+        self.assertEqual(self.read(self.com), SYSTEM_11_COM)
+        self.assertNotEqual(self.read(self.kepler), SYSTEM_KEPLER_16)
+        self.assertEqual(report.fileschecked, 1)
+
+    def testCleanFilesFixesSystem(self):
+        self.assertEqual(self.clean([self.kepler]).errorCode(), 1)
+        planet = ET.parse(self.kepler).getroot().find(".//planet")
+        lists = [l.text for l in planet.findall("./list")]
+        self.assertIn("Planets in binary systems, P-type", lists)
+        self.assertEqual(planet.findtext("./istransiting"), "1")
+        self.assertEqual(planet.find("./mass").attrib,
+                         {"errorminus": "0.1", "errorplus": "0.1"})
+
+    def testCleanFilesIsStable(self):
+        self.clean([self.com, self.kepler])
+        cleaned = self.read(self.kepler)
+        report = self.clean([self.com, self.kepler])
+        self.assertEqual(report.errorCode(), 0)
+        self.assertEqual(report.fileschecked, 2)
+        self.assertEqual(report.fileschanged, 0)
+        self.assertEqual(self.read(self.kepler), cleaned)
+
+    def testCleanFilesReportsIssues(self):
+        typo = self.writeSystem("Typo", SYSTEM_11_COM.replace(
+            "11 Com", "Typo").replace("spectraltype", "spectraltipe"))
+        report = self.clean([typo])
+        self.assertEqual(report.errorCode(), 3)
+        self.assertEqual(report.issues, 1)
+
+    def testCleanFilesReportsXMLErrors(self):
+        broken = self.writeSystem("Broken", SYSTEM_11_COM[:-3])
+        report = self.clean([broken, self.com])
+        self.assertEqual(report.errorCode(), 3)
+        self.assertEqual(report.xmlerrors, 1)
+        self.assertEqual(report.fileschecked, 2)
+
+    def testCleanFileSkipsUnchangedFiles(self):
+        self.clean([self.com])
+        os.utime(self.com, (0, 0))
+        report = self.clean([self.com])
+        self.assertEqual(report.fileschanged, 0)
+        self.assertEqual(os.stat(self.com).st_mtime, 0)
+
+    def testCleanFileIgnoresNewlines(self):
+        self.clean([self.com])
+        cleaned = self.read(self.com)
+        with open(self.com, "wb") as f:
+            f.write(cleaned.replace("\n", "\r\n").encode("UTF-8"))
+        report = self.clean([self.com])
+        self.assertEqual(report.fileschanged, 0)
+        with open(self.com, "rb") as f:
+            self.assertEqual(f.read(), cleaned.encode("UTF-8"))
+
+    def testCleanBuffer(self):
+        cleaned, report = CLEANUP.cleanBuffer(
+            SYSTEM_KEPLER_16.encode("UTF-8"), "Kepler-16.xml")
+        self.assertEqual(report.filename, "Kepler-16.xml")
+        self.assertEqual(report.fileschanged, 3)
+        self.assertIn(b"<istransiting>1</istransiting>", cleaned)
+        # the buffer is cleaned in memory only
+        self.assertEqual(self.read(self.kepler), SYSTEM_KEPLER_16)
+        cleaned, report = CLEANUP.cleanBuffer(b"<system>", "Broken.xml")
+        self.assertIsNone(cleaned)
+        self.assertEqual(report.xmlerrors, 1)
+
+    def testMessagesFollowRuleOrder(self):
+        # the planet with the invalid list comes before the star without a
+        # name, but the names are checked first
+        system = SYSTEM_11_COM.replace(
+            "Confirmed planets</list>",
+            "Confirmed planets</list>\n\t\t\t<list>Unknown</list>").replace(
+            "</star>", "</star>\n\t<star><mass>1.0</mass></star>")
+        path = self.writeSystem("11 Com", system)
+        report = self.clean([path])
+        self.assertEqual(report.issues, 2)
+        self.assertEqual(len(report.messages), 2)
+        self.assertIn("Didn't find name tag", report.messages[0])
+        self.assertIn("Invalid list \"Unknown\"", report.messages[1])
+
+    def testWalkVisitsEachElementOnce(self):
+        visited = []
+        rule = CLEANUP.onenter()(
+            lambda walk, elem, depth: visited.append(elem))
+        self.addCleanup(CLEANUP._enterRulesByTag.clear)
+        self.addCleanup(CLEANUP.ENTER_RULES.remove, (None, rule))
+        cleaned, report = CLEANUP.cleanBuffer(
+            SYSTEM_KEPLER_16.encode("UTF-8"), "Kepler-16.xml")
+        root = ET.fromstring(cleaned)
+        # the list and istransiting tags added by the rules are visited too
+        self.assertEqual(len(visited), len(list(root.iter())))
+        self.assertEqual(len(set(map(id, visited))), len(visited))
+
+    def testCheckFilesInParallelMatchesSequential(self):
+        copies = []
+        for i in range(3):
+            copies.append(self.writeSystem("Kepler-16 " + str(i),
+                                           SYSTEM_KEPLER_16))
+        sequential = self.clean(copies, processes=1)
+        for path in copies:
+            self.writeSystem(os.path.basename(path)[:-4], SYSTEM_KEPLER_16)
+        parallel = self.clean(copies, processes=2)
+        self.assertEqual(parallel.messages, sequential.messages)
+        self.assertEqual(parallel.summary(), sequential.summary())
+        # messages are merged in the order of the files
+        self.assertIn(copies[0], parallel.messages[0])
+        self.assertIn(copies[2], parallel.messages[-1])
+
+    def testCleanFilesPrintsSummary(self):
+        with mock.patch("builtins.print") as printed:
+            self.assertEqual(CLEANUP.cleanFiles([self.com], 1), 1)
+        lines = [args[0] for args, kwargs in printed.call_args_list]
+        self.assertEqual(lines, ["Cleanup script finished. 1 files checked.",
+                                 "1 file(s) modified.",
+                                 "No issues found."])
+
+
+if __name__ == '__main__':
+    unittest.main()
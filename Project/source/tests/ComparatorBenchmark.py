@@ -0,0 +1,70 @@
+import sys
+
+sys.path.append("../")
+from data_comparison.Comparator import *
+from data_parsing.Planet import *
+from data_parsing.Star import *
+import timeit
+
+# size of the generated stars
+NUM_PLANETS = 60
+NUM_ALIASES = 12
+# number of times each comparison is repeated
+REPEAT = 50
+
+
+def buildStars(numPlanets, numAliases):
+    '''(int, int) -> (Star, Star)
+    Builds a pair of stars with numPlanets planets each. The second star
+    behaves like one parsed from the Open Exoplanet Catalogue: each of its
+    planets is known under numAliases names plus their normalized versions.
+    The planets of the first star are named after one of the aliases, so that
+    half of them can only be matched through their normalized names.
+    '''
+    origin = Star("bench")
+    oec = Star("bench")
+    for i in range(numPlanets):
+        oecPlanet = Planet("bench " + str(i))
+        oecPlanet.addVal("mass", i)
+        oecPlanet.addVal("radius", i * 2)
+        oec.planetObjects.append(oecPlanet)
+        for j in range(numAliases):
+            alias = "alias-" + str(j) + " planet " + str(i)
+            oec.nameToPlanet[alias] = oecPlanet
+            oec.nameToPlanet[cleanName(alias)] = oecPlanet
+        if i % 2:
+            name = "alias-" + str(i % numAliases) + " planet " + str(i)
+        else:
+            name = "ALIAS" + str(i % numAliases) + "Planet" + str(i)
+        originPlanet = Planet(name)
+        originPlanet.addVal("mass", i + 1)
+        originPlanet.addVal("radius", i * 2)
+        origin.planetObjects.append(originPlanet)
+    return (origin, oec)
+
+
+def fullCompare(origin, oec):
+    '''(Star, Star) -> Dictionary
+    Runs starCompare on a fresh Comparator and computes every entry of it
+    '''
+    return dict(Comparator(origin, oec, "eu").starCompare().items())
+
+
+def main():
+    (origin, oec) = buildStars(NUM_PLANETS, NUM_ALIASES)
+    result = fullCompare(origin, oec)
+    # every planet must be matched exactly once
+    assert len(result["planetDC"]) == NUM_PLANETS
+    assert result["planetA"] == {}
+    seconds = timeit.timeit(lambda: fullCompare(origin, oec), number=REPEAT)
+    print("starCompare, %d planets with %d aliases each: %.3f ms per star"
+          % (NUM_PLANETS, NUM_ALIASES, seconds / REPEAT * 1000))
+    seconds = timeit.timeit(
+        lambda: Comparator(origin, oec, "eu").proposedChangeStarCompare(),
+        number=REPEAT)
+    print("proposedChangeStarCompare, same stars: %.3f ms per star"
+          % (seconds / REPEAT * 1000))
+
+
+if __name__ == "__main__":
+    main()
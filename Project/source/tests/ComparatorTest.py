@@ -10,7 +10,9 @@ from data_parsing.Planet import *
 from data_parsing.PlanetaryObject import *
 from data_parsing.Star import *
 from data_parsing.System import *
+from data_parsing.schema import MISSING
 import unittest
+from unittest import mock
 
 
 class TestComparator(unittest.TestCase):
@@ -61,7 +63,7 @@ class TestComparator(unittest.TestCase):
         self.assertTrue(
             len(c) == len(d) and all(c.count(i) == d.count(i) for i in c))
         e = result["right"]
-        f = [10, "N/A"]
+        f = [10, MISSING]
         self.assertTrue(
             len(e) == len(f) and all(e.count(i) == f.count(i) for i in e))
 
@@ -167,6 +169,127 @@ class TestComparator(unittest.TestCase):
             len(resultNames) == len(answer) and all(
                 resultNames.count(i) == answer.count(i) for i in resultNames))
 
+    def testStarCompareMatchesPlanetOnce(self):
+        # an exact name match must not also be compared under its clean alias
+        oecPlanet = Planet("Kepler-10 b")
+        oecPlanet.addVal("mass", 3)
+        oecStar = Star("Kepler-10")
+        oecStar.planetObjects = [oecPlanet]
+        oecStar.nameToPlanet = {"Kepler-10 b": oecPlanet,
+                                "kepler10b": oecPlanet,
+                                "KOI-72 b": oecPlanet,
+                                "koi72b": oecPlanet}
+        originPlanet = Planet("Kepler-10 b")
+        originPlanet.addVal("mass", 4)
+        originStar = Star("Kepler-10")
+        originStar.planetObjects = [originPlanet]
+        comparator = Comparator(originStar, oecStar, "eu")
+        with mock.patch.object(Comparator, "innerJoinDiff",
+                               autospec=True,
+                               side_effect=Comparator.innerJoinDiff) as diff:
+            result = comparator.starCompare()
+            result.items()
+        # once for the star, once for its only planet
+        self.assertEqual(diff.call_count, 2)
+        self.assertEqual(result["planetDC"],
+                         {"Kepler-10 b": {"mass": (4.0, 3.0)}})
+        self.assertEqual(result["planetA"], {})
+
+    def testStarCompareMatchesPlanetByCleanName(self):
+        oecPlanet = Planet("KOI-72 b")
+        oecPlanet.addVal("mass", 3)
+        oecStar = Star("Kepler-10")
+        oecStar.planetObjects = [oecPlanet]
+        # the normalized alias is not stored in the name dictionary
+        oecStar.nameToPlanet = {"KOI-72 b": oecPlanet,
+                                "Kepler 10 b": oecPlanet}
+        originPlanet = Planet("Kepler-10b")
+        originPlanet.addVal("mass", 4)
+        originStar = Star("Kepler-10")
+        originStar.planetObjects = [originPlanet]
+        comparator = Comparator(originStar, oecStar, "eu")
+        result = comparator.starCompare()
+        self.assertEqual(result["planetDC"],
+                         {"kepler10b": {"mass": (4.0, 3.0)}})
+        self.assertEqual(result["planetA"], {})
+
+    def testStarCompareIsLazy(self):
+        comparator = Comparator(self.Star1, self.Star2, "eu")
+        result = comparator.starCompare()
+        self.assertFalse(result.isComputed("starN"))
+        self.assertEqual(result["starC"], {"mass": (100.0, 112.0)})
+        self.assertTrue(result.isComputed("starC"))
+        self.assertFalse(result.isComputed("planetDN"))
+        self.assertEqual(sorted(result.keys()),
+                         ["planetA", "planetDC", "planetDN", "planetN",
+                          "starC", "starN"])
+
+    def testProposedChangeStarCompareSkipsNewData(self):
+        comparator = Comparator(self.Star1, self.Star2, "eu")
+        with mock.patch.object(Comparator, "sqlJoin") as join:
+            comparator.proposedChangeStarCompare()
+        self.assertFalse(join.called)
+
+    def testProposedChangeStarCompareUsesMatchedPlanet(self):
+        oecPlanet = Planet("b")
+        oecPlanet.addVal("mass", 3)
+        oecStar = Star("s")
+        oecStar.planetObjects = [oecPlanet]
+        oecStar.nameToPlanet = {"b": oecPlanet}
+        first = Planet("a")
+        second = Planet("b")
+        second.addVal("mass", 4)
+        second.lastupdate = "16/06/16"
+        originStar = Star("s")
+        originStar.planetObjects = [first, second]
+        comparator = Comparator(originStar, oecStar, "eu")
+        result = comparator.proposedChangeStarCompare()
+        modifications = [c for c in result if isinstance(c, Modification)]
+        self.assertEqual(len(modifications), 1)
+        self.assertTrue(modifications[0].OEC_object is oecPlanet)
+        self.assertTrue(modifications[0].origin_object is second)
+        self.assertEqual(modifications[0].lastupdate, "16/06/16")
+
+    def testInnerJoinDiffIgnoresFormattingNoise(self):
+        planet1 = Planet("a")
+        planet1.addVal("mass", "1.30")
+        planet2 = Planet("a")
+        planet2.addVal("mass", "1.3000001")
+        comparator = Comparator(planet1, planet2, "eu")
+        self.assertEqual(comparator.innerJoinDiff(), {})
+
+    def testInnerJoinDiffFieldTolerance(self):
+        planet1 = Planet("a")
+        planet1.addVal("mass", 10)
+        planet1.addVal("radius", 10)
+        planet2 = Planet("a")
+        planet2.addVal("mass", 10.5)
+        planet2.addVal("radius", 10.5)
+        comparator = Comparator(planet1, planet2, "eu",
+                                tolerances={"mass": (0.1, 0.0)})
+        self.assertEqual(comparator.innerJoinDiff(), {"radius": (10.0, 10.5)})
+        comparator = Comparator(planet1, planet2, "eu",
+                                tolerances={"radius": (0.0, 1.0)})
+        self.assertEqual(comparator.innerJoinDiff(), {"mass": (10.0, 10.5)})
+
+    def testInnerJoinDiffErrorBars(self):
+        planet1 = Planet("a")
+        planet1.addVal("mass", 10)
+        planet1.addVal("radius", 10)
+        planet1.errors["masserrorminus"] = "0.3"
+        planet1.errors["radiuserrorplus"] = "0.3"
+        planet2 = Planet("a")
+        planet2.addVal("mass", 9.5)
+        planet2.addVal("radius", 9.5)
+        planet2.errors["masserrorplus"] = "0.2"
+        planet2.errors["radiuserrorminus"] = "0.2"
+        comparator = Comparator(planet1, planet2, "eu")
+        self.assertEqual(comparator.innerJoinDiff(),
+                         {"mass": (10.0, 9.5), "radius": (10.0, 9.5)})
+        comparator = Comparator(planet1, planet2, "eu", useErrorBars=True)
+        # only the mass error bars face each other
+        self.assertEqual(comparator.innerJoinDiff(), {"radius": (10.0, 9.5)})
+
 
 if __name__ == "__main__":
     unittest.main(exit=False)
@@ -0,0 +1,99 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from github.gitBackend import GitBackend, GitError
+
+COMMITTER = ("Tester", "tester@example.com")
+
+
+def git(repo, *args):
+    return subprocess.check_output(("git",) + args, cwd=repo).decode("UTF-8")
+
+
+def makeBareRepo(files):
+    """ (dict of {str: bytes}) -> str
+    Create a bare repository in a temporary directory with a master branch
+    holding files, and return its path
+    """
+    repo = tempfile.mkdtemp()
+    git(repo, "init", "--bare", "-q")
+    with GitBackend(repo, COMMITTER) as backend:
+        backend.commit("master", None, "Initial commit", files)
+    return repo
+
+
+class GitBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = makeBareRepo({"systems/Sun.xml": b"<system>Sun</system>",
+                                  "systems/Vega.xml": b"<system/>"})
+        self.addCleanup(shutil.rmtree, self.repo)
+        self.backend = GitBackend(self.repo, COMMITTER)
+        self.addCleanup(self.backend.close)
+
+    def testReadBlob(self):
+        self.assertEqual(self.backend.readBlob("master", "systems/Sun.xml"),
+                         b"<system>Sun</system>")
+        self.assertIsNone(self.backend.readBlob("master", "systems/No.xml"))
+        self.assertIsNone(self.backend.readBlob("nobranch", "systems/Sun.xml"))
+
+    def testResolve(self):
+        self.assertEqual(self.backend.resolve("master"),
+                         git(self.repo, "rev-parse", "master").strip())
+        self.assertIsNone(self.backend.resolve("nobranch"))
+
+    def testCommitsInOneProcess(self):
+        master = self.backend.resolve("master")
+        first = self.backend.commit("opcat1", master, "Change Sun",
+                                    {"systems/Sun.xml": b"<system>1</system>"})
+        process = self.backend._fastImport
+        second = self.backend.commit("opcat1", first, "Cleanup",
+                                     {"systems/Sun.xml": b"<system>2</system>"})
+        other = self.backend.commit("opcat2", master, "Change Vega",
+                                    {"systems/Vega.xml": b"<system>3</system>"})
+        self.assertIs(self.backend._fastImport, process)
+        self.backend.flush()
+
+        self.assertEqual(git(self.repo, "rev-parse", "opcat1").strip(), second)
+        self.assertEqual(git(self.repo, "rev-parse", "opcat2").strip(), other)
+        self.assertEqual(git(self.repo, "rev-parse", "opcat1^").strip(), first)
+        self.assertEqual(git(self.repo, "log", "--format=%s", "opcat1"),
+                         "Cleanup\nChange Sun\nInitial commit\n")
+        self.assertEqual(git(self.repo, "show", "opcat1:systems/Sun.xml"),
+                         "<system>2</system>")
+        # the other files are kept
+        self.assertEqual(git(self.repo, "show", "opcat1:systems/Vega.xml"),
+                         "<system/>")
+        self.assertEqual(git(self.repo, "show", "opcat2:systems/Sun.xml"),
+                         "<system>Sun</system>")
+        self.assertEqual(git(self.repo, "log", "-1", "--format=%an <%ae>",
+                             "opcat2"), "Tester <tester@example.com>\n")
+        # master is untouched
+        self.assertEqual(self.backend.resolve("master"), master)
+
+    def testCommitDeletesFiles(self):
+        master = self.backend.resolve("master")
+        self.backend.commit("opcat1", master, "Remove Vega",
+                            {"systems/Vega.xml": None})
+        self.backend.flush()
+        self.assertEqual(git(self.repo, "ls-tree", "--name-only", "-r",
+                             "opcat1"), "systems/Sun.xml\n")
+
+    def testCloseWritesBranches(self):
+        master = self.backend.resolve("master")
+        self.backend.commit("opcat1", master, "Change", {"a.xml": b"a"})
+        self.backend.close()
+        self.assertEqual(git(self.repo, "show", "opcat1:a.xml"), "a")
+
+    def testCloseFailsOnRejectedUpdate(self):
+        # the branch would not contain its previous commits
+        master = self.backend.resolve("master")
+        self.backend.commit("master", None, "Unrelated", {"a.xml": b"a"})
+        self.assertRaises(GitError, self.backend.close)
+        self.assertEqual(git(self.repo, "rev-parse", "master").strip(), master)
+
+
+if __name__ == '__main__':
+    unittest.main()
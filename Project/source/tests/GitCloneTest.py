@@ -0,0 +1,262 @@
+import unittest
+import os
+import shutil
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+from unittest import mock
+from github.gitBackend import GitBackend
+from data_parsing.CatalogueIndex import CatalogueIndex
+import data_parsing.Planet as Planet
+import data_parsing.Star as Star
+import data_parsing.System as System
+from data_comparison.proposed_change import Modification
+
+# the module reads the repository link from the program config when imported
+with mock.patch("storage_manager.storage_manager.config_get"):
+    import github.gitClone as GIT
+
+SYSTEM_XML = """<system>
+\t<name>Sys</name>
+\t<distance>10</distance>
+\t<star>
+\t\t<name>Sys</name>
+\t\t<mass>1.0</mass>
+\t\t<planet>
+\t\t\t<name>Sys b</name>
+\t\t\t<mass>2.0</mass>
+\t\t\t<period>3.0</period>
+\t\t</planet>
+\t</star>
+\t<lastupdate>10/01/01</lastupdate>
+</system>
+"""
+
+
+class GitCloneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.direc, "systems"))
+        with open(os.path.join(self.direc, "systems", "Sys.xml"), "w") as f:
+            f.write(SYSTEM_XML)
+        patcher = mock.patch.object(GIT, "workdir", self.direc)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = CatalogueIndex()
+        patcher = mock.patch.object(GIT, "index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.direc)
+
+        self.system = System.System("Sys")
+        self.star = Star.Star("Sys")
+        self.star.nameSystem = "Sys"
+        self.planet = Planet.Planet("Sys b")
+        self.planet.starObject = self.star
+
+    def testApplyChangesParsesAndWritesEachFileOnce(self):
+        changes = [
+            Modification("NASA", self.planet, self.planet, "mass", "2.5",
+                         "2.0"),
+            Modification("NASA", self.planet, self.planet, "period", "3.5",
+                         "3.0"),
+            Modification("NASA", self.star, self.star, "mass", "1.1", "1.0"),
+            Modification("NASA", self.system, self.system, "distance", "11",
+                         "10")]
+        with mock.patch.object(GIT.ET, "fromstring",
+                               side_effect=ET.fromstring) as parse, \
+                mock.patch.object(ET.ElementTree, "write",
+                                  autospec=True,
+                                  side_effect=ET.ElementTree.write) as write:
+            paths = GIT.applyChanges(changes)
+        self.assertEqual(paths, ["systems/Sys.xml"])
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(write.call_count, 1)
+
+        root = ET.parse(os.path.join(self.direc, "systems/Sys.xml")).getroot()
+        self.assertEqual(root.find("./distance").text, "11")
+        self.assertEqual(root.find("./star/mass").text, "1.1")
+        self.assertEqual(root.find("./star/planet/mass").text, "2.5")
+        self.assertEqual(root.find("./star/planet/period").text, "3.5")
+        self.assertNotEqual(root.find("./lastupdate").text, "10/01/01")
+
+    def testApplyChangesIgnoresAdditions(self):
+        self.assertEqual(GIT.applyChanges([]), [])
+
+    def testApplyChangesFollowsIndex(self):
+        # the system is stored under another name, with a second star whose
+        # planet has the same name
+        os.rename(os.path.join(self.direc, "systems", "Sys.xml"),
+                  os.path.join(self.direc, "systems", "Other.xml"))
+        self.index.add("Planet", ["Sys b"], "Sys", "systems/Other.xml",
+                       "star[1]/planet[1]")
+        changes = [Modification("NASA", self.planet, self.planet, "mass",
+                                "2.5", "2.0")]
+        with mock.patch.object(GIT.ET.ElementTree, "iter") as scan:
+            self.assertEqual(GIT.applyChanges(changes), ["systems/Other.xml"])
+        scan.assert_not_called()
+        root = ET.parse(
+            os.path.join(self.direc, "systems/Other.xml")).getroot()
+        self.assertEqual(root.find("./star/planet/mass").text, "2.5")
+
+    def testStaleIndexFallsBackToScan(self):
+        self.index.add("Star", ["Sys"], "Sys", "systems/Sys.xml", "star[2]")
+        changes = [Modification("NASA", self.star, self.star, "mass", "1.1",
+                                "1.0")]
+        GIT.applyChanges(changes)
+        root = ET.parse(os.path.join(self.direc, "systems/Sys.xml")).getroot()
+        self.assertEqual(root.find("./star/mass").text, "1.1")
+
+    def testApplyChangesAddsMissingField(self):
+        changes = [Modification("NASA", self.star, self.star, "radius",
+                                "0.9", "N/A")]
+        GIT.applyChanges(changes)
+        root = ET.parse(os.path.join(self.direc, "systems/Sys.xml")).getroot()
+        self.assertEqual(root.find("./star/radius").text, "0.9")
+        self.assertIsNone(root.find("./star/planet/radius"))
+
+    def testApplyChangesSkipsMissingObject(self):
+        planet = Planet.Planet("Sys c")
+        planet.starObject = self.star
+        changes = [Modification("NASA", planet, planet, "mass", "2.5", "2.0")]
+        with mock.patch("builtins.print") as printed:
+            self.assertEqual(GIT.applyChanges(changes), [])
+        self.assertIn("Sys c", printed.call_args[0][0])
+        with open(os.path.join(self.direc, "systems", "Sys.xml")) as f:
+            self.assertEqual(f.read(), SYSTEM_XML)
+
+    def testAcceptChangesCommitsOnce(self):
+        changes = [
+            Modification("NASA", self.planet, self.planet, "mass", "2.5",
+                         "2.0"),
+            Modification("NASA", self.star, self.star, "mass", "1.1", "1.0")]
+        with mock.patch.object(GIT, "call", return_value=0) as call, \
+                mock.patch.object(GIT, "files", []):
+            paths = GIT.acceptChanges(changes)
+            self.assertEqual(GIT.files, ["systems/Sys.xml"])
+        self.assertEqual(paths, ["systems/Sys.xml"])
+        commands = [args[0][:2] for args, kwargs in call.call_args_list]
+        self.assertEqual(commands, [["git", "add"], ["git", "commit"]])
+        message = call.call_args_list[1][0][0][3]
+        self.assertIn("Sys b mass 2.0 -> 2.5", message)
+        self.assertIn("Sys mass 1.0 -> 1.1", message)
+
+    def testAcceptChangesFailedCommitRaises(self):
+        change = Modification("NASA", self.planet, self.planet, "mass",
+                              "2.5", "2.0")
+        with mock.patch.object(GIT, "call", return_value=1), \
+                mock.patch.object(GIT, "files", []):
+            with self.assertRaises(GIT.BACKEND.GitError):
+                GIT.acceptChanges([change])
+
+
+class GitCloneCleanupTest(unittest.TestCase):
+
+    def testCleanupOnlyGivenFiles(self):
+        with mock.patch.object(GIT.CLEANUP, "cleanFiles",
+                               return_value=0) as cleanFiles:
+            self.assertEqual(GIT.cleanup(["systems/Sys.xml"]), 0)
+        cleanFiles.assert_called_once_with(
+            [os.path.join(GIT.workdir, "systems/Sys.xml")])
+
+
+class GitCloneMirrorTest(unittest.TestCase):
+
+    def testMirrorClonedAsConfigured(self):
+        with mock.patch.object(GIT.STORAGE, "config_get",
+                               return_value="shallow"):
+            mirror = GIT.makeMirror()
+        self.assertEqual((mirror.shallow, mirror.blobFilter), (True, False))
+
+    def testMirrorClonedFullyByDefault(self):
+        with mock.patch.object(GIT.STORAGE, "config_get", return_value=None):
+            mirror = GIT.makeMirror()
+        self.assertEqual((mirror.shallow, mirror.blobFilter), (False, False))
+
+
+class GitCloneFinalizeTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(GIT, "publisher")
+        self.publisher = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(GIT.queued.clear)
+        self.addCleanup(GIT.skipped.clear)
+        GIT.queued.update({"opcat1": "id1", "opcat2": "id2"})
+        GIT.skipped.append("id3")
+
+    def testFailedPullRequestsUnpublished(self):
+        self.publisher.publish.return_value = [("opcat1", 0), ("opcat2", 1)]
+        with mock.patch("builtins.print"):
+            self.assertEqual(GIT.finalizeGit(), ["id3", "id2"])
+        self.assertEqual((GIT.queued, GIT.skipped), ({}, []))
+
+    def testFailedPushRaises(self):
+        self.publisher.publish.side_effect = GIT.BACKEND.GitError
+        with self.assertRaises(GIT.BACKEND.GitError):
+            GIT.finalizeGit()
+        self.assertEqual((GIT.queued, GIT.skipped), ({}, []))
+
+
+class GitCloneCommitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo)
+        subprocess.check_call(["git", "init", "--bare", "-q"], cwd=self.repo)
+        self.backend = GitBackend(self.repo, ("Tester", "tester@example.com"))
+        self.addCleanup(self.backend.close)
+        self.backend.commit("master", None, "Initial commit",
+                            {"systems/Sys.xml": SYSTEM_XML.encode("UTF-8")})
+        self.backend.flush()
+        patcher = mock.patch.object(GIT, "index", CatalogueIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        star = Star.Star("Sys")
+        star.nameSystem = "Sys"
+        self.planet = Planet.Planet("Sys b")
+        self.planet.starObject = star
+
+    def git(self, *args):
+        return subprocess.check_output(("git",) + args,
+                                       cwd=self.repo).decode("UTF-8")
+
+    def testCommitChange(self):
+        change = Modification("NASA", self.planet, self.planet, "mass", "2.5",
+                              "2.0")
+        with mock.patch("builtins.print"):
+            head = GIT.commitChange(self.backend, change, "opcat1")
+        self.backend.flush()
+        self.assertEqual(self.git("rev-parse", "opcat1").strip(), head)
+        self.assertEqual(
+            self.git("log", "--format=%B", "-1", "opcat1").strip(), "Cleanup")
+        self.assertEqual(
+            self.git("log", "--format=%B", "-1", "opcat1^").strip(),
+            str(change).strip())
+        self.assertEqual(self.git("rev-parse", "opcat1^^"),
+                         self.git("rev-parse", "master"))
+        root = ET.fromstring(self.git("show", "opcat1:systems/Sys.xml"))
+        self.assertEqual(root.find("./star/planet/mass").text, "2.5")
+        self.assertNotEqual(root.findtext("./lastupdate"), "10/01/01")
+        # the master branch is left as it was
+        root = ET.fromstring(self.git("show", "master:systems/Sys.xml"))
+        self.assertEqual(root.find("./star/planet/mass").text, "2.0")
+
+    def testCommitChangeSkipsMissingFile(self):
+        star = Star.Star("Gone")
+        star.nameSystem = "Gone"
+        planet = Planet.Planet("Gone b")
+        planet.starObject = star
+        change = Modification("NASA", planet, planet, "mass", "2.5", "2.0")
+        with mock.patch("builtins.print") as printed:
+            self.assertIsNone(GIT.commitChange(self.backend, change,
+                                               "opcat1"))
+        self.assertIn("systems/Gone.xml", printed.call_args[0][0])
+        self.backend.flush()
+        self.assertNotIn("opcat1", self.git("branch", "--list", "opcat1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+
+sys.path.append("../")
+from data_parsing.XML_data_parser import buildSystemFromXML
+from data_parsing.CSV_data_parser import buildDictStarExistingField
+import gc
+import tracemalloc
+
+# paths of the catalogues measured
+OEC_PATH = "../storage/OEC_XML.gz"
+NASA_PATH = "../storage/nasa_csv"
+EU_PATH = "../storage/exoplanetEU_csv"
+
+
+def measure(build):
+    '''(function) -> (object, int)
+    Calls build, and returns its result along with the number of bytes still
+    allocated by the call once it returned
+    '''
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (result, size)
+
+
+def countObjects(stars):
+    '''([Star]) -> int
+    Returns the number of stars and planets in stars
+    '''
+    return len(stars) + sum(len(star.planetObjects) for star in stars)
+
+
+def main():
+    total = 0
+    oec, size = measure(lambda: buildSystemFromXML(OEC_PATH))
+    total += size
+    print("OEC: %d systems, %d stars, %d planets: %.1f MB"
+          % (len(oec[0]), len(oec[1]), len(oec[2]), size / 2 ** 20))
+    for (name, path, source) in [("NASA", NASA_PATH, "nasa"),
+                                 ("exoplanet.eu", EU_PATH, "eu")]:
+        stars, size = measure(
+            lambda: buildDictStarExistingField(path, source))
+        total += size
+        print("%s: %d stars and planets: %.1f MB"
+              % (name, countObjects(list(stars.values())), size / 2 ** 20))
+    print("total: %.1f MB" % (total / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
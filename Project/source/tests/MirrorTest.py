@@ -0,0 +1,102 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+from github.gitBackend import GitBackend
+from github.mirror import Mirror
+
+COMMITTER = ("Tester", "t@example.com")
+
+
+def git(repo, *args):
+    return subprocess.check_output(("git",) + args, cwd=repo,
+                                   stderr=subprocess.DEVNULL).decode("UTF-8")
+
+
+class MirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.direc)
+        self.remote = os.path.join(self.direc, "remote.git")
+        os.mkdir(self.remote)
+        git(self.remote, "init", "--bare", "-q")
+        git(self.remote, "config", "uploadpack.allowFilter", "true")
+        # a file:// url, so that shallow and partial clones are honoured
+        self.url = "file://" + self.remote
+        self.head = self.commit(None, "Sun")
+        self.head = self.commit(self.head, "Sun, Vega")
+        self.path = os.path.join(self.direc, "github", "catalogue")
+
+    def commit(self, parent, content):
+        with GitBackend(self.remote, COMMITTER) as backend:
+            return backend.commit("master", parent, content,
+                                  {"systems/Sun.xml": content.encode("UTF-8")})
+
+    def read(self, *path):
+        with open(os.path.join(*path)) as f:
+            return f.read()
+
+    def testEnsureClonesOnce(self):
+        mirror = Mirror(self.path)
+        self.assertTrue(mirror.ensure(self.url))
+        self.assertEqual(self.read(self.path, "systems/Sun.xml"), "Sun, Vega")
+        self.assertEqual(git(self.path, "remote", "get-url", "upstream"),
+                         self.url + "\n")
+
+        self.head = self.commit(self.head, "Sun, Vega, Altair")
+        with mock.patch.object(mirror, "clone") as clone:
+            self.assertFalse(mirror.ensure(self.url))
+        clone.assert_not_called()
+        self.assertEqual(self.read(self.path, "systems/Sun.xml"),
+                         "Sun, Vega, Altair")
+        self.assertEqual(git(self.path, "rev-parse", "HEAD").strip(),
+                         self.head)
+
+    def testEnsureFollowsNewUrl(self):
+        mirror = Mirror(self.path)
+        mirror.ensure(self.url)
+        moved = os.path.join(self.direc, "moved.git")
+        shutil.move(self.remote, moved)
+        mirror.ensure("file://" + moved)
+        self.assertEqual(git(self.path, "remote", "get-url", "origin"),
+                         "file://" + moved + "\n")
+        self.assertEqual(git(self.path, "remote", "get-url", "upstream"),
+                         "file://" + moved + "\n")
+
+    def testShallowClone(self):
+        mirror = Mirror(self.path, shallow=True)
+        mirror.ensure(self.url)
+        self.assertEqual(git(self.path, "rev-list", "--count", "HEAD"), "1\n")
+        self.head = self.commit(self.head, "Sun, Vega, Altair")
+        mirror.ensure(self.url)
+        self.assertEqual(self.read(self.path, "systems/Sun.xml"),
+                         "Sun, Vega, Altair")
+
+    def testBlobFilterClone(self):
+        mirror = Mirror(self.path, blobFilter=True)
+        mirror.ensure(self.url)
+        self.assertEqual(git(self.path, "config", "remote.origin.promisor"),
+                         "true\n")
+        self.assertEqual(self.read(self.path, "systems/Sun.xml"), "Sun, Vega")
+
+    def testWorktree(self):
+        mirror = Mirror(self.path)
+        mirror.ensure(self.url)
+        worktree = mirror.addWorktree("OPCAT1")
+        self.assertEqual(git(worktree, "rev-parse", "--abbrev-ref", "HEAD"),
+                         "OPCAT1\n")
+        with open(os.path.join(worktree, "systems/Sun.xml"), "w") as f:
+            f.write("edited")
+        # the mirror's own working copy is left alone
+        self.assertEqual(self.read(self.path, "systems/Sun.xml"), "Sun, Vega")
+        mirror.removeWorktree(worktree)
+        self.assertFalse(os.path.exists(worktree))
+        self.assertEqual(git(self.path, "rev-parse", "OPCAT1").strip(),
+                         self.head)
+
+
+if __name__ == '__main__':
+    unittest.main()
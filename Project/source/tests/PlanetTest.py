@@ -6,7 +6,9 @@ Created on Sat Nov 26 22:51:21 2016
 """
 
 from data_parsing.Planet import *
+from data_parsing.Star import *
 from tests.PlanetaryObjectTest import *
+import pickle
 import unittest
 
 
@@ -22,6 +24,74 @@ class TestPlanet(TestPlanetaryObject):
         self.assertEquals("", planet1.nameStar)
         self.assertEquals("00/00/00", planet1.lastupdate)
 
+    def testErrorBounds(self):
+        planet1 = Planet("testPlanet")
+        planet1.addError("masserrorplus", "0.1")
+        planet1.addError("masserrorminus", "0.2")
+        planet1.addError("semimajoraxisupperlimit", "3")
+        planet1.addError("masserror", "0.3")
+        self.assertEquals({"errorplus": "0.1", "errorminus": "0.2"},
+                          planet1.getErrorBounds("mass"))
+        self.assertEquals({"upperlimit": "3"},
+                          planet1.getErrorBounds("semimajoraxis"))
+        self.assertEquals({}, planet1.getErrorBounds("radius"))
+        self.assertEquals("0.3", planet1.errors["masserror"])
+
+    def testErrorBoundsFollowNewErrors(self):
+        planet1 = Planet("testPlanet")
+        planet1.addError("masserrorplus", "0.1")
+        self.assertEquals({"errorplus": "0.1"},
+                          planet1.getErrorBounds("mass"))
+        planet1.addError("masserrorplus", "0.5")
+        self.assertEquals({"errorplus": "0.5"},
+                          planet1.getErrorBounds("mass"))
+
+    def testErrorBoundsFollowDirectWrites(self):
+        planet1 = Planet("testPlanet")
+        planet1.addError("masserrorplus", "0.1")
+        self.assertEquals({"errorplus": "0.1"},
+                          planet1.getErrorBounds("mass"))
+        # a bound replaced, then removed, in the errors dictionary itself
+        planet1.errors["masserrorplus"] = "0.5"
+        self.assertEquals({"errorplus": "0.5"},
+                          planet1.getErrorBounds("mass"))
+        del planet1.errors["masserrorplus"]
+        self.assertEquals({}, planet1.getErrorBounds("mass"))
+        planet1.errors = {"radiuserrorminus": "0.2"}
+        self.assertEquals({"errorminus": "0.2"},
+                          planet1.getErrorBounds("radius"))
+
+    def testSlots(self):
+        planet1 = Planet("testPlanet")
+        self.assertFalse(hasattr(planet1, "__dict__"))
+        with self.assertRaises(AttributeError):
+            planet1.unknownAttribute = 1
+
+    def testPickle(self):
+        star = Star("testStar")
+        planet1 = Planet("testPlanet")
+        planet1.addVal("mass", "1.5")
+        planet1.addError("masserrorplus", "0.1")
+        planet1.starObject = star
+        star.planetObjects.append(planet1)
+        copy = pickle.loads(pickle.dumps(planet1))
+        self.assertEquals("testPlanet", copy.name)
+        self.assertEquals({"mass": 1.5}, copy.data)
+        self.assertEquals({"errorplus": "0.1"}, copy.getErrorBounds("mass"))
+        self.assertIs(copy, copy.starObject.planetObjects[0])
+
+    def testSetStateFromDict(self):
+        # objects pickled before the classes had slots have a __dict__ state,
+        # which may lack the newer attributes or hold removed ones
+        planet1 = Planet.__new__(Planet)
+        planet1.__setstate__({"name": "old", "data": {"mass": "1"},
+                              "errors": {"masserrorminus": "0.2"},
+                              "lastupdate": "16/11/20", "removed": 1})
+        self.assertEquals("old", planet1.name)
+        self.assertEquals({"errorminus": "0.2"},
+                          planet1.getErrorBounds("mass"))
+        self.assertFalse(hasattr(planet1, "removed"))
+
 
 if __name__ == '__main__':
     unittest.main(exit=False)
@@ -5,6 +5,7 @@ Created on Sat Nov 26 19:03:43 2016
 @author: jerry
 """
 from data_parsing.PlanetaryObject import *
+from data_parsing.schema import MISSING
 import unittest
 
 
@@ -74,7 +75,7 @@ class TestPlanetaryObject(unittest.TestCase):
 
     def testAddValListNonCompatibleObject(self):
         self.planet2.addValList("test", self.planet1)
-        expected = ["N/A"]
+        expected = [MISSING]
         self.assertEquals(expected, self.planet2.getVal("test"))
 
     def testAddToValListExistingList(self):
@@ -1,3 +1,5 @@
+import io
+import pickle
 import unittest
 from data_comparison.proposed_change import *
 import data_parsing.Planet as Planet
@@ -28,6 +30,23 @@ class testing_constructors(unittest.TestCase):
         self.assertEqual(a.value_in_origin_catalogue, 10)
         self.assertEqual(a.value_in_OEC, 15)
 
+    def test_init_modification_error_bounds(self):
+        oec = Planet.Planet("A")
+        oec.addError("masserrorplus", "0.5")
+        oec.addError("masserrorminus", "")
+        oec.addError("radiuserrorplus", "0.1")
+        origin = Planet.Planet("A")
+        # errors written directly are indexed on first lookup
+        origin.errors["massupperlimit"] = "2"
+        origin.errors["masslowerlimit"] = "1"
+        a = Modification("NASA", oec, origin, "mass", 10, 15)
+        self.assertEqual(a.OEC_upper, "0.5")
+        self.assertEqual(a.OEC_lower, "N/A")
+        self.assertEqual(a.origin_upper, "2")
+        self.assertEqual(a.origin_lower, "1")
+        self.assertEqual(a.upper_attrib_name, "upperlimit")
+        self.assertEqual(a.lower_attrib_name, "lowerlimit")
+
 
 class testing_merge(unittest.TestCase):
     def __init__(self, *args, **kwargs):
@@ -207,5 +226,109 @@ class testing_sort(unittest.TestCase):
         self.assertEqual(len(result), 0)
 
 
+class testing_rendering(unittest.TestCase):
+    def setUp(self):
+        self.star = Star.Star("B")
+        self.star.nameSystem = "C"
+        self.planet = Planet.Planet("A")
+        self.planet.starObject = self.star
+        self.planet.addVal("mass", "2.0")
+        self.planet.lastupdate = "16/01/02"
+
+    def test_modification_text(self):
+        a = Modification("NASA", self.planet, self.planet, "mass", 2.5, 2.0)
+        text = str(a)
+        self.assertTrue(text.startswith("Proposed modification:\n\n"))
+        self.assertIn("Part of System: C\n", text)
+        self.assertIn("Last modified by NASA on: 16/01/02\n", text)
+        self.assertIn("Value according to NASA: 2.5\n", text)
+        self.assertTrue(text.endswith("Origin Lower Limit: N/A\n"))
+        fancy = a.fancyStr()
+        self.assertIn("Value according to NASA: \x1b[2;30;42m2.5\x1b[0m\n",
+                      fancy)
+        self.assertTrue(fancy.endswith(
+            "OEC Lower Limit: \x1b[6;30;41mN/A\x1b[0m\n"))
+
+    def test_addition_text(self):
+        a = Addition("eu", self.planet)
+        self.assertEqual(a.fancyStr(), str(a))
+        self.assertTrue(str(a).endswith(str(self.planet) + "\n"))
+        self.assertIn("mass :   2.0\n", str(self.planet))
+
+    def test_addition_text_follows_object(self):
+        a = Addition("eu", self.planet)
+        str(a)
+        self.planet.addVal("mass", "3.5")
+        self.assertIn("mass :   3.5\n", str(a))
+        self.assertIn("mass :   3.5\n", a.fancyStr())
+
+    def test_text_cached_until_modified(self):
+        a = Modification("NASA", self.planet, self.planet, "mass", 2.5, 2.0)
+        self.assertIs(str(a), str(a))
+        self.assertIs(a.fancyStr(), a.fancyStr())
+        # sorting numbers the changes, which does not change their text
+        sort_changes_lastupdate([a])
+        self.assertIs(str(a), a._str)
+        a.value_in_origin_catalogue = 3.0
+        self.assertIn("Value according to NASA: 3.0\n", str(a))
+        self.assertIn("3.0", a.fancyStr())
+
+    def test_text_not_pickled(self):
+        a = Modification("NASA", self.planet, self.planet, "mass", 2.5, 2.0)
+        text = str(a)
+        a.fancyStr()
+        copy = pickle.loads(pickle.dumps(a))
+        self.assertNotIn("_str", copy.__dict__)
+        self.assertNotIn("_fancyStr", copy.__dict__)
+        self.assertEqual(str(copy), text)
+        self.assertEqual(copy, a)
+
+    def test_render_changes(self):
+        a = Addition("eu", self.planet)
+        b = Modification("NASA", self.planet, self.planet, "mass", 2.5, 2.0)
+        texts = list(render_changes(enumerate([a, b], 3)))
+        self.assertEqual(texts[0], "\nShowing number : 3 (id " +
+                         a.getId()[:12] + ")\n\n" + str(a) + "\n\n")
+        self.assertTrue(texts[1].startswith("\nShowing number : 4 (id "))
+
+    def test_id(self):
+        a = Modification("NASA", self.planet, self.planet, "mass", 2.5, 2.0)
+        self.assertRegex(a.getId(), "^[0-9a-f]{40}$")
+        # equal changes have the same id, however they were made or stored
+        self.assertEqual(
+            Modification("NASA", self.planet, self.planet, "mass", 2.5,
+                         2).getId(), a.getId())
+        self.assertEqual(pickle.loads(pickle.dumps(a)).getId(), a.getId())
+        identifier = a.getId()
+        sort_changes_lastupdate([a])
+        self.assertEqual(a.getId(), identifier)
+        for other in [
+                Modification("eu", self.planet, self.planet, "mass", 2.5,
+                             2.0),
+                Modification("NASA", self.planet, self.planet, "mass", 2.6,
+                             2.0),
+                Modification("NASA", self.planet, self.planet, "radius",
+                             2.5, 2.0)]:
+            self.assertNotEqual(other.getId(), a.getId())
+        b = Addition("eu", self.planet)
+        self.assertEqual(pickle.loads(pickle.dumps(b)).getId(), b.getId())
+        self.assertNotEqual(Addition("nasa", self.planet).getId(), b.getId())
+
+    def test_write_paged(self):
+        out = io.StringIO()
+        pages = []
+        self.assertEqual(write_paged(iter("abcde"), 2, out), 5)
+        self.assertEqual(out.getvalue(), "abcde")
+
+        out = io.StringIO()
+
+        def more():
+            pages.append(out.getvalue())
+            return len(pages) < 2
+        self.assertEqual(write_paged(iter("abcde"), 2, out, more), 4)
+        self.assertEqual(pages, ["ab", "abcd"])
+        self.assertEqual(out.getvalue(), "abcd")
+
+
 if __name__ == '__main__':
     unittest.main(exit=False, verbosity=2)
@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+from unittest import mock
+from github.gitBackend import GitBackend, GitError
+from github.publisher import Publisher
+
+# stands in for hub, recording the pull requests it is asked to open
+HUB_STUB = """#!/bin/sh
+echo "$@" > "$0.$4"
+"""
+
+
+def git(repo, *args):
+    return subprocess.check_output(("git",) + args, cwd=repo,
+                                   stderr=subprocess.DEVNULL).decode("UTF-8")
+
+
+class PublisherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.direc = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.direc)
+        self.repo = os.path.join(self.direc, "repo.git")
+        self.remote = os.path.join(self.direc, "remote.git")
+        for path in (self.repo, self.remote):
+            os.mkdir(path)
+            git(path, "init", "--bare", "-q")
+        git(self.repo, "remote", "add", "upstream", self.remote)
+        self.hub = os.path.join(self.direc, "hub")
+        with open(self.hub, "w") as f:
+            f.write(HUB_STUB)
+        os.chmod(self.hub, stat.S_IRWXU)
+
+        with GitBackend(self.repo, ("Tester", "t@example.com")) as backend:
+            master = backend.commit("master", None, "Initial", {"a": b"a"})
+            for i in range(1, 4):
+                backend.commit("opcat" + str(i), master, "Change " + str(i),
+                               {"a": str(i).encode("ascii")})
+        self.publisher = Publisher(self.repo, hubCommand=[self.hub],
+                                   workers=2)
+
+    def pullRequest(self, branch):
+        with open(self.hub + "." + branch) as f:
+            return f.read()
+
+    def testPublishPushesOnceAndOpensEveryPullRequest(self):
+        for i in range(1, 4):
+            self.publisher.add("opcat" + str(i), "Change " + str(i))
+        with mock.patch("subprocess.call", wraps=subprocess.call) as call:
+            results = self.publisher.publish()
+        pushes = [args[0] for args, kwargs in call.call_args_list
+                  if args[0][:2] == ["git", "push"]]
+        self.assertEqual(pushes, [["git", "push", "upstream", "opcat1",
+                                   "opcat2", "opcat3"]])
+        self.assertEqual(results, [("opcat1", 0), ("opcat2", 0),
+                                   ("opcat3", 0)])
+        for i in range(1, 4):
+            branch = "opcat" + str(i)
+            self.assertEqual(git(self.remote, "show", branch + ":a"), str(i))
+            self.assertEqual(self.pullRequest(branch),
+                             "pull-request -f -h " + branch + " -m Change " +
+                             str(i) + "\n")
+        self.assertEqual(self.publisher.pending, [])
+
+    def testPublishNothing(self):
+        with mock.patch("subprocess.call") as call:
+            self.assertEqual(self.publisher.publish(), [])
+        call.assert_not_called()
+
+    def testFailedPushOpensNoPullRequest(self):
+        self.publisher.add("nobranch", "Change")
+        with self.assertRaises(GitError):
+            self.publisher.publish()
+        self.assertFalse(os.path.exists(self.hub + ".nobranch"))
+        self.assertEqual(self.publisher.pending, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+from github.gitBackend import GitBackend
+from data_parsing.CatalogueIndex import CatalogueIndex
+from data_parsing.RepositoryCatalogue import RepositoryCatalogue
+import data_parsing.RepositoryCatalogue as REPO
+
+COMMITTER = ("Tester", "tester@example.com")
+
+
+def system(name, mass="1.0"):
+    return ("<system><name>%s</name><star><name>%s</name><mass>%s</mass>"
+            "<planet><name>%s b</name><mass>2.0</mass></planet></star>"
+            "</system>" % (name, name, mass, name)).encode("UTF-8")
+
+
+class RepositoryCatalogueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repo)
+        subprocess.check_call(["git", "init", "--bare", "-q"], cwd=self.repo)
+        self.head = None
+        self.commit({"systems/Sun.xml": system("Sun"),
+                     "systems/Vega.xml": system("Vega"),
+                     "README.md": b"catalogue"})
+        self.catalogue = RepositoryCatalogue(self.repo, "master")
+
+    def commit(self, files):
+        with GitBackend(self.repo, COMMITTER) as backend:
+            self.head = backend.commit("master", self.head, "Update", files)
+
+    def testFirstLoadParsesEveryFile(self):
+        self.assertTrue(self.catalogue.load())
+        self.assertEqual(self.catalogue.parsed, 2)
+        systems, stars, planets, systemsDict, starsDict, planetsDict = \
+            self.catalogue.build()
+        self.assertEqual([s.name for s in systems], ["Sun", "Vega"])
+        self.assertEqual([s.name for s in stars], ["Sun", "Vega"])
+        self.assertEqual(planetsDict["Vega b"].starObject, starsDict["Vega"])
+        self.assertEqual(systemsDict["Sun"].starObjects, [starsDict["Sun"]])
+
+    def testLoadOnlyParsesChangedFiles(self):
+        self.catalogue.load()
+        sun = self.catalogue.build()[3]["Sun"]
+        self.commit({"systems/Vega.xml": system("Vega", "2.1")})
+        with mock.patch.object(REPO, "buildSystem",
+                               side_effect=REPO.buildSystem) as build:
+            self.assertTrue(self.catalogue.load())
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(self.catalogue.parsed, 1)
+        systemsDict, starsDict = self.catalogue.build()[3:5]
+        self.assertEqual(starsDict["Vega"].data["mass"], 2.1)
+        # the objects of the other files are reused
+        self.assertIs(systemsDict["Sun"], sun)
+        self.assertFalse(self.catalogue.load())
+        self.assertEqual(self.catalogue.parsed, 0)
+
+    def testLoadFollowsAddedRemovedAndRenamedFiles(self):
+        self.catalogue.load()
+        self.commit({"systems/Altair.xml": system("Altair"),
+                     "systems/Vega 2.xml": system("Vega"),
+                     "systems/Vega.xml": None})
+        self.catalogue.load()
+        self.assertEqual(self.catalogue.parsed, 2)
+        index = CatalogueIndex()
+        systems = self.catalogue.build(index)[0]
+        self.assertEqual([s.name for s in systems], ["Altair", "Sun", "Vega"])
+        # the index knows the file the system is in now
+        self.assertEqual(index.lookup("Planet", "Vega b"),
+                         ("systems/Vega 2.xml", "star[1]/planet[1]"))
+        self.assertEqual(len(self.catalogue.cache), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import copy
+import datetime
+import pickle
+from data_parsing import schema
+from data_parsing.schema import MISSING
+from data_parsing.Planet import Planet
+from data_parsing.Star import Star
+from data_comparison.proposed_change import Modification
+
+
+class SchemaTest(unittest.TestCase):
+
+    def testIngestKnownFields(self):
+        self.assertEqual(schema.ingest("mass", " 19.4 "), 19.4)
+        self.assertEqual(schema.ingest("discoveryyear", "2008"), 2008)
+        self.assertEqual(schema.ingest("discoveryyear", 2008.0), 2008)
+        self.assertEqual(schema.ingest("lastupdate", "15/09/20"),
+                         datetime.date(2015, 9, 20))
+        self.assertEqual(schema.ingest("discoverymethod", "Transit"),
+                         "transit")
+        self.assertEqual(schema.ingest("list", "confirmed planets"),
+                         "Confirmed planets")
+
+    def testIngestKeepsUnparsableText(self):
+        self.assertEqual(schema.ingest("mass", "~5"), "~5")
+        self.assertEqual(schema.ingest("discoverymethod", "Astrometry"),
+                         "Astrometry")
+        self.assertEqual(schema.ingest("declination", "+17 47 34"),
+                         "+17 47 34")
+
+    def testIngestMissingValues(self):
+        for val in [None, "", " ", "N/A", "nan", "inf"]:
+            self.assertIs(schema.ingest("mass", val), MISSING)
+        self.assertIs(schema.ingest("lastupdate", ""), MISSING)
+        self.assertIs(schema.ingest("spectraltype", None), MISSING)
+        # text fields keep their text
+        self.assertEqual(schema.ingest("spectraltype", ""), "")
+
+    def testIngestIsStable(self):
+        for field, val in [("mass", "1.5"), ("discoveryyear", "2001"),
+                           ("lastupdate", "16/11/20"), ("mass", "")]:
+            typed = schema.ingest(field, val)
+            self.assertEqual(schema.ingest(field, typed), typed)
+
+    def testMissing(self):
+        self.assertEqual(str(MISSING), "N/A")
+        self.assertFalse(MISSING)
+        self.assertIs(pickle.loads(pickle.dumps(MISSING)), MISSING)
+        self.assertIs(copy.deepcopy(MISSING), MISSING)
+        self.assertIs(schema.Missing(), MISSING)
+        self.assertNotEqual(MISSING, "N/A")
+
+    def testFormatValue(self):
+        self.assertEqual(schema.formatValue(60.0), "60")
+        self.assertEqual(schema.formatValue(0.20255), "0.20255")
+        self.assertEqual(schema.formatValue(2008), "2008")
+        self.assertEqual(schema.formatValue(datetime.date(2016, 11, 2)),
+                         "16/11/02")
+        self.assertEqual(schema.formatValue("RV"), "RV")
+
+    def testRegistry(self):
+        mass = schema.FIELDS["mass"]
+        self.assertIsInstance(mass, schema.Field)
+        self.assertEqual(mass, "mass")
+        self.assertIs(schema.FIELDS_BY_ID[mass.id], mass)
+        self.assertEqual([f.id for f in schema.FIELDS_BY_ID],
+                         list(range(len(schema.FIELDS))))
+        self.assertTrue(mass.numeric)
+        self.assertFalse(schema.FIELDS["istransiting"].numeric)
+        self.assertTrue(schema.FIELDS["separation"].multiple)
+        self.assertIs(pickle.loads(pickle.dumps(mass)), mass)
+        self.assertIs(schema.field("mass"), mass)
+        self.assertEqual(schema.field("unknown"), "unknown")
+
+    def testAddValUsesRegisteredFields(self):
+        planet = Planet("a")
+        planet.addVal("mass", "1.0")
+        planet.addVal(" \"radius\" ", "2.0")
+        planet.addVal("custom", "3.0")
+        keys = dict((str(key), key) for key in planet.data)
+        self.assertIs(keys["mass"], schema.FIELDS["mass"])
+        # names which need cleaning are cleaned, then registered
+        self.assertIs(keys["radius"], schema.FIELDS["radius"])
+        self.assertNotIsInstance(keys["custom"], schema.Field)
+        self.assertEqual(planet.getVal("radius"), 2.0)
+
+    def testOldModificationsAreTyped(self):
+        planet = Planet("a")
+        planet.starObject = Star("A")
+        change = Modification("eu", planet, planet, "mass", 2.5, MISSING)
+        old = Modification("eu", planet, planet, "mass", "2.5", "N/A")
+        old = pickle.loads(pickle.dumps(old))
+        self.assertEqual(old.value_in_origin_catalogue, 2.5)
+        self.assertIs(old.value_in_OEC, MISSING)
+        self.assertEqual(old, change)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,23 +24,23 @@ class TestbuildSystemFromXML(unittest.TestCase):
     def test_planet_fields(self):
         self.assertEquals(self.planets[0].name, "11 Com b",
                           "incorrect name")
-        self.assertEquals(self.planets[0].data["period"], "326.03",
+        self.assertEquals(self.planets[0].data["period"], 326.03,
                           "incorrect period")
-        self.assertEquals(self.planets[0].data["mass"], "19.4",
+        self.assertEquals(self.planets[0].data["mass"], 19.4,
                           "incorrect mass")
 
     def test_star_fields(self):
         self.assertEquals(self.stars[0].name, "11 Com",
                           "incorrect name")
-        self.assertEquals(self.stars[0].data["radius"], "19",
+        self.assertEquals(self.stars[0].data["radius"], 19.0,
                           "incorrect radius")
-        self.assertEquals(self.stars[0].data["temperature"], "4742",
+        self.assertEquals(self.stars[0].data["temperature"], 4742.0,
                           "incorrect temperature")
 
     def test_system_fields(self):
         self.assertEquals(self.systems[0].name, "11 Com",
                           "incorrect name")
-        self.assertEquals(self.systems[0].data["distance"], "88.9",
+        self.assertEquals(self.systems[0].data["distance"], 88.9,
                           "incorrect distance")
         self.assertEquals(self.systems[0].data["declination"], "+17 47 34",
                           "incorrect declination")
@@ -78,5 +78,79 @@ class TestbuildSystemFromXML(unittest.TestCase):
                               "2MASS J12204305+1747341"])
 
 
+BINARY_SYSTEM = """<system>
+    <name>Kepler-16</name>
+    <name>KOI-1611</name>
+    <star><name>Lone</name></star>
+    <binary>
+        <name>Kepler-16</name>
+        <star><name>Kepler-16 A</name>
+            <planet><name>Kepler-16 A b</name></planet>
+            <planet><name>Kepler-16 A c</name></planet>
+        </star>
+        <star><name>Kepler-16 B</name><name>KOI-1611 B</name></star>
+    </binary>
+</system>"""
+
+
+class TestCatalogueIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = CatalogueIndex()
+        self.systemXML = ET.fromstring(BINARY_SYSTEM)
+        buildSystem(self.systemXML, [], [], [], {}, {}, {}, self.index,
+                    "systems/Kepler 16.xml")
+
+    def test_element_paths(self):
+        self.assertEqual(self.index.lookup("System", "Kepler-16"),
+                         ("systems/Kepler 16.xml", "."))
+        self.assertEqual(self.index.lookup("Star", "Lone"),
+                         ("systems/Kepler 16.xml", "star[1]"))
+        self.assertEqual(self.index.lookup("Planet", "Kepler-16 A c"),
+                         ("systems/Kepler 16.xml",
+                          "binary[1]/star[1]/planet[2]"))
+        # every path leads to the element of the object
+        for name in ["Lone", "Kepler-16 A", "Kepler-16 B"]:
+            path = self.index.lookup("Star", name)[1]
+            self.assertIn(name, [child.text for child in
+                                 self.systemXML.find(path).findall("name")])
+
+    def test_alternate_names(self):
+        self.assertEqual(self.index.lookup("Star", "KOI-1611 B"),
+                         ("systems/Kepler 16.xml", "binary[1]/star[2]"))
+        self.assertEqual(self.index.lookup("System", "koi1611"),
+                         ("systems/Kepler 16.xml", "."))
+        self.assertIsNone(self.index.lookup("Planet", "Kepler-16 B"))
+
+    def test_default_filename(self):
+        index = CatalogueIndex()
+        buildSystem(self.systemXML, [], [], [], {}, {}, {}, index)
+        self.assertEqual(index.lookup("Planet", "Kepler-16 A b"),
+                         ("systems/Kepler-16.xml",
+                          "binary[1]/star[1]/planet[1]"))
+
+    def test_ambiguous_names(self):
+        other = ET.fromstring(BINARY_SYSTEM.replace(
+            "<name>Kepler-16</name>\n    <name>KOI-1611</name>",
+            "<name>Other</name>"))
+        buildSystem(other, [], [], [], {}, {}, {}, self.index)
+        self.assertIsNone(self.index.lookup("Star", "Lone"))
+        self.assertEqual(self.index.lookup("Star", "Lone", "Other"),
+                         ("systems/Other.xml", "star[1]"))
+
+
+class TestBuildSystem(unittest.TestCase):
+    def test_shared_alias_maps(self):
+        stars = []
+        system = buildSystem(ET.fromstring(BINARY_SYSTEM), [], stars, [], {},
+                             {}, {})
+        planets = stars[1].planetObjects
+        self.assertIs(planets[0].starObjectNamesToStar,
+                      planets[1].starObjectNamesToStar)
+        self.assertIs(planets[0].starObjectNamesToStar["kepler16a"], stars[1])
+        self.assertIs(stars[0].systemObjectNamesToSystem,
+                      stars[2].systemObjectNamesToSystem)
+        self.assertIs(stars[0].systemObjectNamesToSystem["KOI-1611"], system)
+
+
 if __name__ == "__main__":
     unittest.main(exit=False)
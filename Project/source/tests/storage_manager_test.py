@@ -1,11 +1,21 @@
 import storage_manager.storage_manager as STORAGE
 import data_comparison.proposed_change as Change
+import os
 import pickle
+import threading
 import unittest
+from unittest import mock
 import data_parsing.Planet as Planet
 
 
 class TestStorageManager(unittest.TestCase):
+    def tearDown(self):
+        # the lock file the config file was rewritten under
+        lock = "storage_manager_test_files/mock_config_file" + \
+            STORAGE.CONFIG_LOCK_SUFFIX
+        if os.path.exists(lock):
+            os.remove(lock)
+
     def test_read_file(self):
         expected = "Contents of plain text file\n\n+++++++++\n"
         path = "storage_manager_test_files/plain_file"
@@ -79,7 +89,7 @@ class TestStorageManager(unittest.TestCase):
         resultList = list(retrieved.keys())
 
         answer = ['black_list', 'last_update', 'auto_update_settings',
-                  'repo_url', 'branch_number']
+                  'repo_url', 'branch_number', 'clone_mode']
         self.assertTrue(
             len(resultList) == len(answer) and all(
                 resultList.count(i) == answer.count(i) for i in resultList))
@@ -105,6 +115,51 @@ class TestStorageManager(unittest.TestCase):
         self.assertEqual(retrieved.__class__.__name__, "Addition")
         self.assertEqual(retrieved.origin, "origin")
 
+    def test_config_update_not_lost(self):
+        STORAGE.CONFIG_PATH = "storage_manager_test_files/mock_config_file"
+        STORAGE.clean_config_file()
+        STORAGE.config_set("counter", 0)
+
+        def increment():
+            for i in range(20):
+                STORAGE.config_update("counter", lambda n: n + 1)
+        threads = [threading.Thread(target=increment) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(STORAGE.config_get("counter"), 100)
+        self.assertEqual(STORAGE.config_get("last_update"), "Never")
+        STORAGE.clean_config_file()
+
+    def test_config_written_at_once(self):
+        STORAGE.CONFIG_PATH = "storage_manager_test_files/mock_config_file"
+        STORAGE.clean_config_file()
+        STORAGE.config_set("key", "kept")
+        files = sorted(os.listdir("storage_manager_test_files"))
+        # a failure while writing leaves the config file as it was
+        with mock.patch.object(STORAGE.pickle, "dump",
+                               side_effect=OSError):
+            with self.assertRaises(OSError):
+                STORAGE.config_set("key", "lost")
+        self.assertEqual(STORAGE.config_get("key"), "kept")
+        # and no temporary file behind
+        self.assertEqual(sorted(os.listdir("storage_manager_test_files")),
+                         files)
+        STORAGE.clean_config_file()
+
+    def test_update_lock(self):
+        path = "storage_manager_test_files/update.lock"
+        self.addCleanup(os.remove, path)
+        with mock.patch.object(STORAGE, "UPDATE_LOCK_PATH", path):
+            with STORAGE.update_lock() as locked:
+                self.assertTrue(locked)
+                # the lock is not taken while the first holder runs
+                with STORAGE.update_lock() as second:
+                    self.assertFalse(second)
+            with STORAGE.update_lock() as locked:
+                self.assertTrue(locked)
+
 
 if __name__ == "__main__":
     unittest.main(exit=False, verbosity=2)